@@ -1,415 +1,282 @@
+"""H60_mmwave 测试站界面：每个治具一个面板，测试逻辑在station.Station中，界面只负责显示和操作
+
+用法: python Combine.py（不带界面运行请使用 station_cli.py）
+"""
 import tkinter as tk
 import serial
 import time
 import logging
 import csv
-import socket  # 添加socket导入
-from tkinter import filedialog, scrolledtext
-import pexpect
-import subprocess
-# 配置日志记录
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
-
-# 添加全局变量
-is_running = False
-current_serial = None
-serial_connection = None  # 新增全局串口连接
-test_results_data = []  # 存储测试结果数据
-test_start_time = None
-test_end_time = None
-
-# 第二个串口连接相关变量
-second_serial_connection = None
-second_serial_port = '/dev/cu.usbserial-112201'  # 第二个串口端口
-second_serial_baudrate = 115200  # 波特率
-
-# TCP/IP连接相关变量
-tcp_socket = None
-tcp_connected = False
-tcp_ip_address = "127.0.0.1"  # 默认IP地址
-tcp_port = 8080  # 默认端口
+import os
+import collections
+from tkinter import filedialog
+import queue
+import threading
+from station import Station, FIXTURES, STATION_ID
+from soak import SoakRun, DEFAULT_COMMANDS
+from log_tail import LogTail
+from log_index import LogIndex
+from console import ConsoleBuffer
+from log_setup import setup_logging
+
+station = None  # main()中创建
+root = None
+console = None
+display_text = None
+export_in_progress = False
+
+# 需要在界面线程执行的回调（由后台线程放入，poll_ui_events取出执行）
+ui_calls = queue.Queue()
+
+PRIMARY_FIXTURE_ID = FIXTURES[0]['id']
+fixture_panels = {}  # fixture_id -> FixturePanel
+UI_POLL_MS = 50  # 界面轮询后台事件的间隔
+TIMING_FILE = 'timing.json'  # 退出时导出各操作的耗时统计
 
 # 全局日志窗口引用
 log_window = None
 log_text_widget = None
-
-
-def get_serial_connection():
-    """获取串口连接，如果未连接则新建连接"""
-    global serial_connection
-    if serial_connection is None or not serial_connection.is_open:
+LOG_FILE = 'app.log'
+LOG_TAIL_LINES = 500  # 打开日志窗口时显示的行数
+LOG_OLDER_CHUNK = 200  # 滚动到顶部时每次加载的更早行数
+LOG_MAX_LINES = 5000  # 日志窗口最多保留的行数
+LOG_POLL_MS = 500  # 检查日志新内容的间隔
+log_tail = None
+log_line_offsets = collections.deque()  # 日志窗口中每一行在文件中的字节偏移
+log_loading_older = False
+log_index = None  # 第一次打开日志窗口时创建，在后台线程中增量更新
+log_search_active = False  # 日志窗口正在显示查询结果，暂停追加新内容
+LOG_SEARCH_LIMIT = 2000  # 日志查询最多显示的行数
+LOG_LEVEL_CHOICES = ("全部", "INFO", "WARNING", "ERROR")
+
+
+def execute_command_on(command, fixture_id=None):
+    """在指定治具（默认第一个治具）上执行命令；串口读写在后台线程中进行，结果回到界面线程显示"""
+    fixture = station.fixture_manager.get(fixture_id or PRIMARY_FIXTURE_ID)
+
+    def show(text, level, message):
+        console.write(text)
+        logging.log(level, message)
+
+    def execute():
         try:
-            serial_connection = serial.Serial('/dev/cu.usbserial-Control', 115200, timeout=2)
-            time.sleep(0.5)  # 等待连接稳定
+            result = station.execute_command(command, fixture.fixture_id)
+            run_in_ui(show, f"[{fixture.name}] {command}: {result}\n", logging.INFO, f"命令执行成功: {command}")
         except serial.SerialException as e:
-            logging.error(f"无法连接串口: {str(e)}")
-            return None
-    return serial_connection
-
-
-def get_second_serial_connection():
-    """获取第二个串口连接，如果未连接则新建连接"""
-    global second_serial_connection
-    if second_serial_connection is None or not second_serial_connection.is_open:
-        try:
-            second_serial_connection = serial.Serial(second_serial_port, second_serial_baudrate, timeout=2)
-            time.sleep(0.5)  # 等待连接稳定
-        except serial.SerialException as e:
-            logging.error(f"无法连接第二个串口: {str(e)}")
-            return None
-    return second_serial_connection
-
-
-def send_command(ser, command):
-    """发送命令到设备"""
-    full_command = command + '\r\n'
-    ser.write(full_command.encode('ascii'))
-    time.sleep(0.5)  # 增加等待时间
-
-    # 读取响应
-    response = ""
-    start_time = time.time()
-    while time.time() - start_time < 2:  # 最多等待2秒
-        if ser.in_waiting > 0:
-            response += ser.read(ser.in_waiting).decode('ascii', errors='ignore')
-        if response and '\n' in response:  # 如果有换行符，认为响应完整
-            break
-        time.sleep(0.01)
-
-    logging.info(f"发送命令: {command}, 响应: {response}")
-    return response
-
-
-def execute_command(command):
-    """执行指定的命令"""
-    global serial_connection
-    try:
-        ser = get_serial_connection()
-        if ser is None:
-            display_text.config(state=tk.NORMAL)
-            display_text.insert(tk.END, f"串口连接失败\n")
-            display_text.config(state=tk.DISABLED)
-            return
-
-        result = send_command(ser, command)
-        display_text.config(state=tk.NORMAL)
-        display_text.insert(tk.END, f"{command}: {result}\n")
-        display_text.see(tk.END)
-        display_text.config(state=tk.DISABLED)
-        logging.info(f"命令执行成功: {command}")
-    except serial.SerialException as e:
-        display_text.config(state=tk.NORMAL)
-        display_text.insert(tk.END, f"串口错误: {str(e)}\n")
-        display_text.config(state=tk.DISABLED)
-        logging.error(f"命令执行失败: {command}, 错误: {str(e)}")
-    except Exception as e:
-        display_text.config(state=tk.NORMAL)
-        display_text.insert(tk.END, f"执行命令 {command} 时发生错误: {str(e)}\n")
-        display_text.config(state=tk.DISABLED)
-        logging.error(f"命令执行失败: {command}, 错误: {str(e)}")
-
-
-def connect_tcp(ip_address="127.0.0.1", port=8080):
-    """连接TCP/IP服务器"""
-    global tcp_socket, tcp_connected, tcp_ip_address, tcp_port
-    tcp_ip_address = ip_address
-    tcp_port = port
-
-    try:
-        tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        tcp_socket.settimeout(5)  # 设置5秒超时
-        tcp_socket.connect((tcp_ip_address, tcp_port))
-        tcp_connected = True
-        logging.info(f"TCP/IP连接成功: {tcp_ip_address}:{tcp_port}")
-        return True
-    except Exception as e:
-        logging.error(f"TCP/IP连接失败: {str(e)}")
-        tcp_connected = False
-        return False
-
-
-def send_tcp_data(data):
-    """通过TCP/IP发送数据"""
-    global tcp_socket, tcp_connected
-    if tcp_connected and tcp_socket:
-        try:
-            tcp_socket.sendall(data.encode('utf-8'))
-            logging.info(f"TCP/IP发送数据: {data}")
-            return True
+            run_in_ui(show, f"[{fixture.name}] 串口错误: {str(e)}\n", logging.ERROR,
+                      f"命令执行失败: {command}, 错误: {str(e)}")
         except Exception as e:
-            logging.error(f"TCP/IP发送数据失败: {str(e)}")
-            tcp_connected = False
-            return False
-    else:
-        logging.warning("TCP/IP未连接，无法发送数据")
-        return False
-
-
-def disconnect_tcp():
-    """断开TCP/IP连接"""
-    global tcp_socket, tcp_connected
-    if tcp_socket:
-        try:
-            tcp_socket.close()
-            logging.info("TCP/IP连接已断开")
-        except:
-            pass
-    tcp_socket = None
-    tcp_connected = False
-
-
-def get_unit_sn():
-    """获取Unit_SN值，通过adb命令获取"""
-    try:
-        # 执行 adb root
-        subprocess.run(['adb', 'root'], check=True, timeout=10)
-
-        # 执行 adb shell oai-sn get 并获取输出
-        result = subprocess.run(['adb', 'shell', 'oai-sn', 'get'],
-                                capture_output=True, text=True, timeout=10)
-
-        if result.returncode == 0:
-            unit_sn = result.stdout.strip()
-            logging.info(f"获取到Unit_SN: {unit_sn}")
-            return unit_sn
-        else:
-            logging.error(f"adb shell oai-sn get 执行失败: {result.stderr}")
-            return "unknown_unit_sn"
-
-    except subprocess.TimeoutExpired:
-        logging.error("adb命令执行超时")
-        return "timeout_unit_sn"
-    except subprocess.CalledProcessError as e:
-        logging.error(f"adb命令执行失败: {e}")
-        return "error_unit_sn"
-    except Exception as e:
-        logging.error(f"获取Unit_SN失败: {str(e)}")
-        return "unknown_unit_sn"
-
-
-def read_mmwave_device_info():
-    """读取mmwave设备信息，直接在终端执行nanokdp命令"""
-    try:
-        # 启动 nanokdp 命令
-        child = pexpect.spawn('nanokdp -c 1000000,n,8,1')
-        # 等待设备选择提示
-        child.expect('Select a device by its number')
-        # 选择设备编号 4
-        child.sendline('3')
-        child.sendline('')  # 空字符串相当于按回车键
-        # 等待命令执行完成，出现命令提示符
-        # 这里需要根据实际的提示符进行调整
-        child.expect(['>', '#', r'\$', 'nanokdp>', pexpect.TIMEOUT], timeout=10)
-        # 发送回车键确认选择（如果需要）
-        child.sendline('')  # 空字符串相当于按回车键
-        # 执行 mmwave status 命令
-        child.sendline('mmwave status')
-        # 等待命令输出完成
-        child.expect(['>', '#', r'\$', 'nanokdp>', pexpect.EOF], timeout=15)
-        # 获取命令输出结果
-        output = child.before.decode('utf-8', errors='ignore')
-        # 解析输出，查找Device信息
-        lines = output.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Device:'):
-                device_part = line[7:].strip()  # 去掉 "Device:" 前缀
-                child.close()
-                return device_part
-        child.close()
-        return None
-    except pexpect.exceptions.TIMEOUT:
-        logging.error("pexpect命令执行超时")
-        return None
-    except Exception as e:
-        logging.error(f"执行pexpect命令失败: {str(e)}")
-        return None
-
-
-
-
-def periodically_read_and_upload():
-    """定期读取mmwave设备信息并上传到TCP服务器"""
-    info = read_mmwave_device_info()  # 替换为新函数
-    if info:
-        # 准备上传数据
-        upload_data = {
-            'device_type': 'mmwave_device',
-            'timestamp': time.time(),
-            'info': info
-        }
-        # 发送数据到TCP服务器
-        send_tcp_data(str(upload_data))
-
-        # 同时更新SN文本框
-        root.after(0, lambda: update_sn_display(info))
-
-    # 5秒后再次执行
-    root.after(5000, periodically_read_and_upload)
-
-
-def update_sn_display(device_info):
-    """更新SN显示框"""
-    if device_info:
-        sn_entry.delete(0, tk.END)
-        sn_entry.insert(0, device_info)
-
-
-def run_function():
-    """启动测试流程"""
-    global is_running, current_serial, test_results_data, test_start_time, test_end_time
-
-    if not is_running:  # 防止重复启动
-        logging.info("开始执行测试流程")
-        # 清空之前的测试结果
-        test_results_data = []
-        # 记录测试开始时间
-        test_start_time = time.strftime('%Y-%m-%d %H:%M:%S')
-
-        is_running = True
-        run_button.config(state=tk.DISABLED)  # 禁用RUN按钮
-        stop_button.config(state=tk.NORMAL)  # 启用STOP按钮
-
-        # 记录开始时间
-        start_time = time.time()
-
+            run_in_ui(show, f"[{fixture.name}] 执行命令 {command} 时发生错误: {str(e)}\n", logging.ERROR,
+                      f"命令执行失败: {command}, 错误: {str(e)}")
+
+    threading.Thread(target=execute, name=f"command-{fixture.fixture_id}", daemon=True).start()
+
+
+def run_in_ui(func, *args):
+    """从后台线程请求在界面线程中执行func"""
+    ui_calls.put((func, args))
+
+
+def update_sn_display(fixture_id, device_info):
+    """更新治具面板的SN显示框为该治具上DUT的设备信息"""
+    if device_info and fixture_id in fixture_panels:
+        fixture_panels[fixture_id].set_sn(device_info)
+
+
+class FixturePanel:
+    """一个治具的界面面板（Result、RUN/STOP、SN、Time）以及该治具本次测试的数据"""
+
+    def __init__(self, parent, fixture):
+        self.fixture = fixture
+        self.start_monotonic = None  # 用于界面计时
+        self.is_running = False
+
+        frame = tk.LabelFrame(parent, text=fixture.name, bg="white")
+        frame.pack(pady=5, fill=tk.X)
+
+        # RUN结果标签
+        result_frame = tk.Frame(frame, bg="white")
+        result_frame.pack(pady=2)
+        tk.Label(result_frame, text="Result:", bg="white").pack(side=tk.LEFT)
+        self.result_label = tk.Label(result_frame, text="Ready", bg="lightgray", width=8, relief="sunken")
+        self.result_label.pack(side=tk.LEFT, padx=(5, 0))
+
+        # RUN和STOP按钮
+        button_row = tk.Frame(frame, bg="white")
+        button_row.pack(pady=2)
+        self.run_button = tk.Button(button_row, text="RUN", command=lambda: run_function(fixture.fixture_id),
+                                    bg="red", fg="black", width=5)
+        self.run_button.pack(side=tk.LEFT, padx=2)
+        self.stop_button = tk.Button(button_row, text="STOP", command=lambda: stop_function(fixture.fixture_id),
+                                     bg="orange", fg="black", width=5)
+        self.stop_button.pack(side=tk.LEFT, padx=2)
+        # 初始时禁用STOP按钮
+        self.stop_button.config(state=tk.DISABLED)
+
+        # SN标签和输入框
+        sn_frame = tk.Frame(frame, bg="white")
+        sn_frame.pack(pady=2)
+        tk.Label(sn_frame, text="SN:", bg="white").pack(side=tk.LEFT)
+        self.sn_entry = tk.Entry(sn_frame, width=10)
+        self.sn_entry.pack(side=tk.LEFT, padx=(5, 0))
+
+        # Time标签和输入框
+        time_frame = tk.Frame(frame, bg="white")
+        time_frame.pack(pady=2)
+        tk.Label(time_frame, text="Time:", bg="white").pack(side=tk.LEFT)
+        self.time_entry = tk.Entry(time_frame, width=8)
+        self.time_entry.pack(side=tk.LEFT, padx=(5, 0))
+
+    def set_sn(self, sn):
+        """更新SN输入框"""
+        self.sn_entry.delete(0, tk.END)
+        self.sn_entry.insert(0, sn)
+
+    def update_time_display(self, elapsed_time):
+        """更新时间显示"""
+        self.time_entry.delete(0, tk.END)
+        self.time_entry.insert(0, f"{elapsed_time:.1f}s")
+
+    def begin(self):
+        """开始测试：更新按钮和结果显示"""
+        self.start_monotonic = time.monotonic()
+        self.is_running = True
+        self.run_button.config(state=tk.DISABLED)  # 禁用RUN按钮
+        self.stop_button.config(state=tk.NORMAL)  # 启用STOP按钮
         # 更新结果显示为测试中
-        result_label.config(text="Test..", bg="yellow")
-        root.update_idletasks()  # 刷新界面
-
+        self.result_label.config(text="Test..", bg="yellow")
+        self.update_time_display(0.0)
+
+    def finish(self, text, bg, elapsed_time=None):
+        """测试结束后更新结果显示并重置按钮状态"""
+        if elapsed_time is not None:
+            self.update_time_display(elapsed_time)
+        self.result_label.config(text=text, bg=bg)
+        self.is_running = False
+        # 重置按钮状态
+        self.run_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+
+    def tick(self):
+        """测试进行中持续刷新计时"""
+        if self.is_running and self.start_monotonic is not None:
+            self.update_time_display(time.monotonic() - self.start_monotonic)
+
+
+def run_function(fixture_id=PRIMARY_FIXTURE_ID):
+    """在指定治具上启动测试流程"""
+    if station.begin_run(fixture_id):  # 治具正忙时不会重复启动
+        fixture_panels[fixture_id].begin()
+
+
+def run_all_function():
+    """在所有空闲治具上同时启动测试"""
+    for fixture_id in fixture_panels:
+        run_function(fixture_id)
+
+
+def handle_test_event(fixture_id, kind, data):
+    """在界面线程中处理治具后台测试发来的事件"""
+    # 运行记录、日志和结果上传由station处理，这里只更新界面
+    record = station.process_event(fixture_id, kind, data)
+    panel = fixture_panels[fixture_id]
+    name = panel.fixture.name
+    if isinstance(record, SoakRun) and kind != 'soak':
+        console.write(f"[{name}] 耐久测试结束: {format_soak_progress(record.summary())}\n")
+    if kind == 'soak':
+        console.write(f"[{name}] 耐久测试: {format_soak_progress(data)}\n")
+        panel.update_time_display(data['elapsed'])
+    elif kind == 'sn':
+        # 更新SN输入框
+        panel.set_sn(data['sn'])
+    elif kind == 'step':
+        console.write(f"[{name}] {data['label']} [{data['status']}]: {data['result']}\n")
+        if data['reason']:
+            console.write(f"[{name}] {data['label']} 失败原因: {data['reason']}\n")
+        panel.update_time_display(data['elapsed'])
+    elif kind == 'done':
+        panel.finish(data['result'], "lightgreen" if data['result'] == 'Pass' else "red", data['elapsed'])
+    elif kind == 'stopped':
+        # 更新结果显示为停止，清空时间显示
+        panel.finish("Stopped", "orange", 0.0)
+    elif kind == 'error':
+        error = data['error']
+        prefix = "串口错误" if isinstance(error, serial.SerialException) else "测试出错"
+        console.write(f"[{name}] {prefix}: {str(error)}\n")
+        # 测试失败，更新结果为Fail
+        panel.finish("Fail", "red", data['elapsed'])
+
+
+def format_soak_progress(summary):
+    """耐久测试进度的一行文字：轮数、吞吐量、失败数和耗时漂移"""
+    text = (f"{summary['cycles']} 轮 / {summary['commands_sent']} 条命令，"
+            f"{summary['recent_cmds_per_s']} 条/秒，失败 {summary['failures']}")
+    drift = summary['drift']
+    if drift and drift['ratio']:
+        text += f"，耗时 {drift['first_ms']:.1f} -> {drift['recent_ms']:.1f} ms (x{drift['ratio']})"
+    return text
+
+
+def soak_function(fixture_id, commands, cycles, duration, rate):
+    """在指定治具上启动耐久测试；参数为界面输入的文字，空白表示不限制"""
+    try:
+        soak = SoakRun([command.strip() for command in commands.split(';') if command.strip()],
+                       cycles=int(cycles) if cycles.strip() else None,
+                       duration=float(duration) if duration.strip() else None,
+                       rate=float(rate) if rate.strip() else None)
+    except ValueError as e:
+        console.write(f"耐久测试参数错误: {str(e)}\n")
+        return
+    if station.begin_soak(fixture_id, soak):
+        fixture_panels[fixture_id].begin()
+        fixture_panels[fixture_id].result_label.config(text="Soak..")
+
+
+def poll_ui_events():
+    """定时处理后台线程发来的界面回调和测试事件"""
+    while True:
         try:
-            logging.info("尝试连接串口 /dev/cu.usbserial-Control")
-            # 使用统一的串口连接管理
-            current_serial = get_serial_connection()
-            if current_serial is None:
-                raise serial.SerialException("无法获取串口连接")
-            logging.info("串口连接成功")
-
-            # 先获取设备序列号并填充到SN输入框
-            fixture_sn_response = send_command(current_serial, 'FixtureSN')
-            # 提取序列号（通常响应格式为 "FixtureSN: ABC123" 或类似格式）
-            extracted_sn = fixture_sn_response.strip()
-            if ':' in extracted_sn:
-                extracted_sn = extracted_sn.split(':', 1)[1].strip()
-            elif extracted_sn.startswith('FixtureSN'):
-                extracted_sn = extracted_sn[10:].strip()  # 移除'FixtureSN'前缀
-
-            # 更新SN输入框
-            sn_entry.delete(0, tk.END)
-            sn_entry.insert(0, extracted_sn)
-
-            # 发送气缸向左运动命令
-            result_left = send_command(current_serial, 'CYLINDER_EXERCISE LEFT')
-            display_text.config(state=tk.NORMAL)
-            display_text.insert(tk.END, f"向左运动: {result_left}\n")
-            display_text.see(tk.END)
-
-            # 记录测试结果
-            test_results_data.append({
-                'command': 'CYLINDER_EXERCISE LEFT',
-                'result': result_left,
-                'timestamp': time.time() - start_time
-            })
-
-            # 更新时间显示
-            elapsed_time = time.time() - start_time
-            time_entry.delete(0, tk.END)
-            time_entry.insert(0, f"{elapsed_time:.1f}s")
-            root.update_idletasks()
-
-            time.sleep(1)  # 等待1秒
-
-            # 发送气缸向右运动命令
-            result_right = send_command(current_serial, 'CYLINDER_EXERCISE RIGHT')
-            display_text.insert(tk.END, f"向右运动: {result_right}\n")
-            display_text.see(tk.END)
-
-            # 记录测试结果
-            test_results_data.append({
-                'command': 'CYLINDER_EXERCISE RIGHT',
-                'result': result_right,
-                'timestamp': time.time() - start_time
-            })
-
-            # 更新时间显示
-            elapsed_time = time.time() - start_time
-            time_entry.delete(0, tk.END)
-            time_entry.insert(0, f"{elapsed_time:.1f}s")
-            root.update_idletasks()
-            display_text.config(state=tk.DISABLED)
-
-            # 测试完成，显示总时间
-            total_time = time.time() - start_time
-            time_entry.delete(0, tk.END)
-            time_entry.insert(0, f"{total_time:.1f}s")
-
-            # 记录测试结束时间
-            test_end_time = time.strftime('%Y-%m-%d %H:%M:%S')
-
-
-            # 假设测试成功，更新结果为Pass
-            result_label.config(text="Pass", bg="lightgreen")
-            logging.info("测试完成，结果: Pass")
-
-            is_running = False
-
-            # 重置按钮状态
-            run_button.config(state=tk.NORMAL)
-            stop_button.config(state=tk.DISABLED)
-
-        except serial.SerialException as e:
-            logging.error(f"串口错误: {str(e)}")
-            display_text.config(state=tk.NORMAL)
-            display_text.insert(tk.END, f"串口错误: {str(e)}\n")
-            display_text.config(state=tk.DISABLED)
-            # 记录测试结束时间
-            test_end_time = time.strftime('%Y-%m-%d %H:%M:%S')
-            # 测试失败，更新结果为Fail
-            result_label.config(text="Fail", bg="red")
-            is_running = False
-
-            # 重置按钮状态
-            run_button.config(state=tk.NORMAL)
-            stop_button.config(state=tk.DISABLED)
-
+            func, args = ui_calls.get_nowait()
+        except queue.Empty:
+            break
+        func(*args)
 
-def stop_function():
-    """停止当前测试"""
-    global is_running, current_serial
+    while True:
+        try:
+            fixture_id, kind, data = station.fixture_manager.engine.events.get_nowait()
+        except queue.Empty:
+            break
+        handle_test_event(fixture_id, kind, data)
 
-    logging.info("执行停止操作")
-    is_running = False
-    run_button.config(state=tk.NORMAL)
-    stop_button.config(state=tk.DISABLED)
+    for panel in fixture_panels.values():
+        panel.tick()
 
-    # 关闭当前串口连接（如果存在）
-    if current_serial and current_serial.is_open:
-        current_serial.close()
-        current_serial = None
-        logging.info("串口连接已关闭")
+    root.after(UI_POLL_MS, poll_ui_events)
 
-    # 更新结果显示为停止
-    result_label.config(text="Stopped", bg="orange")
 
-    # 清空时间显示
-    time_entry.delete(0, tk.END)
-    time_entry.insert(0, "0.0s")
+def stop_function(fixture_id=PRIMARY_FIXTURE_ID):
+    """停止指定治具上的测试"""
+    if station.stop_run(fixture_id):
+        # 后台测试收到停止请求后会发出'stopped'事件，由poll_ui_events更新界面
+        panel = fixture_panels[fixture_id]
+        panel.result_label.config(text="Stopping", bg="orange")
+        panel.stop_button.config(state=tk.DISABLED)
 
 
 def show_command_window():
     """显示控制指令窗口"""
     command_window = tk.Toplevel(root)
     command_window.title("H60机台指令")
-    command_window.geometry("300x400")
+    command_window.geometry("300x600")
     command_window.configure(bg="lightgray")
 
+    # 选择指令发送到哪个治具
+    target = tk.StringVar(value=PRIMARY_FIXTURE_ID)
+    tk.OptionMenu(command_window, target, *fixture_panels).pack(pady=2, fill=tk.X)
+
+    def execute_command(command):
+        execute_command_on(command, target.get())
+
     # H60机台指令按钮
     tk.Button(command_window, text="Help", command=lambda: execute_command('help'), bg="lightblue").pack(pady=2,
                                                                                                          fill=tk.X)
@@ -434,46 +301,245 @@ def show_command_window():
     tk.Button(command_window, text="Version", command=lambda: execute_command('Version'), bg="lightblue").pack(pady=2,
                                                                                                                fill=tk.X)
 
+    # 耐久测试：循环发送命令（以;分隔），次数、时长(秒)、速率(轮/秒)留空表示不限制
+    soak_frame = tk.LabelFrame(command_window, text="耐久测试", bg="lightgray")
+    soak_frame.pack(pady=4, fill=tk.X)
+    soak_fields = {}
+    for row, (label, default) in enumerate((("命令", '; '.join(DEFAULT_COMMANDS)), ("次数", "1000"),
+                                            ("时长(秒)", ""), ("速率(轮/秒)", ""))):
+        tk.Label(soak_frame, text=label, bg="lightgray").grid(row=row, column=0, sticky=tk.W)
+        entry = tk.Entry(soak_frame)
+        entry.insert(0, default)
+        entry.grid(row=row, column=1, sticky=tk.EW)
+        soak_fields[label] = entry
+    soak_frame.columnconfigure(1, weight=1)
+    tk.Button(soak_frame, text="开始耐久测试", bg="lightgreen",
+              command=lambda: soak_function(target.get(), *(entry.get() for entry in soak_fields.values()))
+              ).grid(row=4, column=0, columnspan=2, sticky=tk.EW)
+    tk.Button(soak_frame, text="停止", bg="lightcoral", command=lambda: stop_function(target.get())
+              ).grid(row=5, column=0, columnspan=2, sticky=tk.EW)
+
 
 def show_log_window():
-    """在主文本框显示日志内容"""
-    try:
-        with open('app.log', 'r', encoding='utf-8') as f:
-            log_content = f.read()
-            display_text.config(state=tk.NORMAL)
-            display_text.delete(1.0, tk.END)  # 清空当前内容
-            display_text.insert(tk.END, "=== 日志内容 ===\n")
-            display_text.insert(tk.END, log_content)
-            display_text.see(tk.END)
-            display_text.config(state=tk.DISABLED)
-    except FileNotFoundError:
-        display_text.config(state=tk.NORMAL)
-        display_text.delete(1.0, tk.END)  # 清空当前内容
-        display_text.insert(tk.END, "日志文件不存在，将从现在开始记录日志...\n")
-        display_text.see(tk.END)
-        display_text.config(state=tk.DISABLED)
+    """打开日志窗口：只显示日志末尾，之后增量追加新内容，滚动到顶部时按需加载更早的日志"""
+    global log_window, log_text_widget, log_tail
+    if log_window is not None and log_window.winfo_exists():
+        log_window.lift()
+        return
+
+    log_window = tk.Toplevel(root)
+    log_window.title("测试日志")
+    log_window.geometry("900x500")
+
+    # 按时间段、级别和关键字查询历史日志（包括轮转的旧日志）
+    filter_frame = tk.Frame(log_window)
+    filter_frame.pack(side=tk.TOP, fill=tk.X)
+    filter_fields = {}
+    for label in ("开始", "结束"):
+        tk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+        filter_fields[label] = tk.Entry(filter_frame, width=17)
+        filter_fields[label].pack(side=tk.LEFT, padx=2)
+    level = tk.StringVar(value=LOG_LEVEL_CHOICES[0])
+    tk.OptionMenu(filter_frame, level, *LOG_LEVEL_CHOICES).pack(side=tk.LEFT)
+    tk.Label(filter_frame, text="关键字").pack(side=tk.LEFT)
+    keyword = tk.Entry(filter_frame, width=20)
+    keyword.pack(side=tk.LEFT, padx=2)
+    tk.Button(filter_frame, text="查询", command=lambda: search_log(
+        filter_fields["开始"].get().strip() or None, filter_fields["结束"].get().strip() or None,
+        None if level.get() == LOG_LEVEL_CHOICES[0] else level.get(), keyword.get().strip() or None)
+              ).pack(side=tk.LEFT, padx=2)
+    tk.Button(filter_frame, text="实时日志", command=show_live_log).pack(side=tk.LEFT, padx=2)
+
+    scrollbar = tk.Scrollbar(log_window)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    log_text_widget = tk.Text(log_window, wrap=tk.NONE, font=("Arial", 10),
+                              yscrollcommand=lambda first, last: on_log_scroll(scrollbar, first, last))
+    log_text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.config(command=log_text_widget.yview)
+    log_window.protocol("WM_DELETE_WINDOW", close_log_window)
+
+    show_live_log()
+    root.after(LOG_POLL_MS, poll_log_file)
+    update_log_index()
+
+
+def show_live_log():
+    """日志窗口显示日志末尾，之后增量追加新内容"""
+    global log_tail, log_search_active
+    if log_text_widget is None:
+        return
+    log_search_active = False
+    log_tail = LogTail(LOG_FILE)
+    log_line_offsets.clear()
+    log_text_widget.config(state=tk.NORMAL)
+    log_text_widget.delete('1.0', tk.END)
+    lines = log_tail.open_tail(LOG_TAIL_LINES)
+    if not os.path.exists(LOG_FILE):
+        log_text_widget.insert(tk.END, "日志文件不存在，将从现在开始记录日志...\n")
+        log_line_offsets.append(0)
+    append_log_lines(lines)
+    log_text_widget.config(state=tk.DISABLED)
+    log_text_widget.see(tk.END)
+
+
+def update_log_index(on_done=None):
+    """在后台线程中索引日志新增的内容，完成后在界面线程调用on_done()"""
+    global log_index
+    if log_index is None:
+        log_index = LogIndex(LOG_FILE)
+    index = log_index
+
+    def worker():
+        try:
+            index.update()
+        except Exception as e:
+            logging.error(f"更新日志索引失败: {str(e)}")
+        if on_done is not None:
+            run_in_ui(on_done)
+
+    threading.Thread(target=worker, name='log-index', daemon=True).start()
+
+
+def search_log(since, until, level, keyword):
+    """更新索引后按条件查询历史日志，查询结果替换日志窗口的内容"""
+    global log_search_active
+    log_search_active = True
+
+    def run_search():
+        def worker():
+            try:
+                matches = log_index.search(since=since, until=until, level=level, keyword=keyword,
+                                           limit=LOG_SEARCH_LIMIT)
+            except ValueError as e:
+                run_in_ui(show_log_matches, None, str(e))
+                return
+            run_in_ui(show_log_matches, matches, None)
+
+        threading.Thread(target=worker, name='log-search', daemon=True).start()
+
+    update_log_index(run_search)
+
+
+def show_log_matches(matches, error):
+    """在日志窗口中显示查询结果，旧日志文件的行前标出文件名"""
+    if log_text_widget is None or not log_search_active:
+        return
+    log_text_widget.config(state=tk.NORMAL)
+    log_text_widget.delete('1.0', tk.END)
+    if error:
+        log_text_widget.insert(tk.END, f"查询条件错误: {error}\n")
+    else:
+        note = f"（只显示前 {LOG_SEARCH_LIMIT} 条）" if len(matches) >= LOG_SEARCH_LIMIT else ""
+        log_text_widget.insert(tk.END, f"=== 共 {len(matches)} 条匹配{note} ===\n")
+        for match in matches:
+            prefix = f"[{os.path.basename(match.path)}] " if match.path != LOG_FILE else ""
+            log_text_widget.insert(tk.END, prefix + match.text.rstrip('\n') + '\n')
+    log_text_widget.config(state=tk.DISABLED)
+    log_text_widget.see('1.0')
+
+
+def close_log_window():
+    """关闭日志窗口"""
+    global log_window, log_text_widget, log_tail, log_search_active
+    if log_window is not None:
+        log_window.destroy()
+    log_window = None
+    log_text_widget = None
+    log_tail = None
+    log_search_active = False
+
+
+def append_log_lines(lines):
+    """把新行追加到日志窗口末尾，超过行数上限时删除最早的行"""
+    if not lines:
+        return
+    at_bottom = log_text_widget.yview()[1] >= 1.0
+    log_text_widget.config(state=tk.NORMAL)
+    log_text_widget.insert(tk.END, ''.join(text for _, text in lines))
+    log_line_offsets.extend(offset for offset, _ in lines)
+    excess = len(log_line_offsets) - LOG_MAX_LINES
+    if excess > 0:
+        log_text_widget.delete('1.0', f"{excess + 1}.0")
+        for _ in range(excess):
+            log_line_offsets.popleft()
+        log_tail.set_head(log_line_offsets[0])
+    log_text_widget.config(state=tk.DISABLED)
+    if at_bottom:
+        log_text_widget.see(tk.END)
+
+
+def on_log_scroll(scrollbar, first, last):
+    """滚动条回调：滚动到顶部时加载更早的日志"""
+    global log_loading_older
+    scrollbar.set(first, last)
+    if float(first) <= 0.0 and log_tail is not None and log_tail.has_older and not log_loading_older \
+            and not log_search_active:
+        log_loading_older = True
+        root.after_idle(load_older_log_lines)
+
+
+def load_older_log_lines():
+    """在日志窗口顶部插入更早的日志行，并保持当前查看的位置"""
+    global log_loading_older
+    log_loading_older = False
+    if log_text_widget is None:
+        return
+    lines = log_tail.read_older(LOG_OLDER_CHUNK)
+    if not lines:
+        return
+    log_text_widget.config(state=tk.NORMAL)
+    log_text_widget.insert('1.0', ''.join(text for _, text in lines))
+    log_text_widget.config(state=tk.DISABLED)
+    log_line_offsets.extendleft(offset for offset, _ in reversed(lines))
+    log_text_widget.yview(f"{len(lines) + 1}.0")
+
+
+def poll_log_file():
+    """定时读取日志文件新增的内容"""
+    if log_text_widget is None:
+        return
+    if log_search_active:
+        # 显示查询结果期间不追加新内容，返回实时日志时重新读取末尾
+        root.after(LOG_POLL_MS, poll_log_file)
+        return
+    lines, rotated = log_tail.read_new()
+    if rotated:
+        # 日志已轮转，从新文件开头重新显示
+        log_text_widget.config(state=tk.NORMAL)
+        log_text_widget.delete('1.0', tk.END)
+        log_text_widget.insert(tk.END, "=== 日志文件已轮转 ===\n")
+        log_text_widget.config(state=tk.DISABLED)
+        log_line_offsets.clear()
+        log_line_offsets.append(0)
+    append_log_lines(lines)
+    root.after(LOG_POLL_MS, poll_log_file)
 
 
 def export_to_csv():
-    """导出测试结果到CSV文件"""
-    global test_results_data, test_start_time, test_end_time
-
-    # 获取mmwave设备信息
-    device_part = read_mmwave_device_info()  # 调用函数获取设备信息
-    print(f"获取到的设备信息: {device_part}")  # 添加调试输出
-
-    # 获取Unit_SN
-    unit_sn = get_unit_sn()  # 添加这一行
-
-    # 初始化失败列表
-    fail_list = []
-    # 检查测试数据中的错误
-    for data in test_results_data:
-        if 'fail' in data['result'].lower() or 'error' in data['result'].lower():
-            fail_list.append(data['command'])
-    # 如果有具体的错误条件，可以添加判断
-    if result_label.cget('text') == 'Fail':
-        fail_list.append('Overall_Test_Failed')
+    """导出测试结果到CSV文件：先在后台并发读取设备信息，完成后再弹出保存对话框"""
+    global export_in_progress
+    if export_in_progress:
+        return
+    export_in_progress = True
+
+    console.write("正在读取设备信息...\n")
+
+    def collect():
+        results, errors = station.collect_export_metadata()
+        run_in_ui(write_export_csv, results, errors)
+
+    threading.Thread(target=collect, name='export-metadata', daemon=True).start()
+
+
+def write_export_csv(metadata, errors):
+    """在界面线程中选择文件并写入CSV，每个治具的测试数据各占若干行，metadata中缺少的字段记为N/A"""
+    global export_in_progress
+    export_in_progress = False
+
+    logging.debug(f"导出读取到的设备信息: {metadata}")
+    if errors:
+        console.write("部分设备信息未获取到: "
+                      + ', '.join(f"{name}({reason})" for name, reason in errors.items()) + "\n")
 
     # 获取保存文件路径
     file_path = filedialog.asksaveasfilename(
@@ -487,150 +553,128 @@ def export_to_csv():
             # 写入CSV文件
             with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
                 fieldnames = ['Unit_SN', 'Start_Time',
-                              'End_Time', 'Station_ID','Fixture_SN', 'mmWAVE_Model_Name', 'Test_Result','Fail_list','Timestamp', 'Total_Time' ]
+                              'End_Time', 'Station_ID', 'Fixture_ID', 'Fixture_SN', 'mmWAVE_Model_Name', 'Test_Result','Fail_list','Timestamp', 'Total_Time' ]
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
-                # 写入测试数据
-                sn_value = sn_entry.get()  # 获取SN输入框的值
-                total_time = time_entry.get()  # 获取总时间
-                test_status = result_label.cget('text')  # 获取测试结果状态
-                start_time_str = test_start_time if test_start_time else 'N/A'
-                end_time_str = test_end_time if test_end_time else 'N/A'
-                for data in test_results_data:
-                    writer.writerow({
-                        'Unit_SN':unit_sn,
-                        'Start_Time':start_time_str,
-                        'End_Time': end_time_str,
-                        'Station_ID': 'N/A',
-                        'Fixture_SN': sn_value,
-                        'mmWAVE_Model_Name': device_part,
-                        'Test_Result': data['result'],
-                        'Fail_list':';'.join(fail_list) if fail_list else 'N/A',
-                        'Timestamp': f"{data['timestamp']:.2f}s",
-                        'Total_Time': total_time,
-                    })
-
-                # 如果没有测试数据，至少输出一行基本信息
-                if not test_results_data:
-                    writer.writerow({
+                for panel in fixture_panels.values():
+                    record = station.runs.get(panel.fixture.fixture_id)
+                    steps = record.steps if record else []
+                    # 初始化失败列表
+                    fail_list = []
+                    # 步骤状态已按响应语法判定
+                    for data in steps:
+                        if data['status'] == 'Fail':
+                            fail_list.append(data['command'])
+                    # 如果有具体的错误条件，可以添加判断
+                    if panel.result_label.cget('text') == 'Fail':
+                        fail_list.append('Overall_Test_Failed')
+
+                    # 写入测试数据，Unit_SN和mmwave型号来自该治具上的DUT，治具未配置DUT时为N/A
+                    fixture_id = panel.fixture.fixture_id
+                    unit_sn = metadata.get(f"unit_sn:{fixture_id}") or 'N/A'
+                    device_part = metadata.get(f"mmwave_model:{fixture_id}")
+                    sn_value = (metadata.get(f"fixture_sn:{panel.fixture.fixture_id}")
+                                or panel.sn_entry.get())  # 没有读到治具SN时使用SN输入框的值
+                    total_time = panel.time_entry.get()  # 获取总时间
+                    start_time_str = record.start_time if record else 'N/A'
+                    end_time_str = record.end_time if record and record.end_time else 'N/A'
+                    row = {
                         'Unit_SN': unit_sn,
                         'Start_Time': start_time_str,
                         'End_Time': end_time_str,
-                        'Station_ID': 'N/A',
+                        'Station_ID': STATION_ID,
+                        'Fixture_ID': fixture_id,
                         'Fixture_SN': sn_value,
                         'mmWAVE_Model_Name': device_part if device_part else 'N/A',
-                        'Test_Result': 'N/A',
-                        'Fail_list':';'.join(fail_list) if fail_list else 'N/A',
-                        'Timestamp': '0.00s',
+                        'Fail_list': ';'.join(fail_list) if fail_list else 'N/A',
                         'Total_Time': total_time,
-                    })
+                    }
+                    for data in steps:
+                        writer.writerow(dict(row, Test_Result=data['result'],
+                                             Timestamp=f"{data['timestamp']:.2f}s"))
+
+                    # 如果没有测试数据，至少输出一行基本信息
+                    if not steps:
+                        writer.writerow(dict(row, Test_Result='N/A', Timestamp='0.00s'))
 
             # 在界面上显示导出成功信息
-            display_text.config(state=tk.NORMAL)
-            display_text.insert(tk.END, f"\n测试结果已导出到: {file_path}\n")
-            display_text.see(tk.END)
-            display_text.config(state=tk.DISABLED)
+            console.write(f"\n测试结果已导出到: {file_path}\n")
 
         except Exception as e:
-            display_text.config(state=tk.NORMAL)
-            display_text.insert(tk.END, f"导出CSV失败: {str(e)}\n")
-            display_text.see(tk.END)
-            display_text.config(state=tk.DISABLED)
+            console.write(f"导出CSV失败: {str(e)}\n")
 
 
 def cleanup_serial():
-    """清理串口和TCP连接"""
-    global serial_connection, second_serial_connection
-    if serial_connection and serial_connection.is_open:
-        serial_connection.close()
-        serial_connection = None
-
-    if second_serial_connection and second_serial_connection.is_open:
-        second_serial_connection.close()
-        second_serial_connection = None
-
-    # 断开TCP连接
-    if tcp_socket:
-        try:
-            tcp_socket.close()
-        except:
-            pass
-        tcp_socket = None
-
-
-# 创建主窗口
-root = tk.Tk()
-root.title("H60_mmwave GUI")
-root.geometry("850x550")
-
-# 设置主窗口背景色
-root.configure(bg="green")
-# 禁止窗口调整大小
-root.resizable(False, False)
-
-# 左侧按钮列框架
-left_frame = tk.Frame(root, bg="white")
-left_frame.grid(row=0, column=0, padx=(20, 5), pady=20, sticky=tk.N)
-
-# RUN结果标签（移到最上方）
-result_frame = tk.Frame(left_frame, bg="white")
-result_frame.pack(pady=5)
-tk.Label(result_frame, text="Result:", bg="white").pack(side=tk.LEFT)
-result_label = tk.Label(result_frame, text="Ready", bg="lightgray", width=8, relief="sunken")
-result_label.pack(side=tk.LEFT, padx=(5, 0))
-
-# 左侧按钮列中的RUN和STOP按钮
-run_button = tk.Button(left_frame, text="RUN", command=run_function, bg="red", fg="black", width=10)
-run_button.pack(pady=5)
-
-stop_button = tk.Button(left_frame, text="STOP", command=stop_function, bg="orange", fg="black", width=10)
-stop_button.pack(pady=5)
-# 初始时禁用STOP按钮
-stop_button.config(state=tk.DISABLED)
-
-# SN标签和输入框
-sn_frame = tk.Frame(left_frame, bg="white")
-sn_frame.pack(pady=5)
-tk.Label(sn_frame, text="SN:", bg="white").pack(side=tk.LEFT)
-sn_entry = tk.Entry(sn_frame, width=10)
-sn_entry.pack(side=tk.LEFT, padx=(5, 0))
-
-# Time标签和输入框
-time_frame = tk.Frame(left_frame, bg="white")
-time_frame.pack(pady=5)
-tk.Label(time_frame, text="Time:", bg="white").pack(side=tk.LEFT)
-time_entry = tk.Entry(time_frame, width=8)
-time_entry.pack(side=tk.LEFT, padx=(5, 0))
-
-# 在显示框顶部添加按钮（不含RUN和SN按钮）
-display_frame = tk.Frame(root, bg="white")
-display_frame.grid(row=0, column=1, padx=(5, 20), pady=20, sticky=tk.NW)
-
-button_frame = tk.Frame(display_frame, bg="white")
-button_frame.pack(fill=tk.X, pady=(0, 10))
-
-# 顶部按钮（Test Result, Test Process, Test Command）
-tk.Button(button_frame, text="Test Result", command=export_to_csv, bg="lightblue").pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Test Process", command=show_log_window, bg="lightgreen").pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Test Command", command=show_command_window, bg="lightyellow").pack(side=tk.LEFT, padx=5)
-
-# 显示框（在按钮下方）
-display_text = tk.Text(
-    display_frame,
-    width=85,
-    height=42.5,
-    font=("Arial", 10)
-)
-display_text.pack()
-
-display_text.config(state=tk.DISABLED)
-
-# 设置窗口关闭事件
-root.protocol("WM_DELETE_WINDOW", lambda: [cleanup_serial(), root.destroy()])
-
-# 在程序启动时连接TCP并启动定期读取
-connect_tcp()
-root.after(1000, periodically_read_and_upload)  # 1秒后开始
-
-# 启动主循环
-root.mainloop()
+    """停止测试，清理串口和TCP连接"""
+    station.close(timing_file=TIMING_FILE)
+
+
+def main():
+    """创建测试站和主窗口，启动后台连接并进入主循环"""
+    global station, root, console, display_text
+    # 配置日志记录：写文件和控制台在后台线程完成，app.log按天和大小轮转，app.jsonl为结构化日志
+    setup_logging('app.log', json_file='app.jsonl')
+    station = Station()
+    # 后台轮询读到mmwave设备信息时同时更新SN文本框
+    station.on_device_info = lambda fixture_id, info: run_in_ui(update_sn_display, fixture_id, info)
+
+    # 创建主窗口
+    root = tk.Tk()
+    root.title("H60_mmwave GUI")
+    root.geometry("850x550")
+
+    # 设置主窗口背景色
+    root.configure(bg="green")
+    # 禁止窗口调整大小
+    root.resizable(False, False)
+
+    # 左侧按钮列框架
+    left_frame = tk.Frame(root, bg="white")
+    left_frame.grid(row=0, column=0, padx=(20, 5), pady=20, sticky=tk.N)
+
+    # 所有治具同时开始测试
+    tk.Button(left_frame, text="RUN ALL", command=run_all_function, bg="red", fg="black", width=10).pack(pady=5)
+
+    # 每个治具一个面板（Result、RUN/STOP、SN、Time）
+    for fixture in station.fixture_manager:
+        fixture_panels[fixture.fixture_id] = FixturePanel(left_frame, fixture)
+
+    # 在显示框顶部添加按钮（不含RUN和SN按钮）
+    display_frame = tk.Frame(root, bg="white")
+    display_frame.grid(row=0, column=1, padx=(5, 20), pady=20, sticky=tk.NW)
+
+    button_frame = tk.Frame(display_frame, bg="white")
+    button_frame.pack(fill=tk.X, pady=(0, 10))
+
+    # 顶部按钮（Test Result, Test Process, Test Command）
+    tk.Button(button_frame, text="Test Result", command=export_to_csv, bg="lightblue").pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Test Process", command=show_log_window, bg="lightgreen").pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Test Command", command=show_command_window, bg="lightyellow").pack(side=tk.LEFT, padx=5)
+
+    # 显示框（在按钮下方）
+    display_text = tk.Text(
+        display_frame,
+        width=85,
+        height=42.5,
+        font=("Arial", 10)
+    )
+    display_text.pack()
+
+    display_text.config(state=tk.DISABLED)
+    # 所有线程通过console写入显示框，按帧批量刷新并限制行数
+    console = ConsoleBuffer(display_text, root)
+    console.start()
+
+    # 设置窗口关闭事件
+    root.protocol("WM_DELETE_WINDOW", lambda: [cleanup_serial(), root.destroy()])
+
+    # 在程序启动时连接TCP、启动定期读取并打开治具串口，都在后台进行
+    station.start()
+    root.after(UI_POLL_MS, poll_ui_events)
+
+    # 启动主循环
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""adb长连接会话：保持一个已root的adb shell，多条查询复用同一连接，可批量执行"""
+import logging
+import queue
+import subprocess
+import threading
+import time
+import uuid
+
+import metrics
+
+ADB_COMMAND = 'adb'
+DEFAULT_TIMEOUT = 10.0
+
+COMMAND_DURATION = metrics.histogram('h60_adb_command_duration_seconds', 'adb命令（每批）耗时')
+COMMAND_ERRORS = metrics.counter('h60_adb_command_errors_total', 'adb命令（每批）失败次数')
+
+
+class AdbError(Exception):
+    """adb会话不可用或命令执行失败"""
+
+
+class AdbShellSession:
+    """常驻的adb shell进程
+
+    第一次执行命令时运行一次adb root并启动adb shell，之后所有命令写入同一个shell，
+    每条命令后输出带返回码的结束标记，据此切分各条命令的输出。
+    run_batch把多条命令一次写入，只需要一次往返。
+    shell退出或命令超时后关闭会话，下次调用时重新root并重连；复用中的shell意外退出时自动重试一次。
+    连续连接失败（包括新建的shell立即退出，如没有连接设备）时按指数退避，避免每次轮询都启动adb进程。
+    on_connect在每次新建adb shell后调用（参数为会话），用于清除该设备的缓存信息。
+    """
+
+    def __init__(self, adb=ADB_COMMAND, serial=None, timeout=DEFAULT_TIMEOUT, root=True,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, on_connect=None):
+        self.adb = adb
+        self.serial = serial
+        self.timeout = timeout
+        self.root = root
+        self.on_connect = on_connect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._proc = None
+        self._lines = None
+        self._marker = None
+        self._lock = threading.Lock()
+        self._next_retry = 0.0
+        self._current_delay = reconnect_delay
+
+    def _adb_args(self, *args):
+        prefix = [self.adb] + (['-s', self.serial] if self.serial else [])
+        return prefix + list(args)
+
+    def is_connected(self):
+        """adb shell进程是否在运行"""
+        return self._proc is not None and self._proc.poll() is None
+
+    def run(self, command, timeout=None):
+        """执行一条shell命令，返回(返回码, 输出)"""
+        return self.run_batch([command], timeout)[0]
+
+    def run_batch(self, commands, timeout=None):
+        """一次写入多条命令，按顺序返回每条命令的(返回码, 输出)"""
+        start_time = time.monotonic()
+        try:
+            return self._run_batch(commands, self.timeout if timeout is None else timeout)
+        except AdbError:
+            COMMAND_ERRORS.inc()
+            raise
+        finally:
+            COMMAND_DURATION.observe(time.monotonic() - start_time)
+
+    def _run_batch(self, commands, timeout):
+        with self._lock:
+            for attempt in range(2):
+                reused = self.is_connected()
+                self._ensure_connected()
+                start_time = time.monotonic()
+                script = ''.join(f"{command} 2>&1; echo \"{self._marker} $?\"\n" for command in commands)
+                try:
+                    self._proc.stdin.write(script)
+                    self._proc.stdin.flush()
+                    results = [self._read_result(start_time + timeout) for _ in commands]
+                except (OSError, AdbError) as e:
+                    # 会话状态未知，关闭后重连；shell仍在运行说明是命令超时，不再重试
+                    timed_out = self.is_connected()
+                    self._close()
+                    if not reused and not timed_out:
+                        # 新建的shell没有执行完命令就退出，按连接失败处理
+                        self._connect_failed()
+                    if not reused or attempt or timed_out:
+                        raise AdbError(f"adb命令执行失败: {'; '.join(commands)}, 错误: {str(e)}")
+                    logging.warning(f"adb shell会话已断开，重新连接: {str(e)}")
+                    continue
+                self._current_delay = self.reconnect_delay
+                self._next_retry = 0.0
+                logging.info(f"adb执行 {len(commands)} 条命令，耗时: {(time.monotonic() - start_time) * 1000:.1f}ms")
+                return results
+
+    def getprops(self, names, timeout=None):
+        """一次往返读取多个系统属性，返回 {属性名: 值}"""
+        results = self.run_batch([f"getprop {name}" for name in names], timeout)
+        return {name: output.strip() for name, (_, output) in zip(names, results)}
+
+    def close(self):
+        """关闭adb shell进程"""
+        with self._lock:
+            self._close()
+
+    def _ensure_connected(self):
+        if self.is_connected():
+            return
+        self._close()
+        now = time.monotonic()
+        if now < self._next_retry:
+            raise AdbError(f"adb重连等待中，{self._next_retry - now:.1f}秒后重试")
+        try:
+            if self.root:
+                subprocess.run(self._adb_args('root'), check=True, timeout=self.timeout,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._proc = subprocess.Popen(self._adb_args('shell'), stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                          text=True, bufsize=1)
+        except (OSError, subprocess.SubprocessError) as e:
+            self._close()
+            self._connect_failed()
+            raise AdbError(f"adb连接失败: {str(e)}")
+        self._marker = f"__ADB_END_{uuid.uuid4().hex}__"
+        self._lines = queue.Queue()
+        threading.Thread(target=self._reader, args=(self._proc.stdout, self._lines),
+                         name='adb-reader', daemon=True).start()
+        logging.info("adb shell会话已建立")
+        if self.on_connect:
+            self.on_connect(self)
+
+    def _connect_failed(self):
+        self._next_retry = time.monotonic() + self._current_delay
+        self._current_delay = min(self._current_delay * 2, self.max_reconnect_delay)
+
+    @staticmethod
+    def _reader(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)  # shell已退出
+
+    def _read_result(self, deadline):
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise AdbError("等待adb输出超时")
+            if line is None:
+                raise AdbError("adb shell已退出")
+            index = line.find(self._marker)
+            if index < 0:
+                output.append(line)
+                continue
+            # 命令输出末尾没有换行时，结束标记会和最后一行输出在同一行
+            output.append(line[:index])
+            code = line[index + len(self._marker):].strip()
+            return (int(code) if code.lstrip('-').isdigit() else -1), ''.join(output)
+
+    def _close(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=1)
+            except Exception:
+                pass
+        self._proc = None
+        self._lines = None
@@ -0,0 +1,74 @@
+"""adb查询延迟对比：每次启动adb子进程 vs 常驻adb shell会话
+
+使用模拟器生成的假adb（shell脚本）代替真实设备，对比：
+  1. 旧方式：subprocess.run(adb root) + subprocess.run(adb shell oai-sn get)
+  2. AdbShellSession.run('oai-sn get')
+  3. 逐条读取N个属性 vs AdbShellSession.getprops一次往返读取
+
+用法: python benchmarks/bench_adb.py [--iterations 50] [--props 5] [--spawn-latency 0.02]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adb_session import AdbShellSession  # noqa: E402
+from simulator import install_fake_adb  # noqa: E402
+
+
+def legacy_unit_sn(adb):
+    """旧的get_unit_sn实现：两次启动adb子进程"""
+    subprocess.run([adb, 'root'], check=True, timeout=10, stdout=subprocess.DEVNULL)
+    result = subprocess.run([adb, 'shell', 'oai-sn', 'get'], capture_output=True, text=True, timeout=10)
+    return result.stdout.strip()
+
+
+def measure(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:<36} 平均 {statistics.mean(samples):8.2f}ms  中位数 {statistics.median(samples):8.2f}ms  "
+          f"p95 {p95:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--props', type=int, default=5, help='批量读取的属性个数')
+    parser.add_argument('--spawn-latency', type=float, default=0.02, help='假adb每次启动的额外延迟(秒)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        adb = install_fake_adb(directory, latency=args.spawn_latency)
+        props = [f"ro.fake.prop{i}" for i in range(args.props)]
+
+        session = AdbShellSession(adb=adb)
+        session.run('true')  # 预热：root并建立shell
+
+        print(f"迭代次数: {args.iterations}, 假adb启动延迟: {args.spawn_latency * 1000:.0f}ms")
+        report('subprocess: adb root + oai-sn get', measure(lambda: legacy_unit_sn(adb), args.iterations))
+        report('session: oai-sn get', measure(lambda: session.run('oai-sn get'), args.iterations))
+        report(f'subprocess: {args.props}x getprop',
+               measure(lambda: [subprocess.run([adb, 'shell', 'getprop', p], capture_output=True)
+                                for p in props], args.iterations))
+        report(f'session: {args.props}x getprop 逐条', measure(lambda: [session.run(f'getprop {p}') for p in props],
+                                                           args.iterations))
+        report(f'session: getprops 批量{args.props}个', measure(lambda: session.getprops(props), args.iterations))
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""测试节拍基准：用模拟治具反复运行测试流程，统计单次测试耗时和串口命令吞吐量
+
+使用simulator中的假H60治具、假adb和假nanokdp，不需要任何硬件：
+  1. 在所有治具上同时运行流程文件中的测试流程 --cycles 次，统计每次测试耗时的p50/p95/p99
+  2. 在每个治具上连续发送 --commands 条Version命令，统计命令吞吐量（逐条发送和按 --window 流水线发送）
+  3. 输出各步骤和命令的耗时统计
+
+与之前保存的结果对比，变慢超过容差时返回非0，可用于确认修改没有拖慢测试站：
+  python benchmarks/bench_cycle.py --output baseline.json
+  python benchmarks/bench_cycle.py --baseline baseline.json --tolerance 0.1
+
+用法: python benchmarks/bench_cycle.py [--cycles 50] [--fixtures 2] [--latency 0.005] [--delay-scale 0]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timing  # noqa: E402
+from simulator import FakeH60, install_fake_tools  # noqa: E402
+from station import Station, SEQUENCE_FILE  # noqa: E402
+
+
+def run_cycles(station, cycles):
+    """所有治具同时测试cycles轮（与界面RUN ALL相同的流程），返回(每次测试耗时列表, 结果计数)"""
+    durations = []
+    results = {}
+    for _ in range(cycles):
+        for record in station.run().values():
+            durations.append(record.elapsed)
+            results[record.result] = results.get(record.result, 0) + 1
+    return durations, results
+
+
+def measure_throughput(manager, commands, window=None):
+    """在每个治具上发送commands条Version命令，window不为None时流水线发送，返回每秒命令数"""
+    start_time = time.perf_counter()
+    total = 0
+    for fixture in manager:
+        if window is not None:
+            fixture.send_pipelined(['Version'] * commands, window)
+            total += commands
+            continue
+        for _ in range(commands):
+            fixture.send('Version')
+            total += 1
+    return total / (time.perf_counter() - start_time)
+
+
+def histogram_of(samples):
+    histogram = timing.LatencyHistogram(max_samples=len(samples) or 1)
+    for sample in samples:
+        histogram.add(sample)
+    return histogram.summary()
+
+
+def compare(result, baseline, tolerance):
+    """与基准结果对比，返回变慢的指标说明列表"""
+    regressions = []
+    for key in ('p50_ms', 'p95_ms'):
+        old, new = baseline['cycle'][key], result['cycle'][key]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"单次测试 {key}: {old:.1f}ms -> {new:.1f}ms")
+    old, new = baseline['throughput_cmds_per_s'], result['throughput_cmds_per_s']
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"命令吞吐量: {old:.1f}/s -> {new:.1f}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=50)
+    parser.add_argument('--fixtures', type=int, default=2, help='同时测试的模拟治具个数')
+    parser.add_argument('--commands', type=int, default=200, help='每个治具吞吐量测试的命令数')
+    parser.add_argument('--window', type=int, default=4, help='流水线吞吐量测试同时等待响应的命令数')
+    parser.add_argument('--latency', type=float, default=0.005, help='模拟治具的应答延迟(秒)')
+    parser.add_argument('--cylinder-time', type=float, default=0.0, help='模拟气缸运动时间(秒)')
+    parser.add_argument('--delay-scale', type=float, default=0.0, help='流程中delay步骤的时间缩放，1为原值')
+    parser.add_argument('--sequence', default=SEQUENCE_FILE, help='测试流程文件')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    parser.add_argument('--baseline', help='与之前的结果JSON对比')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许变慢的比例')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)  # 基准测试不上传结果，不输出逐条日志
+
+    with tempfile.TemporaryDirectory() as directory:
+        install_fake_tools(directory)
+        os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+        simulators = [FakeH60(os.path.join(directory, f"h60-{index}"), fixture_sn=f"FXBENCH{index:02d}",
+                              latency=args.latency, cylinder_time=args.cylinder_time, seed=index).start()
+                      for index in range(args.fixtures)]
+        station = Station(fixtures=[{'id': f"SIM-{index}", 'port': simulator.port}
+                                    for index, simulator in enumerate(simulators)],
+                          sequence_file=args.sequence, results_db=os.path.join(directory, 'results.db'))
+        for step in station.test_sequence.plan().steps:
+            if step.type == 'delay':
+                step.seconds *= args.delay_scale
+
+        try:
+            # 预热：打开串口、建立adb会话，不计入统计
+            station.warm_up()
+            station.start_event_pump()
+            timing.recorder.reset()
+
+            start_time = time.perf_counter()
+            durations, results = run_cycles(station, args.cycles)
+            wall_time = time.perf_counter() - start_time
+            throughput = measure_throughput(station.fixture_manager, args.commands)
+            pipelined_throughput = measure_throughput(station.fixture_manager, args.commands, args.window)
+        finally:
+            station.close()
+            for simulator in simulators:
+                simulator.stop()
+
+    result = {
+        'config': {key: getattr(args, key) for key in ('cycles', 'fixtures', 'commands', 'window', 'latency',
+                                                      'cylinder_time', 'delay_scale', 'sequence')},
+        'cycle': histogram_of(durations),
+        'results': results,
+        'units_per_hour': round(len(durations) / wall_time * 3600, 1),
+        'throughput_cmds_per_s': round(throughput, 1),
+        'throughput_pipelined_cmds_per_s': round(pipelined_throughput, 1),
+        'spans': timing.recorder.summary(),
+    }
+
+    cycle = result['cycle']
+    print(f"治具数: {args.fixtures}, 轮数: {args.cycles}, 模拟延迟: {args.latency * 1000:.1f}ms, 结果: {results}")
+    print(f"单次测试耗时  p50 {cycle['p50_ms']:8.1f}ms  p95 {cycle['p95_ms']:8.1f}ms  "
+          f"p99 {cycle['p99_ms']:8.1f}ms  max {cycle['max_ms']:8.1f}ms")
+    print(f"产能: {result['units_per_hour']:.0f} 台/小时, 命令吞吐量: {result['throughput_cmds_per_s']:.1f} 条/秒, "
+          f"流水线: {result['throughput_pipelined_cmds_per_s']:.1f} 条/秒")
+    for name, stats in result['spans'].items():
+        print(f"  {name:<40} n={stats['count']:<6} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+              f"p99 {stats['p99_ms']:8.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("性能下降:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("与基准相比没有变慢")
+
+
+if __name__ == '__main__':
+    main()
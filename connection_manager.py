@@ -0,0 +1,128 @@
+"""后台连接管理：启动时预先打开治具串口和设备会话，定期做轻量的健康检查，断开后按指数退避自动重连
+
+每个连接用Link描述：check()检查连接是否可用（不发送命令，需很快返回），connect()建立连接，
+连接失败时抛出异常或返回假值。TCP上传器自带重连，只在status()中汇报。
+"""
+import logging
+import threading
+import time
+
+DEFAULT_CHECK_INTERVAL = 2.0  # 健康检查间隔(秒)
+
+
+class Link:
+    """一个受管理的连接及其重连状态"""
+
+    def __init__(self, name, check, connect, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.name = name
+        self.check = check
+        self.connect = connect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.up = False
+        self.connects = 0
+        self.last_error = None
+        self._next_retry = 0.0
+        self._current_delay = reconnect_delay
+
+    def poll(self):
+        """检查一次连接，不可用且已到重试时间时重连，返回连接是否可用"""
+        if self.check():
+            self.up = True
+            return True
+        if self.up:
+            logging.warning(f"连接 {self.name} 已断开，开始重连")
+            self.up = False
+        now = time.monotonic()
+        if now < self._next_retry:
+            return False
+        try:
+            if not self.connect():
+                raise ConnectionError("连接失败")
+        except Exception as e:
+            self.last_error = str(e)
+            logging.debug(f"连接 {self.name} 失败，{self._current_delay:.0f}秒后重试: {str(e)}")
+            self._next_retry = time.monotonic() + self._current_delay
+            self._current_delay = min(self._current_delay * 2, self.max_reconnect_delay)
+            return False
+        self.up = True
+        self.connects += 1
+        self.last_error = None
+        self._next_retry = 0.0
+        self._current_delay = self.reconnect_delay
+        logging.info(f"连接 {self.name} 已就绪")
+        return True
+
+    def status(self):
+        return {'up': self.up, 'connects': self.connects, 'last_error': self.last_error}
+
+
+class ConnectionManager:
+    """在后台线程中维护一组连接
+
+    start()后立即在后台建立所有连接，第一次RUN不必等待串口打开和稳定；之后每interval秒检查一次，
+    设备拔出再插回后自动恢复。健康检查不会打断正在执行的命令（治具串口正被占用时视为可用）。
+    """
+
+    def __init__(self, links=(), interval=DEFAULT_CHECK_INTERVAL, uploader=None):
+        self.links = list(links)
+        self.interval = interval
+        self.uploader = uploader  # 返回当前TcpUploader的函数，只用于status()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, link):
+        self.links.append(link)
+        return link
+
+    def start(self):
+        """启动后台线程，立即开始建立连接"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name='connection-manager', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def warm_up(self):
+        """在调用线程中立即检查并建立所有连接，返回 {连接名: 是否可用}"""
+        return {link.name: self._poll(link) for link in self.links}
+
+    def status(self):
+        """返回各连接的状态，以及TCP上传器的连接状态"""
+        status = {link.name: link.status() for link in self.links}
+        uploader = self.uploader() if self.uploader else None
+        if uploader is not None:
+            status['tcp'] = {'up': uploader.connected}
+        return status
+
+    def _worker(self):
+        while True:
+            for link in self.links:
+                if self._stop.is_set():
+                    return
+                self._poll(link)
+            if self._stop.wait(self.interval):
+                return
+
+    @staticmethod
+    def _poll(link):
+        try:
+            return link.poll()
+        except Exception as e:
+            logging.error(f"检查连接 {link.name} 时出错: {str(e)}")
+            return False
+
+
+def fixture_link(fixture, **options):
+    """治具串口的Link：检查串口是否可用，重连时打开串口并等待稳定"""
+    return Link(f"fixture:{fixture.fixture_id}", fixture.check, fixture.get_connection, **options)
+
+
+def session_link(name, session, warm, **options):
+    """设备会话（adb、nanokdp）的Link：warm为建立会话时执行的一条轻量命令"""
+    return Link(name, session.is_connected, warm, **options)
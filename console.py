@@ -0,0 +1,69 @@
+"""显示框控制台：任意线程写入，界面线程按帧批量刷新，保留固定行数"""
+import collections
+import threading
+import tkinter as tk
+
+DEFAULT_MAX_LINES = 2000
+DEFAULT_FLUSH_MS = 33  # 约每秒30帧
+
+
+class ConsoleBuffer:
+    """tk.Text的环形缓冲控制台
+
+    write()可在任意线程调用，只把文本放入待刷新队列；
+    界面线程每flush_ms毫秒把队列中的内容合并为一次插入，
+    并删除超过max_lines的最早行，控件状态每帧只切换一次。
+    待刷新内容本身也有上限，刷新不及时时只保留最新的部分。
+    """
+
+    def __init__(self, widget, root, max_lines=DEFAULT_MAX_LINES, flush_ms=DEFAULT_FLUSH_MS):
+        self.widget = widget
+        self.root = root
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        self._pending = collections.deque(maxlen=max_lines)
+        self._clear_pending = False
+        self._lock = threading.Lock()
+        self._line_count = 1  # Text控件中的行数（末尾总有一个空行）
+
+    def start(self):
+        """开始定时刷新，需在界面线程调用"""
+        self.root.after(self.flush_ms, self._flush_loop)
+
+    def write(self, text):
+        """追加文本（可在任意线程调用）"""
+        with self._lock:
+            self._pending.append(text)
+
+    def clear(self):
+        """清空控制台（可在任意线程调用）"""
+        with self._lock:
+            self._pending.clear()
+            self._clear_pending = True
+
+    def _flush_loop(self):
+        self.flush()
+        self.root.after(self.flush_ms, self._flush_loop)
+
+    def flush(self):
+        """把待刷新的文本一次写入控件，需在界面线程调用"""
+        with self._lock:
+            if not self._pending and not self._clear_pending:
+                return
+            text = ''.join(self._pending)
+            self._pending.clear()
+            clear, self._clear_pending = self._clear_pending, False
+
+        self.widget.config(state=tk.NORMAL)
+        if clear:
+            self.widget.delete('1.0', tk.END)
+            self._line_count = 1
+        if text:
+            self.widget.insert(tk.END, text)
+            self._line_count += text.count('\n')
+            excess = self._line_count - self.max_lines
+            if excess > 0:
+                self.widget.delete('1.0', f"{excess + 1}.0")
+                self._line_count -= excess
+            self.widget.see(tk.END)
+        self.widget.config(state=tk.DISABLED)
@@ -0,0 +1,125 @@
+"""测试执行引擎：在后台线程中运行测试流程，通过事件队列向界面汇报进度"""
+import logging
+import queue
+import threading
+import time
+
+
+class RunCancelled(Exception):
+    """测试被停止时在测试流程中抛出"""
+
+
+class RunContext:
+    """单次测试的运行上下文，测试流程通过它上报进度、检查是否被停止"""
+
+    def __init__(self, fixture_id, events, cancel_event):
+        self.fixture_id = fixture_id
+        self.events = events
+        self.cancel_event = cancel_event
+        self.start_time = time.monotonic()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        """测试开始后经过的秒数"""
+        return time.monotonic() - self.start_time
+
+    def emit(self, kind, **data):
+        """向界面发送一个进度事件"""
+        self.events.put((self.fixture_id, kind, data))
+
+    def check_cancelled(self):
+        """如果测试已被停止则抛出RunCancelled"""
+        if self.cancel_event.is_set():
+            raise RunCancelled()
+
+    def sleep(self, seconds):
+        """可被停止打断的等待"""
+        if self.cancel_event.wait(seconds):
+            raise RunCancelled()
+
+    def on_cancel(self, callback):
+        """注册停止时调用的回调，用于打断阻塞中的读写（如串口的cancel_read）"""
+        with self._lock:
+            if not self.cancel_event.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        """停止测试并执行已注册的回调"""
+        with self._lock:
+            self.cancel_event.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"停止回调执行失败: {str(e)}")
+
+
+class ExecutionEngine:
+    """按治具管理测试线程，同一治具同一时间只允许一个测试在运行
+
+    测试流程是一个接收RunContext的函数，返回值作为测试结果。
+    每个测试结束时会发出且只发出一个终止事件：
+    'done'(result=返回值)、'stopped' 或 'error'(error=异常对象)。
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._runs = {}  # fixture_id -> RunContext
+        self._lock = threading.Lock()
+
+    def is_running(self, fixture_id):
+        """指定治具是否有测试正在运行"""
+        with self._lock:
+            return fixture_id in self._runs
+
+    def start(self, fixture_id, sequence):
+        """在后台线程启动测试流程，治具正忙时返回False"""
+        with self._lock:
+            if fixture_id in self._runs:
+                logging.warning(f"治具 {fixture_id} 正在测试中，忽略重复启动")
+                return False
+            ctx = RunContext(fixture_id, self.events, threading.Event())
+            self._runs[fixture_id] = ctx
+
+        thread = threading.Thread(target=self._worker, args=(ctx, sequence),
+                                  name=f"test-{fixture_id}", daemon=True)
+        thread.start()
+        return True
+
+    def stop(self, fixture_id):
+        """停止指定治具上正在运行的测试"""
+        with self._lock:
+            ctx = self._runs.get(fixture_id)
+        if ctx is None:
+            return False
+        logging.info(f"请求停止治具 {fixture_id} 的测试")
+        ctx.cancel()
+        return True
+
+    def _worker(self, ctx, sequence):
+        try:
+            result = sequence(ctx)
+            # 流程在停止请求之后才返回时，按停止处理
+            ctx.check_cancelled()
+        except RunCancelled:
+            logging.info(f"治具 {ctx.fixture_id} 的测试已停止")
+            kind, data = 'stopped', {}
+        except Exception as e:
+            if ctx.cancel_event.is_set():
+                # 停止时打断读写可能引起异常，同样按停止处理
+                logging.info(f"治具 {ctx.fixture_id} 的测试已停止: {str(e)}")
+                kind, data = 'stopped', {}
+            else:
+                logging.error(f"治具 {ctx.fixture_id} 测试出错: {str(e)}")
+                kind, data = 'error', {'error': e}
+        else:
+            kind, data = 'done', {'result': result}
+        finally:
+            with self._lock:
+                self._runs.pop(ctx.fixture_id, None)
+        ctx.emit(kind, elapsed=ctx.elapsed, **data)
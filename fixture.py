@@ -0,0 +1,381 @@
+"""H60治具：串口命令收发、单个治具的连接管理，以及多治具并行测试管理"""
+import contextlib
+import logging
+import os
+import select
+import threading
+import time
+
+import serial
+
+import metrics
+import traffic_capture
+from execution import ExecutionEngine
+from response_grammar import grammar_for
+from timing import recorder, span
+
+DEFAULT_BAUDRATE = 115200
+CONNECT_SETTLE_TIME = 0.5  # 新建串口连接后等待稳定的时间(秒)
+
+# 命令响应配置：超时时间(秒)、结束符以及多行响应的静默判定时间(秒)
+# 未列出的命令使用默认配置；idle 不为 None 时，收到结束符后再等待 idle 秒无新数据才认为响应结束
+DEFAULT_RESPONSE_TIMEOUT = 2.0
+DEFAULT_TERMINATORS = (b'\n',)
+COMMAND_PROFILES = {
+    'help': {'timeout': 2.0, 'idle': 0.05},
+    'CYLINDER_RESET': {'timeout': 5.0},
+    'CYLINDER_EXERCISE LEFT': {'timeout': 5.0},
+    'CYLINDER_EXERCISE RIGHT': {'timeout': 5.0},
+}
+# 流水线发送：同时等待响应的最大命令数，以及响应与命令的匹配方式
+DEFAULT_PIPELINE_WINDOW = 4
+PIPELINE_MATCH = ('order', 'echo')
+
+# 命令耗时只由timing统计一次（send_command:<命令>），指标端口直接发布其分位数，两处数据不会不一致
+metrics.registry.summary('h60_command_duration_seconds', '治具命令从发送到收到响应的耗时（来自耗时统计）',
+                         lambda: {(command,): stats for command, stats in recorder.quantiles('send_command:').items()},
+                         ('command',))
+COMMAND_TIMEOUTS = metrics.counter('h60_command_timeouts_total', '治具命令超时（未收到完整响应）次数',
+                                   ('port', 'command'))
+SERIAL_BYTES = metrics.counter('h60_serial_bytes_total', '串口收发字节数', ('port', 'direction'))
+
+
+def _drain_abort(ser):
+    """清除pyserial打断管道中尚未被读取消耗的cancel_read信号（只有posix有这个管道）"""
+    pipe = getattr(ser, 'pipe_abort_read_r', None)
+    if pipe is None:
+        return
+    try:
+        while os.read(pipe, 1024):
+            pass
+    except (BlockingIOError, OSError):
+        pass
+
+
+def _read_chunk(ser, timeout):
+    """最多等待timeout秒读取一块数据，有数据立即返回，超时或被cancel_read打断时返回b''
+
+    posix上直接select串口和pyserial的打断管道，不修改ser.timeout（每次修改都会重新配置termios）；
+    其他平台按剩余时间设置超时后由read阻塞等待。
+    """
+    waiting = ser.in_waiting
+    if waiting:
+        return ser.read(waiting)
+    abort = getattr(ser, 'pipe_abort_read_r', None)
+    if abort is None:
+        ser.timeout = timeout
+        return ser.read(1)
+    ready, _, _ = select.select([ser.fileno(), abort], [], [], timeout)
+    if abort in ready:
+        _drain_abort(ser)
+        return b''
+    if not ready:
+        return b''
+    return ser.read(max(1, ser.in_waiting))
+
+
+def read_response(ser, timeout=DEFAULT_RESPONSE_TIMEOUT, terminators=DEFAULT_TERMINATORS, idle=None, stream=None):
+    """阻塞读取设备响应，收到结束符后立即返回，超时返回已收到的数据
+
+    stream为response_grammar.ResponseStream时边读边判定，某一行已能判定（如返回ERROR）时立即返回，
+    不再等待结束符或多行响应的静默时间。
+    """
+    buffer = bytearray()
+    deadline = time.monotonic() + timeout
+    complete = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if complete:
+            # 多行响应：结束符之后在静默时间内没有新数据即认为结束
+            remaining = min(remaining, idle)
+        if remaining <= 0:
+            break
+        chunk = _read_chunk(ser, remaining)  # 阻塞等待，有数据立即返回
+        if not chunk:
+            break
+        traffic_capture.rx(ser.port, chunk)
+        buffer += chunk
+        if stream is not None and stream.feed(chunk) is not None:
+            break
+        if any(buffer.endswith(t) for t in terminators):
+            if idle is None:
+                break
+            complete = True
+    return bytes(buffer)
+
+
+def send_command(ser, command, timeout=None, terminators=None, grammar=None):
+    """发送命令到设备，按响应语法（默认为命令的默认语法）边读边判定，能判定时立即返回"""
+    profile = COMMAND_PROFILES.get(command, {})
+    if grammar is None:
+        grammar = grammar_for(command)
+    if timeout is None:
+        timeout = profile.get('timeout', DEFAULT_RESPONSE_TIMEOUT)
+    if terminators is None:
+        terminators = profile.get('terminators', DEFAULT_TERMINATORS)
+
+    with span(f"send_command:{command}"):
+        ser.reset_input_buffer()  # 丢弃上一条命令遗留的数据，避免响应错位
+        full_command = command + '\r\n'
+        start_time = time.monotonic()
+        ser.write(full_command.encode('ascii'))
+        traffic_capture.tx(ser.port, full_command.encode('ascii'))
+
+        # 读取响应
+        raw = read_response(ser, timeout, terminators, profile.get('idle'),
+                            grammar.stream() if grammar is not None else None)
+        response = raw.decode('ascii', errors='ignore')
+        latency = time.monotonic() - start_time
+
+    SERIAL_BYTES.inc(ser.port, 'out', amount=len(full_command))
+    SERIAL_BYTES.inc(ser.port, 'in', amount=len(raw))
+    if not any(raw.endswith(t) for t in terminators):
+        COMMAND_TIMEOUTS.inc(ser.port, command)
+
+    logging.info(f"发送命令: {command}, 响应: {response}, 耗时: {latency * 1000:.1f}ms",
+                 extra={'command': command, 'latency_ms': round(latency * 1000, 1), 'port': ser.port})
+    return response
+
+
+def _match_echo(line, in_flight, commands):
+    """返回响应行对应的in_flight下标：响应中带有命令回显时按回显匹配，否则归给最早的命令"""
+    for position, (index, _) in enumerate(in_flight):
+        if commands[index] in line:
+            return position
+    return 0
+
+
+def send_pipelined(ser, commands, window=DEFAULT_PIPELINE_WINDOW, match='order', timeout=None):
+    """流水线发送多条命令，按命令顺序返回各自的响应，超时或未收到的响应为空字符串
+
+    最多window条命令同时等待响应，收到一条响应就补发下一条，window为None时一次写入全部命令（宏）。
+    只适用于单行响应的命令，治具需能缓存多条命令并按收到的顺序应答。
+    match为order时按顺序把响应行分配给命令，最早的命令超时后无法再对齐，剩余命令不再发送；
+    为echo时优先按响应中的命令回显匹配（如 "CYLINDER_EXERCISE LEFT OK"），超时的命令不影响其他命令。
+    """
+    if match not in PIPELINE_MATCH:
+        raise ValueError(f"match只能是 {' 或 '.join(PIPELINE_MATCH)}")
+    for command in commands:
+        if COMMAND_PROFILES.get(command, {}).get('idle') is not None:
+            raise ValueError(f"多行响应的命令不能流水线发送: {command}")
+    window = len(commands) if window is None else max(1, window)
+    responses = [''] * len(commands)
+    in_flight = []  # (命令下标, 截止时间)，按发送顺序
+    next_index = 0
+    buffer = bytearray()
+
+    with span(f"send_pipelined:{len(commands)}"):
+        ser.reset_input_buffer()
+        start_time = time.monotonic()
+        while next_index < len(commands) or in_flight:
+            # 补满窗口，新命令一次写入
+            batch = []
+            while next_index < len(commands) and len(in_flight) < window:
+                command = commands[next_index]
+                limit = timeout if timeout is not None else \
+                    COMMAND_PROFILES.get(command, {}).get('timeout', DEFAULT_RESPONSE_TIMEOUT)
+                in_flight.append((next_index, time.monotonic() + limit))
+                batch.append(command + '\r\n')
+                next_index += 1
+            if batch:
+                data = ''.join(batch).encode('ascii')
+                ser.write(data)
+                traffic_capture.tx(ser.port, data, append=next_index > len(batch))
+                SERIAL_BYTES.inc(ser.port, 'out', amount=len(data))
+
+            now = time.monotonic()
+            expired = [item for item in in_flight if item[1] <= now]
+            if expired:
+                logging.warning(f"流水线命令超时: {', '.join(commands[index] for index, _ in expired)}")
+                for index, _ in expired:
+                    COMMAND_TIMEOUTS.inc(ser.port, commands[index])
+                if match == 'order':
+                    break
+                in_flight = [item for item in in_flight if item[1] > now]
+                continue
+
+            chunk = _read_chunk(ser, min(deadline for _, deadline in in_flight) - now)
+            if not chunk:
+                if time.monotonic() < min(deadline for _, deadline in in_flight):
+                    break  # 读取被cancel_read打断
+                continue
+            buffer += chunk
+            traffic_capture.rx(ser.port, chunk)
+            SERIAL_BYTES.inc(ser.port, 'in', amount=len(chunk))
+            while b'\n' in buffer and in_flight:
+                end = buffer.index(b'\n') + 1
+                line = bytes(buffer[:end]).decode('ascii', errors='ignore')
+                del buffer[:end]
+                if not line.strip():
+                    continue
+                position = 0 if match == 'order' else _match_echo(line, in_flight, commands)
+                index, _ = in_flight.pop(position)
+                responses[index] = line
+        latency = time.monotonic() - start_time
+
+    logging.info(f"流水线发送 {len(commands)} 条命令，耗时: {latency * 1000:.1f}ms",
+                 extra={'command': ';'.join(commands), 'latency_ms': round(latency * 1000, 1), 'port': ser.port})
+    return responses
+
+
+class Fixture:
+    """一个H60治具：串口参数、串口连接和访问锁
+
+    同一治具上的命令通过lock串行执行，测试流程和手动命令不会交错读写串口。
+    on_connect在每次新建串口连接后调用（参数为治具），用于清除该治具的缓存信息。
+    命令执行中串口出错时关闭连接，下次使用时（或由ConnectionManager在后台）重新连接。
+    """
+
+    def __init__(self, fixture_id, port, baudrate=DEFAULT_BAUDRATE, name=None, on_connect=None):
+        self.fixture_id = fixture_id
+        self.port = port
+        self.baudrate = baudrate
+        self.name = name or fixture_id
+        self.on_connect = on_connect
+        self.lock = threading.RLock()
+        self._serial = None
+        # cancel_read只在命令执行期间打断读取；空闲时打断会在管道中留下信号，使下一条命令立即返回空响应
+        self._read_guard = threading.Lock()
+        self._reading = False
+        self._cancelled = False
+
+    def get_connection(self):
+        """获取串口连接，如果未连接则新建连接，失败返回None"""
+        with self.lock:
+            if self._serial is None or not self._serial.is_open:
+                try:
+                    self._serial = serial.Serial(self.port, self.baudrate, timeout=2)
+                    if self.on_connect:
+                        self.on_connect(self)
+                    time.sleep(CONNECT_SETTLE_TIME)  # 等待连接稳定
+                except serial.SerialException as e:
+                    logging.error(f"无法连接串口 {self.port}: {str(e)}")
+                    self._serial = None
+                    return None
+            return self._serial
+
+    def send(self, command, timeout=None, terminators=None, grammar=None):
+        """在治具上执行一条命令并返回响应，串口不可用时抛出SerialException"""
+        with self.lock:
+            ser = self.get_connection()
+            if ser is None:
+                raise serial.SerialException(f"无法获取串口连接: {self.port}")
+            try:
+                with self._interruptible(ser):
+                    return send_command(ser, command, timeout, terminators, grammar)
+            except (serial.SerialException, OSError):
+                # 治具可能已拔出，关闭连接以便重新打开
+                self.close()
+                raise
+
+    @property
+    def connected(self):
+        ser = self._serial
+        return ser is not None and ser.is_open
+
+    def check(self):
+        """检查串口是否仍然可用（不发送命令），出错时关闭连接；串口正在使用时视为可用"""
+        if not self.lock.acquire(blocking=False):
+            return True
+        try:
+            if not self.connected:
+                return False
+            try:
+                self._serial.in_waiting  # 设备拔出后查询缓冲区会出错
+                return True
+            except (serial.SerialException, OSError) as e:
+                logging.warning(f"治具 {self.name} 串口 {self.port} 不可用: {str(e)}")
+                self.close()
+                return False
+        finally:
+            self.lock.release()
+
+    def send_pipelined(self, commands, window=DEFAULT_PIPELINE_WINDOW, match='order', timeout=None):
+        """在治具上流水线发送多条命令，按命令顺序返回响应，见send_pipelined"""
+        with self.lock:
+            ser = self.get_connection()
+            if ser is None:
+                raise serial.SerialException(f"无法获取串口连接: {self.port}")
+            try:
+                with self._interruptible(ser):
+                    return send_pipelined(ser, commands, window, match, timeout)
+            except (serial.SerialException, OSError):
+                self.close()
+                raise
+
+    @contextlib.contextmanager
+    def _interruptible(self, ser):
+        """标记命令正在执行，期间cancel_read会打断读取；结束时清除读取之后才到达的打断信号"""
+        with self._read_guard:
+            self._reading = True
+            self._cancelled = False
+        try:
+            yield
+        finally:
+            with self._read_guard:
+                self._reading = False
+                cancelled = self._cancelled
+            if cancelled:
+                _drain_abort(ser)
+
+    def cancel_read(self):
+        """打断正在进行的串口读取（可在其他线程调用），没有命令在执行时不做任何事"""
+        with self._read_guard:
+            ser = self._serial
+            if self._reading and ser is not None and ser.is_open:
+                self._cancelled = True
+                ser.cancel_read()
+
+    def close(self):
+        """关闭串口连接"""
+        with self.lock:
+            if self._serial is not None and self._serial.is_open:
+                self._serial.close()
+            self._serial = None
+
+
+class FixtureManager:
+    """管理多个治具，每个治具在独立的工作线程中运行各自的测试流程
+
+    测试流程是一个接收(RunContext, Fixture)的函数；同一治具同一时间只运行一个测试，
+    不同治具的测试互不等待。进度事件统一放入engine.events，事件中带有治具编号。
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or ExecutionEngine()
+        self.fixtures = {}  # fixture_id -> Fixture，保持添加顺序
+
+    def add(self, fixture):
+        self.fixtures[fixture.fixture_id] = fixture
+        return fixture
+
+    def get(self, fixture_id):
+        return self.fixtures[fixture_id]
+
+    def __iter__(self):
+        return iter(self.fixtures.values())
+
+    def is_running(self, fixture_id):
+        return self.engine.is_running(fixture_id)
+
+    def start(self, fixture_id, sequence):
+        """在指定治具上启动测试，治具正忙时返回False"""
+        fixture = self.fixtures[fixture_id]
+        return self.engine.start(fixture_id, lambda ctx: sequence(ctx, fixture))
+
+    def start_all(self, sequence):
+        """在所有空闲治具上同时启动测试，返回已启动的治具编号"""
+        return [fixture_id for fixture_id in self.fixtures if self.start(fixture_id, sequence)]
+
+    def stop(self, fixture_id):
+        return self.engine.stop(fixture_id)
+
+    def stop_all(self):
+        for fixture_id in self.fixtures:
+            self.engine.stop(fixture_id)
+
+    def close_all(self):
+        """停止所有测试并关闭所有串口"""
+        self.stop_all()
+        for fixture in self.fixtures.values():
+            fixture.close()
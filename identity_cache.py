@@ -0,0 +1,62 @@
+"""设备身份信息缓存：mmWave型号、Unit_SN、Fixture_SN等按设备保存，带过期时间"""
+import threading
+import time
+
+DEFAULT_TTL = 60.0
+
+
+class IdentityCache:
+    """按设备键（串口路径、'mmwave'、'adb'等）缓存身份字段
+
+    每个字段有独立的过期时间(秒)，可在ttls中按字段名配置。
+    设备重连或更换产品时调用invalidate清除对应设备的缓存。
+    所有方法线程安全，后台轮询线程负责写入，界面和测试线程读取。
+    """
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._entries = {}  # (key, field) -> (value, 写入时间)
+        self._lock = threading.Lock()
+
+    def get(self, key, field):
+        """返回未过期的缓存值，没有或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get((key, field))
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttls.get(field, self.default_ttl):
+                del self._entries[(key, field)]
+                return None
+            return value
+
+    def put(self, key, field, value):
+        """写入缓存，返回(值是否变化, 旧值)"""
+        with self._lock:
+            old = self._entries.get((key, field))
+            self._entries[(key, field)] = (value, time.monotonic())
+        old_value = old[0] if old else None
+        return old_value != value, old_value
+
+    def get_or_fetch(self, key, field, fetch, accept=None):
+        """有缓存时直接返回，否则调用fetch()读取；结果通过accept检查(默认非空)后写入缓存"""
+        value = self.get(key, field)
+        if value is not None:
+            return value
+        value = fetch()
+        if (accept(value) if accept else value):
+            self.put(key, field, value)
+        return value
+
+    def invalidate(self, key, field=None):
+        """清除某个设备的全部缓存，或只清除其中一个字段"""
+        with self._lock:
+            for entry_key in list(self._entries):
+                if entry_key[0] == key and (field is None or entry_key[1] == field):
+                    del self._entries[entry_key]
+
+    def clear(self):
+        """清除所有缓存"""
+        with self._lock:
+            self._entries.clear()
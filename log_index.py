@@ -0,0 +1,317 @@
+"""历史日志索引：把app.log及其轮转文件中的每一行解析为时间、级别、命令和SN，记录字节偏移，查询时直接定位到匹配的行
+
+索引保存在日志旁边的SQLite文件（默认app.log.idx）中，每次update()只解析上次之后新增的完整行：
+    files         每个日志文件一行：路径、inode、文件头签名、已索引的字节数，以及最后一条日志的时间和级别
+    lines_<id>    该文件每行一条：行首偏移、时间、级别、命令、SN（多行日志的后续行沿用所在日志的时间和级别）
+    text_<id>     该文件每行消息部分的全文索引（FTS5 trigram，不保存原文和位置），关键字查询不需要扫描日志
+文件按inode识别，轮转改名后不会重新索引；文件被删除、截断或inode被复用时删除对应的表。
+日志按时间顺序写入，按时间段查询时用二分查找确定行号范围，时间列不需要索引。
+
+    index = LogIndex('app.log')
+    index.update()
+    for match in index.search(since='2026-10-01', level='ERROR', keyword='无法连接串口'):
+        print(match.path, match.offset, match.text)
+"""
+import collections
+import glob
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from results_store import to_timestamp
+
+INDEX_SUFFIX = '.idx'
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+SIGNATURE_BYTES = 64  # 用文件开头的字节识别inode被复用的新文件
+DEFAULT_LIMIT = 1000
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR,
+          'CRITICAL': logging.CRITICAL}
+INDEXED_LEVEL = logging.WARNING  # 只为这个级别及以上的行建立级别索引，INFO占绝大多数，按级别查询时直接扫描
+TRIGRAM_MIN_LENGTH = 3  # trigram索引只能查找至少3个字符的关键字，更短的关键字逐行比较
+
+LINE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - ([A-Z]+) - ')
+COMMAND_PATTERN = re.compile(r'(?:发送命令|命令执行成功|命令执行失败)[:：]\s*([^,，\r\n]+)')
+SN_PATTERN = re.compile(r'(?:Unit_SN|FixtureSN|unit_sn|fixture_sn)\s*[:：=]\s*([A-Za-z0-9][\w\-]+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    indexed_bytes INTEGER NOT NULL DEFAULT 0,
+    first_ts REAL,
+    last_ts REAL,
+    last_level INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_files_inode ON files(device, inode);
+"""
+
+FILE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines_{id} (
+    id INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    ts REAL,
+    level INTEGER,
+    command TEXT,
+    sn TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lines_{id}_level ON lines_{id}(level) WHERE level >= {indexed_level};
+CREATE INDEX IF NOT EXISTS idx_lines_{id}_command ON lines_{id}(command) WHERE command IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_lines_{id}_sn ON lines_{id}(sn) WHERE sn IS NOT NULL;
+"""
+
+# 一条匹配的日志行；offset为行首在path中的字节偏移
+LogMatch = collections.namedtuple('LogMatch', 'path offset time level text')
+
+
+def log_files(log_file):
+    """返回log_file及其轮转文件，按修改时间从旧到新排列（不包括索引文件）"""
+    index_prefix = log_file + INDEX_SUFFIX
+    paths = [path for path in glob.glob(glob.escape(log_file) + '.*') if not path.startswith(index_prefix)]
+    if os.path.exists(log_file):
+        paths.append(log_file)
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path != log_file))
+
+
+def _trigram_query(keyword):
+    """把关键字拆成其中所有三字符片段的AND查询（detail=none不支持短语查询，结果由调用方再逐行确认）"""
+    trigrams = dict.fromkeys(keyword[i:i + TRIGRAM_MIN_LENGTH] for i in range(len(keyword) - TRIGRAM_MIN_LENGTH + 1))
+    return ' AND '.join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)
+
+
+def _fts_available(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe "
+                     "USING fts5(text, tokenize='trigram', content='', detail='none')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class LogIndex:
+    """app.log及其轮转文件的增量索引，线程安全；update()可以在后台线程中定期调用"""
+
+    def __init__(self, log_file='app.log', index_file=None, encoding='utf-8'):
+        self.log_file = log_file
+        self.index_file = index_file or log_file + INDEX_SUFFIX
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_file, check_same_thread=False)
+        self._conn.execute('PRAGMA auto_vacuum=INCREMENTAL')  # 只对新建的索引文件生效，删除旧日志的表后回收空间
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self.full_text = _fts_available(self._conn)
+        if not self.full_text:
+            logging.warning("SQLite不支持FTS5 trigram，日志关键字查询将逐行比较")
+        self._time_cache = (None, None)  # (上一行的秒级时间文本, epoch秒)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---- 建立索引 ----
+
+    def update(self):
+        """索引所有日志文件中新增的完整行，返回新增的行数"""
+        added = 0
+        with self._lock:
+            paths = log_files(self.log_file)
+            seen = set()
+            for path in paths:
+                try:
+                    with open(path, 'rb') as f:
+                        st = os.fstat(f.fileno())
+                        file_id = self._file_id(path, st, f.read(SIGNATURE_BYTES))
+                        seen.add(file_id)
+                        added += self._index_file(file_id, f, st.st_size)
+                except FileNotFoundError:
+                    continue  # 正在轮转
+            removed = [file_id for (file_id,) in self._conn.execute("SELECT id FROM files") if file_id not in seen]
+            for file_id in removed:
+                self._drop_file(file_id)
+            self._conn.commit()
+            if removed:
+                self._conn.executescript('PRAGMA incremental_vacuum;')
+        return added
+
+    def _file_id(self, path, st, signature):
+        """返回文件在files表中的编号，文件第一次出现或已被截断、替换时重新建表"""
+        row = self._conn.execute("SELECT id, path, signature, indexed_bytes FROM files WHERE device = ? AND inode = ?",
+                                 (st.st_dev, st.st_ino)).fetchone()
+        if row is not None:
+            file_id, known_path, known_signature, indexed_bytes = row
+            if st.st_size < indexed_bytes or signature[:len(known_signature)] != known_signature:
+                self._drop_file(file_id)
+                row = None
+            else:
+                if len(signature) > len(known_signature) or known_path != path:
+                    # 轮转只是改名，沿用已有的索引
+                    self._conn.execute("UPDATE files SET path = ?, signature = ? WHERE id = ?",
+                                       (path, signature, file_id))
+                return file_id
+        file_id = self._conn.execute("INSERT INTO files (path, device, inode, signature) VALUES (?, ?, ?, ?)",
+                                     (path, st.st_dev, st.st_ino, signature)).lastrowid
+        self._conn.executescript(FILE_SCHEMA.format(id=file_id, indexed_level=INDEXED_LEVEL))
+        if self.full_text:
+            self._conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS text_{file_id} "
+                               f"USING fts5(text, tokenize='trigram', content='', detail='none')")
+        return file_id
+
+    def _drop_file(self, file_id):
+        self._conn.execute(f"DROP TABLE IF EXISTS lines_{file_id}")
+        self._conn.execute(f"DROP TABLE IF EXISTS text_{file_id}")
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, file_id, f, size):
+        offset, first_ts, *state = self._conn.execute(
+            "SELECT indexed_bytes, first_ts, last_ts, last_level FROM files WHERE id = ?",
+            (file_id,)).fetchone()
+        added = 0
+        f.seek(offset)
+        while offset < size:
+            data = f.read(min(READ_BLOCK_SIZE, size - offset))
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                if len(data) < READ_BLOCK_SIZE:
+                    break  # 最后一行还没写完，下次再索引
+                end = len(data)  # 超长的一行按块切开
+            rows, texts = self._parse(data[:end], offset, state)
+            self._conn.executemany(f"INSERT INTO lines_{file_id} (offset, ts, level, command, sn) VALUES (?, ?, ?, ?, ?)",
+                                   rows)
+            if self.full_text:
+                first_row = self._conn.execute(f"SELECT max(id) FROM lines_{file_id}").fetchone()[0] - len(rows) + 1
+                self._conn.executemany(f"INSERT INTO text_{file_id} (rowid, text) VALUES (?, ?)",
+                                       zip(range(first_row, first_row + len(rows)), texts))
+            if first_ts is None:
+                first_ts = next((row[1] for row in rows if row[1] is not None), None)
+            offset += end
+            added += len(rows)
+            f.seek(offset)
+        self._conn.execute("UPDATE files SET indexed_bytes = ?, first_ts = ?, last_ts = ?, last_level = ? WHERE id = ?",
+                           (offset, first_ts, *state, file_id))
+        return added
+
+    def _parse(self, data, start, state):
+        """解析完整的行，返回(索引行, 全文索引的文本)；state为[时间, 级别]，多行日志的后续行沿用"""
+        rows = []
+        texts = []
+        position = 0
+        while position < len(data):
+            end = data.find(b'\n', position) + 1 or len(data)
+            text = data[position:end].decode(self.encoding, errors='replace')
+            match = LINE_PATTERN.match(text)
+            if match:
+                message = text[match.end():]
+                command = COMMAND_PATTERN.search(message)
+                sn = SN_PATTERN.search(message)
+                state[:] = [self._timestamp(match.group(1)) + int(match.group(2)) / 1000.0,
+                            LEVELS.get(match.group(3), logging.NOTSET)]
+                rows.append((start + position, *state, command.group(1).strip() if command else None,
+                             sn.group(1) if sn else None))
+                texts.append(message)
+            else:
+                rows.append((start + position, *state, None, None))
+                texts.append(text)
+            position = end
+        return rows, texts
+
+    def _timestamp(self, text):
+        # 同一秒内的日志很多，只在秒变化时调用strptime
+        cached_text, cached_value = self._time_cache
+        if text != cached_text:
+            cached_value = time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S'))
+            self._time_cache = (text, cached_value)
+        return cached_value
+
+    # ---- 查询 ----
+
+    def search(self, since=None, until=None, level=None, keyword=None, command=None, sn=None, limit=DEFAULT_LIMIT):
+        """按时间段、级别、关键字、命令和SN查询日志行，按时间从早到晚返回LogMatch
+
+        since/until为epoch秒或'YYYY-MM-DD[ HH:MM[:SS]]'本地时间；level为级别名或级别名列表；
+        keyword不区分大小写，匹配日志消息（多行日志的每一行分别匹配）。只查询已索引的内容，需要时先调用update()。
+        """
+        since, until = to_timestamp(since), to_timestamp(until)
+        levels = [level] if isinstance(level, str) else list(level or ())
+        conditions, params = [], []
+        if levels:
+            numbers = sorted({LEVELS[level.upper()] for level in levels})
+            conditions.append(f"l.level IN ({', '.join(str(number) for number in numbers)})")
+            if numbers[0] >= INDEXED_LEVEL:
+                conditions.append(f"l.level >= {INDEXED_LEVEL}")  # 与部分索引的条件一致才会使用索引
+        if command:
+            conditions.append("l.command = ?")
+            params.append(command)
+        if sn:
+            conditions.append("l.sn = ?")
+            params.append(sn)
+        use_text = bool(keyword) and self.full_text and len(keyword) >= TRIGRAM_MIN_LENGTH
+        if use_text:
+            conditions.append("text_{id} MATCH ?")  # detail=none不支持按列查询，用表名匹配
+            params.append(_trigram_query(keyword))
+
+        matches = []
+        with self._lock:
+            files = self._conn.execute(
+                "SELECT id, path FROM files WHERE (? IS NULL OR last_ts IS NULL OR last_ts >= ?) "
+                "AND (? IS NULL OR first_ts IS NULL OR first_ts < ?) ORDER BY first_ts",
+                (since, since, until, until)).fetchall()
+            for file_id, path in files:
+                first = self._first_line_at(file_id, since) if since is not None else 0
+                end = self._first_line_at(file_id, until) if until is not None else None
+                where = ' AND '.join(["l.id >= ?"] + (["l.id < ?"] if end is not None else []) + conditions)
+                bounds = [first] + ([end] if end is not None else [])
+                join = f"JOIN text_{file_id} ON text_{file_id}.rowid = l.id" if use_text else ''
+                rows = self._conn.execute(f"SELECT l.offset, l.ts, l.level FROM lines_{file_id} l {join} "
+                                          f"WHERE {where.format(id=file_id)} ORDER BY l.id", bounds + params)
+                matches.extend(self._read_lines(path, rows, keyword, limit - len(matches)))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def _first_line_at(self, file_id, timestamp):
+        """二分查找文件中第一条时间不早于timestamp的行号（行号连续，时间随行号递增）"""
+        low, high = self._conn.execute(f"SELECT min(id), max(id) + 1 FROM lines_{file_id}").fetchone()
+        if low is None:
+            return 0
+        while low < high:
+            middle = (low + high) // 2
+            ts = self._conn.execute(f"SELECT ts FROM lines_{file_id} WHERE id = ?", (middle,)).fetchone()[0]
+            if ts is not None and ts >= timestamp:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _read_lines(self, path, rows, keyword, limit):
+        """按偏移读取匹配的行并比较关键字（全文索引不保存位置，可能有误匹配）"""
+        folded = keyword.casefold() if keyword else None
+        matches = []
+        try:
+            with open(path, 'rb') as f:
+                for offset, ts, level in rows:
+                    f.seek(offset)
+                    text = f.readline().decode(self.encoding, errors='replace')
+                    if folded and folded not in text.casefold():
+                        continue
+                    matches.append(LogMatch(path, offset, ts, logging.getLevelName(level) if level else None, text))
+                    if len(matches) >= limit:
+                        break
+        except FileNotFoundError:
+            pass  # 查询期间被轮转删除
+        return matches
+
+    def stats(self):
+        """各日志文件的索引情况"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, path, indexed_bytes, first_ts, last_ts FROM files ORDER BY first_ts")
+            return [{'path': path, 'indexed_bytes': indexed_bytes, 'first_ts': first_ts, 'last_ts': last_ts,
+                     'lines': self._conn.execute(f"SELECT count(*) FROM lines_{file_id}").fetchone()[0]}
+                    for file_id, path, indexed_bytes, first_ts, last_ts in rows.fetchall()]
@@ -0,0 +1,92 @@
+"""日志配置：日志记录经队列交给后台线程写入，支持按大小和时间轮转，可选JSON行格式输出"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# 结构化日志中从记录的extra里取出的字段
+STRUCTURED_FIELDS = ('command', 'latency_ms', 'port', 'unit_sn', 'fixture_sn', 'result')
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """按时间轮转，同时在文件超过max_bytes时提前轮转"""
+
+    def __init__(self, filename, max_bytes=0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0 and self.stream is not None:
+            self.stream.seek(0, os.SEEK_END)
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # 同一时间段内按大小多次轮转时文件名会重复，加上序号区分
+        name = super().rotation_filename(default_name)
+        index = 1
+        candidate = name
+        while os.path.exists(candidate):
+            candidate = f"{name}.{index:03d}"
+            index += 1
+        return candidate
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，包含时间、级别、消息以及命令、耗时、端口、SN等结构化字段"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_file='app.log', json_file=None, level=logging.INFO, max_bytes=10 * 1024 * 1024,
+                  when='midnight', backup_count=14, console=True):
+    """配置根日志：调用线程只把记录放入队列，文件和控制台输出由后台监听线程完成
+
+    日志文件按when指定的时间间隔轮转，超过max_bytes时也会轮转，保留backup_count个旧文件。
+    json_file不为空时额外输出JSON行格式的结构化日志。返回的QueueListener在程序退出时自动停止，调用方无需再停止。
+    """
+    handlers = []
+    file_handler = SizedTimedRotatingFileHandler(log_file, max_bytes=max_bytes, when=when,
+                                                 backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers.append(file_handler)
+    if json_file:
+        json_handler = SizedTimedRotatingFileHandler(json_file, max_bytes=max_bytes, when=when,
+                                                     backupCount=backup_count, encoding='utf-8')
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,116 @@
+"""日志文件增量读取：记住读取位置只读新增内容，支持日志轮转和向前按需加载"""
+import os
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class LogTail:
+    """按字节偏移增量读取日志文件
+
+    open_tail()读取文件末尾的若干行；read_new()只读取上次之后追加的内容；
+    read_older()从当前已加载的最早一行向前再读若干行。
+    返回的每一行都是(行首字节偏移, 文本)，便于调用方记录已显示内容的位置。
+    文件被轮转（inode变化或文件变短）时从新文件开头重新读取。
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._offset = 0  # 下次读取新内容的位置
+        self._head = 0  # 已加载的最早一行的起始位置
+        self._partial = b''  # 尚未以换行结束的末尾内容
+        self._inode = None
+
+    @property
+    def has_older(self):
+        """是否还有更早的行可以加载"""
+        return self._head > 0
+
+    def set_head(self, offset):
+        """调用方丢弃了前面的行时，更新最早一行的位置"""
+        self._head = offset
+
+    def open_tail(self, max_lines):
+        """定位到文件末尾，返回最后max_lines行"""
+        self._partial = b''
+        try:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                self._inode = st.st_ino
+                self._offset = st.st_size
+                self._head = st.st_size
+                lines = self._read_backwards(f, st.st_size, max_lines)
+        except FileNotFoundError:
+            self._inode = None
+            self._offset = self._head = 0
+            return []
+        if lines:
+            self._head = lines[0][0]
+        # 最后一行可能还没写完，留给下次read_new
+        if lines and not lines[-1][1].endswith('\n'):
+            offset, text = lines.pop()
+            self._offset = offset
+        return lines
+
+    def read_new(self):
+        """读取上次之后新增的完整行，返回(行列表, 是否发生了轮转)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return [], False
+        rotated = self._inode is not None and (st.st_ino != self._inode or st.st_size < self._offset)
+        if rotated:
+            self._offset = self._head = 0
+            self._partial = b''
+        self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return [], rotated
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        start = self._offset - len(self._partial)
+        data = self._partial + data
+        self._offset += len(data) - len(self._partial)
+
+        end = data.rfind(b'\n') + 1
+        self._partial = data[end:]
+        return self._split(data[:end], start), rotated
+
+    def read_older(self, max_lines):
+        """返回当前最早一行之前的max_lines行"""
+        if self._head <= 0:
+            return []
+        try:
+            with open(self.path, 'rb') as f:
+                lines = self._read_backwards(f, self._head, max_lines)
+        except FileNotFoundError:
+            return []
+        if lines:
+            self._head = lines[0][0]
+        return lines
+
+    def _read_backwards(self, f, end, max_lines):
+        """从end位置向前按块读取，直到凑够max_lines行或到达文件开头"""
+        position = end
+        data = b''
+        while position > 0 and data.count(b'\n') <= max_lines:
+            size = min(READ_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+        lines = self._split(data, position)
+        if position > 0:
+            # 第一行不完整，丢弃
+            lines = lines[1:]
+        return lines[-max_lines:] if max_lines else []
+
+    def _split(self, data, start):
+        """按LF切分并保留行尾，日志消息中单独的CR不作为分行"""
+        lines = []
+        position = 0
+        while position < len(data):
+            end = data.find(b'\n', position) + 1 or len(data)
+            lines.append((start + position, data[position:end].decode(self.encoding, errors='replace')))
+            position = end
+        return lines
@@ -0,0 +1,32 @@
+"""并发读取导出所需的设备信息，每个数据源有独立超时，慢的数据源不阻塞其他数据源"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# 共用线程池；超时的查询留在后台线程里自行结束，不阻塞调用方
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='metadata')
+
+
+def collect_metadata(sources):
+    """同时执行所有数据源，sources为 {名称: (读取函数, 超时秒数)}
+
+    返回 (结果, 错误)：结果为 {名称: 值}，只包含按时完成的数据源；
+    错误为 {名称: 原因}，包含超时或抛出异常的数据源。
+    超时从统一的开始时间算起，总等待时间取决于最慢的数据源而不是所有数据源之和。
+    """
+    start_time = time.monotonic()
+    futures = {name: _executor.submit(func) for name, (func, _) in sources.items()}
+    results, errors = {}, {}
+    for name, (_, timeout) in sources.items():
+        remaining = start_time + timeout - time.monotonic()
+        try:
+            results[name] = futures[name].result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            futures[name].cancel()
+            errors[name] = f"超时({timeout}s)"
+        except Exception as e:
+            errors[name] = str(e)
+    if errors:
+        logging.warning(f"部分设备信息读取失败: {errors}")
+    logging.info(f"设备信息读取完成，耗时: {time.monotonic() - start_time:.2f}s")
+    return results, errors
@@ -0,0 +1,235 @@
+"""测试站运行指标：进程内的计数器和直方图，通过本地HTTP端口以Prometheus文本格式提供
+
+    from metrics import registry, serve
+
+    COMMANDS = registry.counter('h60_commands_total', '治具命令数', ('command',))
+    COMMANDS.inc('Version')
+    LATENCY = registry.histogram('h60_cycle_duration_seconds', '单次测试耗时', ('fixture',))
+    LATENCY.observe(12.5, 'H60-1')
+    serve(9108)   # http://127.0.0.1:9108/metrics
+
+记录只是在锁内更新几个数字，不做格式化和I/O，采集时才生成文本。
+值在采集时才知道的指标（如上传队列深度）用registry.collector()注册回调；
+已在别处统计好分位数的耗时（如timing记录的命令耗时）用registry.summary()发布，不再重复统计。
+"""
+import bisect
+import http.server
+import logging
+import threading
+
+DEFAULT_METRICS_PORT = 9108
+# 默认的耗时桶(秒)，覆盖毫秒级串口命令到分钟级的整次测试
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数，按标签值分别计数"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """按桶统计的分布（Prometheus histogram），记录时只增加一个桶的计数"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值 -> [各桶计数..., 超出最大桶的计数, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = []
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Collector:
+    """采集时调用func()取值的指标；func返回数值，或 {标签值元组: 数值}"""
+
+    def __init__(self, name, documentation, func, labels=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def render(self):
+        values = self.func()
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Summary:
+    """采集时调用func()取值的分位数摘要（Prometheus summary）
+
+    func返回 {标签值元组: (次数, 总和, {分位数: 值})}，分位数由数据来源计算，这里只负责输出。
+    """
+    kind = 'summary'
+
+    def __init__(self, name, documentation, func, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = []
+        for key, (count, total, quantiles) in sorted((self.func() or {}).items()):
+            for quantile, value in sorted(quantiles.items()):
+                q = 'quantile="' + _number(quantile) + '"'
+                lines.append(f"{self.name}{_labels(self.labels, key, q)} {_number(value)}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """所有指标的注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(name, lambda: Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, labels, buckets))
+
+    def collector(self, name, documentation, func, labels=(), kind='gauge'):
+        """注册采集时取值的指标，同名时替换原来的回调"""
+        with self._lock:
+            metric = self._metrics[name] = Collector(name, documentation, func, labels, kind)
+            return metric
+
+    def summary(self, name, documentation, func, labels=()):
+        """注册采集时取值的分位数摘要，同名时替换原来的回调"""
+        with self._lock:
+            metric = self._metrics[name] = Summary(name, documentation, func, labels)
+            return metric
+
+    def render(self):
+        """生成Prometheus文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.render()
+            except Exception as e:
+                logging.error(f"采集指标 {metric.name} 失败: {str(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """GET /metrics 返回全部指标"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 抓取请求很频繁，不写入日志
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, registry):
+        self.registry = registry
+        super().__init__(address, MetricsHandler)
+
+
+def serve(port=DEFAULT_METRICS_PORT, host='127.0.0.1', metrics_registry=None):
+    """在后台线程中启动HTTP指标端口，返回MetricsServer（调用shutdown()停止），端口被占用时返回None"""
+    try:
+        server = MetricsServer((host, port), metrics_registry or registry)
+    except OSError as e:
+        logging.error(f"无法启动指标端口 {host}:{port}: {str(e)}")
+        return None
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logging.info(f"指标端口已启动: http://{host}:{port}/metrics")
+    return server
+
+
+registry = MetricsRegistry()
+counter = registry.counter
+histogram = registry.histogram
@@ -0,0 +1,163 @@
+"""nanokdp长连接会话：保持一个nanokdp进程，串行执行控制台命令，断开后自动重连"""
+import logging
+import os
+import re
+import threading
+import time
+
+import metrics
+import traffic_capture
+
+pexpect = None  # 第一次连接时才导入，命令行和界面启动时不必加载pexpect
+
+NANOKDP_COMMAND = 'nanokdp -c 1000000,n,8,1'
+DEVICE_SELECT_PROMPT = 'Select a device by its number'
+DEFAULT_DEVICE_CHOICE = '3'
+# 无法识别具体提示符时使用的通用提示符
+GENERIC_PROMPT = r'(?:nanokdp>|[>#\$]) ?'
+CAPTURE_CHANNEL = 'nanokdp'
+
+QUERY_DURATION = metrics.histogram('h60_nanokdp_query_duration_seconds', 'nanokdp命令耗时', ('command',))
+QUERY_ERRORS = metrics.counter('h60_nanokdp_query_errors_total', 'nanokdp命令失败次数', ('command',))
+
+
+class NanokdpError(Exception):
+    """nanokdp会话不可用或命令执行失败"""
+
+
+def _import_pexpect():
+    global pexpect
+    if pexpect is None:
+        import pexpect as module
+        pexpect = module
+    return pexpect
+
+
+class NanokdpSession:
+    """nanokdp控制台长连接
+
+    第一次执行命令时启动nanokdp并完成设备选择，之后复用同一个进程。
+    所有命令通过锁串行执行；进程退出或命令超时后关闭会话，下次调用时重连，
+    连续连接失败时按指数退避，避免每次轮询都重新启动进程。
+    """
+
+    def __init__(self, command=NANOKDP_COMMAND, device_choice=DEFAULT_DEVICE_CHOICE,
+                 connect_timeout=10, command_timeout=15,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.command = command
+        self.device_choice = device_choice
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._child = None
+        self._prompt_pattern = None
+        self._lock = threading.Lock()
+        self._next_retry = 0.0
+        self._current_delay = reconnect_delay
+
+    def is_connected(self):
+        """nanokdp进程是否在运行"""
+        return self._child is not None and self._child.isalive()
+
+    def query(self, command, timeout=None):
+        """执行一条控制台命令，返回命令输出（不含回显和提示符）"""
+        start_time = time.monotonic()
+        try:
+            return self._query(command, timeout)
+        except NanokdpError:
+            QUERY_ERRORS.inc(command)
+            raise
+        finally:
+            QUERY_DURATION.observe(time.monotonic() - start_time, command)
+
+    def _query(self, command, timeout):
+        with self._lock:
+            for attempt in range(2):
+                reused = self.is_connected()
+                self._ensure_connected()
+                try:
+                    return self._run(command, self.command_timeout if timeout is None else timeout)
+                except (pexpect.EOF, pexpect.TIMEOUT, OSError) as e:
+                    # 会话状态未知，关闭后重连
+                    self._close()
+                    if not reused or attempt:
+                        raise NanokdpError(f"nanokdp命令执行失败: {command}, 错误: {type(e).__name__}")
+                    logging.warning(f"nanokdp会话已断开，重新连接: {type(e).__name__}")
+
+    def close(self):
+        """关闭nanokdp进程"""
+        with self._lock:
+            self._close()
+
+    def _ensure_connected(self):
+        if self.is_connected():
+            return
+        self._close()
+        now = time.monotonic()
+        if now < self._next_retry:
+            raise NanokdpError(f"nanokdp重连等待中，{self._next_retry - now:.1f}秒后重试")
+        try:
+            self._connect()
+        except Exception as e:
+            self._close()
+            self._next_retry = time.monotonic() + self._current_delay
+            self._current_delay = min(self._current_delay * 2, self.max_reconnect_delay)
+            raise NanokdpError(f"nanokdp连接失败: {str(e)}")
+        self._current_delay = self.reconnect_delay
+        self._next_retry = 0.0
+
+    def _connect(self):
+        start_time = time.monotonic()
+        _import_pexpect()
+        child = pexpect.spawn(self.command, timeout=self.connect_timeout)
+        child.delaybeforesend = None  # 去掉pexpect默认的50ms发送延迟
+        self._child = child
+        # 等待设备选择提示并选择设备
+        child.expect(DEVICE_SELECT_PROMPT)
+        child.sendline(self.device_choice)
+        child.sendline('')  # 空字符串相当于按回车键
+        child.expect([GENERIC_PROMPT, pexpect.TIMEOUT])
+        self._prompt_pattern = self._detect_prompt()
+        logging.info(f"nanokdp会话已建立，耗时: {time.monotonic() - start_time:.2f}s")
+
+    def _detect_prompt(self):
+        """发送空行，以最后一行输出作为提示符，之后只匹配行首的完整提示符"""
+        self._drain()
+        self._child.sendline('')
+        self._child.expect([pexpect.TIMEOUT], timeout=0.3)
+        lines = [line.rstrip() for line in self._child.before.decode('utf-8', errors='ignore').splitlines()]
+        lines = [line for line in lines if line]
+        if lines and re.search(GENERIC_PROMPT + '$', lines[-1] + ' '):
+            logging.info(f"识别到nanokdp提示符: {lines[-1]}")
+            return re.compile((r'\r?\n' + re.escape(lines[-1])).encode())
+        logging.warning("未识别到nanokdp提示符，使用通用提示符匹配")
+        return re.compile((r'\r?\n' + GENERIC_PROMPT).encode())
+
+    def _drain(self):
+        """丢弃控制台中尚未读取的输出"""
+        try:
+            while True:
+                self._child.read_nonblocking(4096, timeout=0)
+        except pexpect.TIMEOUT:
+            pass
+
+    def _run(self, command, timeout):
+        self._drain()
+        self._child.sendline(command)
+        traffic_capture.tx(CAPTURE_CHANNEL, (command + os.linesep).encode('utf-8'))
+        # 先等待命令回显，跳过回显之前迟到的提示符，再等待命令结束后的提示符
+        self._child.expect_exact(command, timeout=timeout)
+        traffic_capture.rx(CAPTURE_CHANNEL, self._child.before + self._child.after)
+        self._child.expect([self._prompt_pattern], timeout=timeout)
+        traffic_capture.rx(CAPTURE_CHANNEL, self._child.before + self._child.after)
+        return self._child.before.decode('utf-8', errors='ignore').lstrip('\r\n')
+
+    def _close(self):
+        if self._child is not None:
+            try:
+                self._child.close(force=True)
+            except Exception:
+                pass
+        self._child = None
+        self._prompt_pattern = None
@@ -0,0 +1,36 @@
+"""自适应轮询间隔：值变化后立即恢复快速轮询，值稳定时逐步放慢，另按固定周期发送心跳"""
+import time
+
+
+class AdaptiveInterval:
+    """按读到的值是否变化计算下一次轮询的间隔
+
+    变化（或第一次读取）后回到minimum；连续不变时每次乘以backoff，最长maximum。
+    heartbeat_due()在距离上次上报超过heartbeat秒时返回True，值不变时也定期上报一次。
+    """
+
+    def __init__(self, minimum, maximum, backoff=2.0, heartbeat=300.0):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.backoff = backoff
+        self.heartbeat = heartbeat
+        self.current = minimum
+        self._last_report = None
+
+    def next(self, changed):
+        """记录本次读取是否变化，返回下一次轮询前的等待时间(秒)"""
+        if changed:
+            self.current = self.minimum
+        else:
+            self.current = min(self.current * self.backoff, self.maximum)
+        return self.current
+
+    def reset(self):
+        """外部事件（如测试结束、产品更换）后恢复快速轮询"""
+        self.current = self.minimum
+
+    def heartbeat_due(self):
+        return self._last_report is None or time.monotonic() - self._last_report >= self.heartbeat
+
+    def reported(self):
+        self._last_report = time.monotonic()
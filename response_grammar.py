@@ -0,0 +1,256 @@
+"""命令响应语法：预编译的正则表达式从响应中提取带类型的字段，并按数值上下限或枚举值判定结果
+
+语法用与流程步骤相同的字段描述（流程文件中的步骤就是编译成语法后判定的）：
+    expect          响应必须匹配的正则表达式
+    fail_on         响应匹配即判为失败的正则表达式
+    extract         提取字段的正则表达式：命名分组为字段，否则第一个分组（或整个匹配）为测量值
+    fields          字段类型 {字段名: str/int/float/hex/bool}，未列出的字段为str
+    value           作为测量值的字段名，默认为第一个分组
+    min/max/equals  测量值的数值上下限和允许值
+    limits          各字段的限值 {字段名: {"min": .., "max": .., "equals": [..]}}
+    require_reply   为 true 时空响应（超时）判为失败
+
+COMMAND_GRAMMARS为治具和mmwave常用命令的默认语法，流程步骤没有写判定条件时按命令使用默认语法。
+"""
+import re
+from collections import namedtuple
+
+# 判定结果：是否通过、测量值、失败原因、提取的字段
+Verdict = namedtuple('Verdict', 'passed value reason fields')
+
+GRAMMAR_FIELDS = {'expect', 'fail_on', 'extract', 'fields', 'value', 'min', 'max', 'equals', 'limits',
+                  'require_reply'}
+BOOL_VALUES = {'1': True, 'true': True, 'yes': True, 'on': True,
+               '0': False, 'false': False, 'no': False, 'off': False}
+ERROR_REPLY = r'(?im)^\s*error\b'
+
+
+class GrammarError(Exception):
+    """语法定义无效"""
+
+
+class ResponseError(Exception):
+    """响应不符合命令的语法"""
+
+
+def _parse_bool(text):
+    try:
+        return BOOL_VALUES[text.lower()]
+    except KeyError:
+        raise ValueError(text)
+
+
+FIELD_TYPES = {
+    'str': str,
+    'int': int,
+    'float': float,
+    'hex': lambda text: int(text, 16),
+    'bool': _parse_bool,
+}
+
+
+class Limit:
+    """一个字段的限值：数值上下限和/或允许值"""
+
+    def __init__(self, field, minimum=None, maximum=None, equals=None):
+        self.field = field
+        try:
+            self.min = float(minimum) if minimum is not None else None
+            self.max = float(maximum) if maximum is not None else None
+        except (TypeError, ValueError) as e:
+            raise GrammarError(f"字段 {field or '测量值'} 的上下限无效: {str(e)}")
+        if equals is None:
+            self.equals = None
+        else:
+            self.equals = {str(v) for v in ([equals] if isinstance(equals, (str, int, float)) else equals)}
+
+    def check(self, value):
+        """返回失败原因，通过时返回None"""
+        name = f"字段 {self.field}" if self.field else '测量值'
+        if self.min is not None or self.max is not None:
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                return f"{name}不是数字: {value!r}"
+            if self.min is not None and number < self.min:
+                return f"{name} {number} 小于下限 {self.min}"
+            if self.max is not None and number > self.max:
+                return f"{name} {number} 大于上限 {self.max}"
+        if self.equals is not None and str(value) not in self.equals:
+            return f"{name} {value!r} 不在允许值 {sorted(self.equals)} 中"
+        return None
+
+
+class ResponseGrammar:
+    """编译后的响应语法，evaluate()判定完整响应，stream()在响应逐块到达时判定"""
+
+    def __init__(self, name='', expect=None, fail_on=None, extract=None, fields=None, value=None,
+                 min=None, max=None, equals=None, limits=None, require_reply=False):
+        self.name = name
+        self.expect = self._compile(expect)
+        self.fail_on = self._compile(fail_on)
+        self.extract = self._compile(extract)
+        self.require_reply = bool(require_reply)
+        self.value_field = value
+        if value is not None and (self.extract is None or value not in self.extract.groupindex):
+            raise GrammarError(f"{name}: value字段 {value} 不是extract中的命名分组")
+
+        # 字段名 -> 类型转换函数，只包含命名分组
+        fields = fields or {}
+        self.converters = {}
+        for field in (self.extract.groupindex if self.extract is not None else ()):
+            type_name = fields.get(field, 'str')
+            if type_name not in FIELD_TYPES:
+                raise GrammarError(f"{name}: 字段 {field} 的类型 {type_name} 无效，可用: {', '.join(FIELD_TYPES)}")
+            self.converters[field] = FIELD_TYPES[type_name]
+        unknown = set(fields) - set(self.converters)
+        if unknown:
+            raise GrammarError(f"{name}: fields中的 {', '.join(sorted(unknown))} 不是extract中的命名分组")
+
+        self.limits = []
+        if min is not None or max is not None or equals is not None:
+            self.limits.append(Limit(None, min, max, equals))
+        for field, limit in (limits or {}).items():
+            if field not in self.converters:
+                raise GrammarError(f"{name}: limits中的 {field} 不是extract中的命名分组")
+            if not isinstance(limit, dict):
+                raise GrammarError(f"{name}: 字段 {field} 的限值必须是对象")
+            self.limits.append(Limit(field, limit.get('min'), limit.get('max'), limit.get('equals')))
+
+    def _compile(self, pattern):
+        if pattern is None:
+            return None
+        try:
+            return re.compile(pattern)
+        except re.error as e:
+            raise GrammarError(f"{self.name}: 正则表达式无效 {pattern!r}: {str(e)}")
+
+    def parse(self, response):
+        """提取带类型的字段，不匹配或类型转换失败时返回None"""
+        if self.extract is None:
+            return None
+        match = self.extract.search(response)
+        if match is None:
+            return None
+        try:
+            return self._convert(match)
+        except ValueError:
+            return None
+
+    def _convert(self, match):
+        fields = {}
+        for field, raw in match.groupdict().items():
+            if raw is not None:
+                fields[field] = self.converters[field](raw.strip())
+        return fields
+
+    def evaluate(self, response):
+        """判定完整响应，返回Verdict"""
+        if self.require_reply and not response.strip():
+            return Verdict(False, None, "无响应", {})
+        if self.fail_on is not None and self.fail_on.search(response):
+            return Verdict(False, None, f"响应匹配失败条件 {self.fail_on.pattern!r}", {})
+        if self.expect is not None and not self.expect.search(response):
+            return Verdict(False, None, f"响应不匹配 {self.expect.pattern!r}", {})
+
+        value = response.strip()
+        fields = {}
+        if self.extract is not None:
+            match = self.extract.search(response)
+            if match is None:
+                return Verdict(False, None, f"未提取到测量值 {self.extract.pattern!r}", {})
+            try:
+                fields = self._convert(match)
+            except ValueError as e:
+                return Verdict(False, None, f"字段类型不符: {str(e)}", {})
+            if self.value_field is not None:
+                value = fields.get(self.value_field)
+            else:
+                value = (match.group(1) if match.re.groups else match.group(0)).strip()
+
+        for limit in self.limits:
+            reason = limit.check(value if limit.field is None else fields.get(limit.field))
+            if reason is not None:
+                return Verdict(False, value, reason, fields)
+        return Verdict(True, value, None, fields)
+
+    def stream(self):
+        return ResponseStream(self)
+
+
+class ResponseStream:
+    """响应逐块到达时逐行判定：某一行匹配fail_on，或extract在某一行中匹配后即可给出结果，
+    读取方不必再等待结束符或多行响应的静默时间。只适用于不跨行的正则表达式。
+    """
+
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.text = ''
+        self.verdict = None
+        self._line_start = 0
+
+    def feed(self, chunk):
+        """加入新收到的数据（bytes或str），已能判定时返回Verdict，否则返回None"""
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('ascii', errors='ignore')
+        self.text += chunk
+        if self.verdict is not None:
+            return self.verdict
+        end = self.text.rfind('\n') + 1
+        if end <= self._line_start:
+            return None
+        lines = self.text[self._line_start:end]
+        self._line_start = end
+        grammar = self.grammar
+        if grammar.fail_on is not None and grammar.fail_on.search(lines):
+            self.verdict = grammar.evaluate(self.text)
+        elif grammar.extract is not None and grammar.extract.search(lines):
+            self.verdict = grammar.evaluate(self.text)
+        return self.verdict
+
+    def result(self):
+        """响应结束后的最终判定"""
+        return self.verdict if self.verdict is not None else self.grammar.evaluate(self.text)
+
+
+def compile_grammar(spec, name=''):
+    """把语法描述（dict）编译为ResponseGrammar"""
+    unknown = set(spec) - GRAMMAR_FIELDS
+    if unknown:
+        raise GrammarError(f"{name}: 未知的语法字段 {', '.join(sorted(unknown))}")
+    return ResponseGrammar(name, **spec)
+
+
+# 默认语法：治具命令无响应或返回ERROR时失败
+COMMAND_GRAMMARS = {
+    'FixtureSN': compile_grammar({
+        'fail_on': ERROR_REPLY, 'require_reply': True,
+        # "FixtureSN: ABC123"、"FixtureSN ABC123" 或只有序列号，序列号可以包含空格
+        'extract': r'(?m)^\s*(?:FixtureSN\b\s*[:=]?\s*)?(?P<fixture_sn>(?!FixtureSN\b)\S.*?)\s*$',
+        'value': 'fixture_sn',
+    }, 'FixtureSN'),
+    'Version': compile_grammar({
+        'fail_on': ERROR_REPLY, 'require_reply': True,
+        'extract': r'(?m)^\s*Version\s*[:=]?\s*(?P<version>\S+)', 'value': 'version',
+    }, 'Version'),
+    'Is_Button_Pressed': compile_grammar({
+        'fail_on': ERROR_REPLY, 'require_reply': True,
+        'extract': r'(?m)^\s*Button\s*[:=]\s*(?P<pressed>\w+)', 'fields': {'pressed': 'bool'}, 'value': 'pressed',
+    }, 'Is_Button_Pressed'),
+    'mmwave status': compile_grammar({
+        'extract': r'(?m)^\s*Device:[ \t]*(?P<device>\S.*?)\s*$', 'value': 'device',
+    }, 'mmwave status'),
+}
+for _command in ('Start_test', 'End_test pass', 'End_test fail', 'Reset'):
+    COMMAND_GRAMMARS[_command] = compile_grammar({'fail_on': ERROR_REPLY, 'require_reply': True}, _command)
+# 气缸动作的响应中出现fail/error/timeout即为动作失败
+for _command in ('CYLINDER_RESET', 'CYLINDER_EXERCISE LEFT', 'CYLINDER_EXERCISE RIGHT'):
+    COMMAND_GRAMMARS[_command] = compile_grammar({
+        'fail_on': r'(?i)\b(?:fail(?:ed|ure)?|error|timeout)\b', 'require_reply': True}, _command)
+FIXTURE_SN = COMMAND_GRAMMARS['FixtureSN']
+MMWAVE_STATUS = COMMAND_GRAMMARS['mmwave status']
+
+
+def grammar_for(command):
+    """返回命令的默认语法，没有时返回None"""
+    return COMMAND_GRAMMARS.get(command)
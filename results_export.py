@@ -0,0 +1,206 @@
+"""从结果库批量导出历史测试：规范化的CSV或列式Parquet/Arrow，按块流式读取和写入，不把全部数据读入内存
+
+每次导出生成两个文件，测试信息不在每个步骤行中重复：
+    runs.<ext>   每次测试一行：治具、Fixture_SN、Unit_SN、mmWAVE型号、结果、时间、Fail_list
+    steps.<ext>  每个步骤一行，run_id对应runs中的run_id
+
+    python station_cli.py export --since 2026-10-01 --until 2026-11-01 --format parquet --output export/
+
+recheck_results()用当前流程文件中的响应语法重新判定已保存的步骤响应，用于修改限值后评估影响：
+    python station_cli.py recheck --since 2026-10-01 [--sequence sequences/h60_cylinder.json]
+"""
+import csv
+import logging
+import os
+import time
+
+try:
+    import pyarrow  # 可选依赖，仅Parquet/Arrow格式需要
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from response_grammar import grammar_for
+from results_store import connect, build_filter
+
+DEFAULT_CHUNK_SIZE = 5000
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+RUN_FIELDS = ('run_id', 'station_id', 'fixture_id', 'fixture_sn', 'unit_sn', 'mmwave_model', 'result', 'error',
+              'start_time', 'end_time', 'total_time', 'fail_list')
+STEP_FIELDS = ('run_id', 'seq', 'step', 'command', 'status', 'response', 'elapsed')
+TIME_FIELDS = ('start_time', 'end_time')
+
+# Fail_list为本次测试中失败步骤的名称，用分号分隔
+RUNS_SQL = ("SELECT id AS run_id, station_id, fixture_id, fixture_sn, unit_sn, mmwave_model, result, error, "
+            "start_time, end_time, total_time, "
+            "(SELECT group_concat(step, ';') FROM steps WHERE steps.run_id = runs.id AND status = 'Fail') AS fail_list "
+            "FROM runs{where} ORDER BY id")
+STEPS_SQL = ("SELECT steps.run_id, seq, step, command, status, response, elapsed "
+             "FROM steps JOIN runs ON runs.id = steps.run_id{where} ORDER BY steps.run_id, seq")
+RECHECK_SQL = ("SELECT steps.run_id, seq, step, command, status, response "
+               "FROM steps JOIN runs ON runs.id = steps.run_id{where} AND status IN ('Pass', 'Fail') "
+               "ORDER BY steps.run_id, seq")
+MAX_RECHECK_CHANGES = 1000  # 最多列出的判定变化条数
+
+
+class ExportError(Exception):
+    """导出参数错误或缺少可选依赖"""
+
+
+def iter_chunks(cursor, chunk_size):
+    """用fetchmany按块读取查询结果"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp is not None else ''
+
+
+class CsvTableWriter:
+    """按块写入CSV，时间写成本地时间字符串（与界面导出的CSV一致）"""
+
+    def __init__(self, path, fields):
+        self.fields = fields
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(fields)
+        self._times = [index for index, field in enumerate(fields) if field in TIME_FIELDS]
+
+    def write(self, rows):
+        for row in rows:
+            row = list(row)
+            for index in self._times:
+                row[index] = format_time(row[index])
+            self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowTableWriter:
+    """按块写入Parquet或Arrow IPC文件，每块是一个RecordBatch，时间列为UTC时间戳"""
+
+    def __init__(self, path, fields, fmt):
+        self.fields = fields
+        self.schema = pyarrow.schema([(field, arrow_type(field)) for field in fields])
+        if fmt == 'parquet':
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for index, field in enumerate(self.fields):
+            values = columns[index]
+            if field in TIME_FIELDS:
+                values = [round(value * 1000) if value is not None else None for value in values]
+            arrays.append(pyarrow.array(values, type=self.schema.field(field).type))
+        self._writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def arrow_type(field):
+    if field in TIME_FIELDS:
+        return pyarrow.timestamp('ms', tz='UTC')
+    if field in ('run_id', 'seq'):
+        return pyarrow.int64()
+    if field in ('total_time', 'elapsed'):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def open_writer(path, fields, fmt):
+    if fmt == 'csv':
+        return CsvTableWriter(path, fields)
+    return ArrowTableWriter(path, fields, fmt)
+
+
+def export_results(db_path, output_dir, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """把符合条件的测试导出到output_dir，filters与ResultsStore.history相同（unit_sn、since、until等）
+
+    runs和steps在同一个读事务中读取，导出期间新写入的测试不会只出现在其中一个文件里。
+    文件先写入临时文件，全部完成后才替换，导出失败不会留下不完整的文件。
+    返回 {'runs': 测试数, 'steps': 步骤数, 'files': [文件路径]}。
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式: {fmt}")
+    if fmt != 'csv' and pyarrow is None:
+        raise ExportError(f"导出{fmt}格式需要安装pyarrow")
+    if not os.path.exists(db_path):
+        raise ExportError(f"结果库不存在: {db_path}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    start_time = time.monotonic()
+    where, params = build_filter(**filters)
+    counts, files = {}, []
+    conn = connect(db_path, readonly=True)
+    try:
+        conn.execute('BEGIN')  # 两次查询使用同一个快照
+        for table, sql, fields in (('runs', RUNS_SQL, RUN_FIELDS), ('steps', STEPS_SQL, STEP_FIELDS)):
+            path = os.path.join(output_dir, table + FORMATS[fmt])
+            temp_path = path + '.tmp'
+            writer = open_writer(temp_path, fields, fmt)
+            counts[table] = 0
+            try:
+                for rows in iter_chunks(conn.execute(sql.format(where=where), params), chunk_size):
+                    writer.write(rows)
+                    counts[table] += len(rows)
+            finally:
+                writer.close()
+                files.append((temp_path, path))
+    except BaseException:
+        for temp_path, _ in files:
+            os.remove(temp_path)
+        raise
+    finally:
+        conn.close()
+
+    for temp_path, path in files:
+        os.replace(temp_path, path)
+    logging.info(f"导出 {counts['runs']} 次测试、{counts['steps']} 个步骤到 {output_dir}，"
+                 f"耗时: {time.monotonic() - start_time:.2f}s")
+    return dict(counts, files=[path for _, path in files])
+
+
+def recheck_results(db_path, plan, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """用plan（SequencePlan）中各步骤的响应语法重新判定结果库中的步骤响应，不修改结果库
+
+    流程中没有的步骤按命令的默认语法判定，两者都没有的步骤不判定。执行时抛出异常的步骤
+    保存的是异常信息而不是设备响应，这类步骤（保存时为Fail）重新判定后仍可能为Pass，需要结合changes查看。
+    返回 {'checked': 判定的步骤数, 'steps': {步骤: {'pass': .., 'fail': ..}}, 'changes': [判定结果变化的步骤]}。
+    """
+    if not os.path.exists(db_path):
+        raise ExportError(f"结果库不存在: {db_path}")
+    grammars = {step.id: step.grammar for step in plan.steps}
+    where, params = build_filter(**filters)
+    sql = RECHECK_SQL.format(where=where or ' WHERE 1')
+    start_time = time.monotonic()
+    checked, summary, changes = 0, {}, []
+    conn = connect(db_path, readonly=True)
+    try:
+        for rows in iter_chunks(conn.execute(sql, params), chunk_size):
+            for run_id, seq, step, command, status, response in rows:
+                grammar = grammars[step] if step in grammars else grammar_for(command)
+                if grammar is None:
+                    continue
+                verdict = grammar.evaluate(response or '')
+                new_status = 'Pass' if verdict.passed else 'Fail'
+                checked += 1
+                counts = summary.setdefault(step, {'pass': 0, 'fail': 0})
+                counts['pass' if verdict.passed else 'fail'] += 1
+                if new_status != status and len(changes) < MAX_RECHECK_CHANGES:
+                    changes.append({'run_id': run_id, 'seq': seq, 'step': step, 'stored': status,
+                                    'status': new_status, 'value': verdict.value, 'reason': verdict.reason})
+    finally:
+        conn.close()
+    logging.info(f"重新判定 {checked} 个步骤，{len(changes)} 个结果变化，耗时: {time.monotonic() - start_time:.2f}s")
+    return {'checked': checked, 'steps': summary, 'changes': changes}
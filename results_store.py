@@ -0,0 +1,258 @@
+"""测试结果库：每次测试自动写入本地SQLite（WAL模式），后台批量插入，提供历史和良率查询
+
+只追加不修改：runs表每次测试一行，steps表每个步骤一行。
+Unit_SN、Fixture_SN和开始时间上有索引，按产品、治具或时间段查询不需要全表扫描。
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = 'results.db'
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    station_id TEXT,
+    fixture_id TEXT NOT NULL,
+    fixture_sn TEXT,
+    unit_sn TEXT,
+    mmwave_model TEXT,
+    result TEXT NOT NULL,
+    error TEXT,
+    start_time REAL NOT NULL,
+    end_time REAL,
+    total_time REAL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    seq INTEGER NOT NULL,
+    step TEXT,
+    command TEXT,
+    status TEXT,
+    response TEXT,
+    elapsed REAL,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_unit_sn ON runs(unit_sn, start_time);
+CREATE INDEX IF NOT EXISTS idx_runs_fixture_sn ON runs(fixture_sn, start_time);
+CREATE INDEX IF NOT EXISTS idx_runs_start_time ON runs(start_time);
+"""
+
+RUN_COLUMNS = ('station_id', 'fixture_id', 'fixture_sn', 'unit_sn', 'mmwave_model', 'result', 'error',
+               'start_time', 'end_time', 'total_time')
+# 良率查询支持的分组方式
+YIELD_GROUPS = {
+    None: "'all'",
+    'fixture_id': 'fixture_id',
+    'fixture_sn': 'fixture_sn',
+    'station_id': 'station_id',
+    'day': "date(start_time, 'unixepoch', 'localtime')",
+    'hour': "strftime('%Y-%m-%d %H:00', start_time, 'unixepoch', 'localtime')",
+}
+
+
+def to_timestamp(value):
+    """把epoch秒或'YYYY-MM-DD[ HH:MM[:SS]]'格式的本地时间转换为epoch秒，None原样返回"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    for fmt in TIME_FORMATS:
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {value}")
+
+
+def connect(path, readonly=False):
+    """打开结果库连接，行以sqlite3.Row返回"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL模式下断电最多丢失最近的事务，不会损坏数据库
+        conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ResultsStore:
+    """后台批量写入的结果库
+
+    submit()只把一次测试的记录放入队列，不阻塞调用线程；后台线程每次最多取batch_size条，
+    在一个事务中写入。close()时写完队列中剩余的记录。查询方法使用独立的只读连接，
+    WAL模式下查询和写入互不阻塞。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=50, batch_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._write_lock = threading.Lock()
+        self.written = 0
+
+    # ---- 写入 ----
+
+    def start(self):
+        """打开数据库并启动后台写入线程"""
+        with self._write_lock:
+            try:
+                if self._conn is None:
+                    self._conn = connect(self.path)  # 建表，启动后即可查询
+            except sqlite3.Error as e:
+                logging.error(f"打开结果库失败: {self.path}: {str(e)}")
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name='results-store', daemon=True)
+            self._thread.start()
+
+    def submit(self, run):
+        """提交一次测试的记录（dict，字段见RUN_COLUMNS，steps为步骤列表）"""
+        self._queue.put(run)
+
+    def flush(self):
+        """在调用线程中写入队列中所有记录"""
+        while True:
+            batch = self._take_batch(timeout=None)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        """停止后台线程并写完剩余记录"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _worker(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(timeout=self.batch_interval)
+            if batch:
+                self._write(batch)
+
+    def _take_batch(self, timeout):
+        try:
+            batch = [self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                if self._conn is None:
+                    self._conn = connect(self.path)
+                with self._conn:  # 一个事务
+                    for run in batch:
+                        cursor = self._conn.execute(
+                            f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                            [run.get(column) for column in RUN_COLUMNS])
+                        self._conn.executemany(
+                            "INSERT INTO steps (run_id, seq, step, command, status, response, elapsed) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [(cursor.lastrowid, seq, step.get('step'), step.get('command'), step.get('status'),
+                              step.get('result'), step.get('timestamp'))
+                             for seq, step in enumerate(run.get('steps') or [])])
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                logging.error(f"写入结果库失败，丢弃 {len(batch)} 条记录: {str(e)}")
+
+    # ---- 查询 ----
+
+    def _reader(self):
+        return connect(self.path, readonly=True)
+
+    def history(self, unit_sn=None, fixture_sn=None, fixture_id=None, result=None,
+                since=None, until=None, limit=100, include_steps=False):
+        """按条件查询测试记录，最新的在前；since/until为epoch秒或本地时间字符串"""
+        where, params = build_filter(unit_sn=unit_sn, fixture_sn=fixture_sn, fixture_id=fixture_id,
+                                     result=result, since=since, until=until)
+        sql = f"SELECT * FROM runs{where} ORDER BY start_time DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        conn = self._reader()
+        try:
+            runs = [dict(row) for row in conn.execute(sql, params)]
+            if include_steps:
+                for run in runs:
+                    run['steps'] = self._steps(conn, run['id'])
+        finally:
+            conn.close()
+        return runs
+
+    def get_run(self, run_id):
+        """返回一次测试的完整记录（含步骤），不存在时返回None"""
+        conn = self._reader()
+        try:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = dict(row)
+            run['steps'] = self._steps(conn, run_id)
+        finally:
+            conn.close()
+        return run
+
+    @staticmethod
+    def _steps(conn, run_id):
+        return [dict(row) for row in conn.execute(
+            "SELECT seq, step, command, status, response, elapsed FROM steps WHERE run_id = ? ORDER BY seq",
+            (run_id,))]
+
+    def yield_summary(self, since=None, until=None, group_by=None, fixture_id=None, fixture_sn=None):
+        """统计良率，返回每组的 total/passed/failed/stopped/yield（yield = passed / (passed + failed)）
+
+        group_by可为None、fixture_id、fixture_sn、station_id、day、hour。
+        """
+        if group_by not in YIELD_GROUPS:
+            raise ValueError(f"不支持的分组: {group_by}")
+        where, params = build_filter(fixture_id=fixture_id, fixture_sn=fixture_sn, since=since, until=until)
+        group = YIELD_GROUPS[group_by]
+        sql = (f"SELECT {group} AS grp, COUNT(*) AS total, "
+               f"SUM(result = 'Pass') AS passed, SUM(result = 'Fail') AS failed, "
+               f"SUM(result = 'Stopped') AS stopped, COUNT(DISTINCT unit_sn) AS units "
+               f"FROM runs{where} GROUP BY grp ORDER BY grp")
+        conn = self._reader()
+        try:
+            rows = [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+        for row in rows:
+            tested = row['passed'] + row['failed']
+            row['yield'] = round(row['passed'] / tested, 4) if tested else None
+        return rows
+
+
+def build_filter(unit_sn=None, fixture_sn=None, fixture_id=None, result=None, since=None, until=None):
+    """生成runs表的WHERE子句和参数"""
+    conditions, params = [], []
+    for column, value in (('unit_sn', unit_sn), ('fixture_sn', fixture_sn),
+                          ('fixture_id', fixture_id), ('result', result)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        conditions.append("start_time >= ?")
+        params.append(to_timestamp(since))
+    if until is not None:
+        conditions.append("start_time < ?")
+        params.append(to_timestamp(until))
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
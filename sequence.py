@@ -0,0 +1,307 @@
+"""数据驱动的测试流程：从JSON/YAML文件加载步骤并编译成执行计划，互不依赖的步骤并行执行
+
+流程文件格式（JSON，安装了PyYAML时也可使用YAML）：
+
+    {
+        "name": "H60 cylinder",
+        "max_parallel": 4,
+        "steps": [
+            {"id": "fixture_sn", "type": "fixture_sn", "report": "sn"},
+            {"id": "unit_sn", "type": "unit_sn", "after": [], "timeout": 10, "retries": 1},
+            {"id": "left", "type": "fixture", "command": "CYLINDER_EXERCISE LEFT",
+             "timeout": 5, "fail_on": "(?i)fail|error"}
+        ]
+    }
+
+步骤字段：
+    id          步骤编号，不能重复
+    type        步骤类型，对应调用方提供的执行函数；内置类型 delay（等待 seconds 秒）
+    label       显示名称，默认为id
+    command     发送的命令
+    commands    fixture_batch步骤流水线发送的命令列表
+    window      fixture_batch步骤同时等待响应的命令数，0表示一次写入全部命令
+    match       fixture_batch步骤响应与命令的匹配方式：order（默认）或 echo
+    timeout     单次执行的超时时间(秒)，不填使用执行函数的默认值
+    retries     失败后的重试次数，retry_delay 为重试间隔(秒)
+    after       依赖的步骤编号列表；不填时依赖上一个步骤，[] 表示可以立即开始
+    expect      响应必须匹配的正则表达式
+    fail_on     响应匹配即判为失败的正则表达式
+    extract     从响应中提取字段的正则表达式：命名分组为字段，否则第一个分组（或整个匹配）为测量值
+    fields      命名分组的类型 {字段名: str/int/float/hex/bool}
+    value       作为测量值的命名分组
+    min / max   测量值的数值上下限
+    equals      测量值允许的取值（字符串或列表）
+    limits      各字段的限值 {字段名: {"min": .., "max": .., "equals": [..]}}
+    require_reply  为 true 时空响应（超时）判为失败
+    on_fail     失败后的处理：stop（默认，不再启动新步骤）或 continue
+    required    为 false 时步骤失败不影响测试结果，也不会中止流程（依赖它的步骤仍会跳过）
+    report      为 sn 时把测量值作为SN上报给界面
+
+判定字段编译成response_grammar.ResponseGrammar；步骤没有写判定字段时使用命令的默认语法。
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import yaml  # 可选依赖，仅YAML格式的流程文件需要
+except ImportError:
+    yaml = None
+
+import metrics
+from execution import RunCancelled
+from response_grammar import GRAMMAR_FIELDS, GrammarError, compile_grammar, grammar_for
+from timing import record, span
+
+DEFAULT_MAX_PARALLEL = 4
+DEFAULT_RETRY_DELAY = 0.5
+# 读取流程文件时可能出现的格式错误
+PARSE_ERRORS = (OSError, ValueError) + ((yaml.YAMLError,) if yaml is not None else ())
+STEP_FIELDS = {'id', 'type', 'label', 'command', 'commands', 'window', 'match', 'seconds', 'timeout', 'retries',
+               'retry_delay', 'after', 'on_fail', 'required', 'report'} | GRAMMAR_FIELDS
+
+
+STEP_DURATION = metrics.histogram('h60_step_duration_seconds', '流程步骤耗时（含重试）', ('step', 'status'))
+STEP_RETRIES = metrics.counter('h60_step_retries_total', '流程步骤重试次数', ('step',))
+
+
+class SequenceError(Exception):
+    """流程文件格式错误或步骤配置无效"""
+
+
+def _run_delay(step, fixture, ctx):
+    ctx.sleep(step.seconds)
+    return ''
+
+
+# 内置步骤类型，调用方提供的同名执行函数优先
+BUILTIN_RUNNERS = {'delay': _run_delay}
+
+
+class Step:
+    """编译后的单个步骤：判定字段预先编译成响应语法"""
+
+    def __init__(self, spec, previous_id):
+        if not isinstance(spec, dict):
+            raise SequenceError(f"步骤必须是对象: {spec!r}")
+        unknown = set(spec) - STEP_FIELDS
+        if unknown:
+            raise SequenceError(f"步骤 {spec.get('id')} 包含未知字段: {', '.join(sorted(unknown))}")
+        try:
+            self.id = str(spec['id'])
+            self.type = str(spec['type'])
+        except KeyError as e:
+            raise SequenceError(f"步骤缺少字段 {e}: {spec!r}")
+        self.label = spec.get('label', self.id)
+        self.command = spec.get('command')
+        commands = spec.get('commands', [])
+        if isinstance(commands, str) or not all(isinstance(command, str) for command in commands):
+            raise SequenceError(f"步骤 {self.id} 的commands必须是命令列表")
+        self.commands = list(commands)
+        self.match = spec.get('match', 'order')
+        if self.match not in ('order', 'echo'):
+            raise SequenceError(f"步骤 {self.id} 的match只能是order或echo")
+        self.report = spec.get('report')
+        self.required = bool(spec.get('required', True))
+        self.on_fail = spec.get('on_fail', 'stop')
+        if self.on_fail not in ('stop', 'continue'):
+            raise SequenceError(f"步骤 {self.id} 的on_fail只能是stop或continue")
+
+        after = spec.get('after', [previous_id] if previous_id else [])
+        self.after = [after] if isinstance(after, str) else [str(dep) for dep in after]
+
+        try:
+            self.seconds = float(spec.get('seconds', 0))
+            self.timeout = float(spec['timeout']) if spec.get('timeout') is not None else None
+            self.retries = int(spec.get('retries', 0))
+            self.retry_delay = float(spec.get('retry_delay', DEFAULT_RETRY_DELAY))
+            self.window = int(spec['window']) if spec.get('window') is not None else None
+        except (TypeError, ValueError) as e:
+            raise SequenceError(f"步骤 {self.id} 的数值字段无效: {str(e)}")
+        if self.retries < 0:
+            raise SequenceError(f"步骤 {self.id} 的retries不能为负数")
+        if self.window is not None and self.window < 0:
+            raise SequenceError(f"步骤 {self.id} 的window不能为负数")
+
+        grammar = {key: value for key, value in spec.items() if key in GRAMMAR_FIELDS}
+        try:
+            self.grammar = compile_grammar(grammar, self.id) if grammar else grammar_for(self.command)
+        except GrammarError as e:
+            raise SequenceError(f"步骤 {self.id} 的判定条件无效: {str(e)}")
+
+    def check(self, response):
+        """按响应语法判定响应，返回(是否通过, 测量值, 失败原因)；没有语法时只要执行成功即通过"""
+        if self.grammar is None:
+            return True, response.strip(), None
+        verdict = self.grammar.evaluate(response)
+        return verdict.passed, verdict.value, verdict.reason
+
+
+class SequencePlan:
+    """编译后的执行计划，步骤已按依赖关系排序
+
+    run()在测试线程中调用：依赖都已通过的步骤提交到线程池并行执行，
+    依赖失败的步骤记为Skip；on_fail为stop的必需步骤失败后不再启动新步骤。
+    每个步骤结束时发出'step'事件，必需步骤全部通过返回'Pass'，否则返回'Fail'。
+    """
+
+    def __init__(self, name, steps, max_parallel=DEFAULT_MAX_PARALLEL):
+        self.name = name
+        self.steps = steps
+        self.max_parallel = max_parallel
+
+    def run(self, ctx, fixture, runners):
+        runners = dict(BUILTIN_RUNNERS, **runners)
+        results = {}  # step id -> 'Pass' / 'Fail' / 'Skip'
+        pending = list(self.steps)
+        with span(f"sequence:{self.name}"):
+            self._schedule(ctx, fixture, runners, pending, results)
+        passed = not pending and all(results[step.id] == 'Pass' for step in self.steps if step.required)
+        return 'Pass' if passed else 'Fail'
+
+    def _schedule(self, ctx, fixture, runners, pending, results):
+        running = {}  # future -> Step
+        aborted = False
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_parallel,
+                                                     thread_name_prefix=f"step-{ctx.fixture_id}")
+        try:
+            while True:
+                ctx.check_cancelled()
+                if not aborted:
+                    # 步骤已按依赖排序，一次遍历即可处理连续的跳过
+                    for step in list(pending):
+                        if not all(dep in results for dep in step.after):
+                            continue
+                        pending.remove(step)
+                        if any(results[dep] != 'Pass' for dep in step.after):
+                            results[step.id] = 'Skip'
+                            logging.info(f"步骤 {step.id} 的依赖未通过，跳过")
+                            continue
+                        running[pool.submit(self._run_step, step, ctx, fixture, runners)] = step
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, timeout=0.1,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step.id] = future.result()  # RunCancelled在此向上传递
+                    if results[step.id] != 'Pass' and step.required and step.on_fail == 'stop':
+                        aborted = True
+        finally:
+            # 停止时不等待仍在执行的步骤，它们的读写已由停止回调打断
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _run_step(step, ctx, fixture, runners):
+        start_time = time.monotonic()
+        runner = runners[step.type]
+        for attempt in range(1, step.retries + 2):
+            ctx.check_cancelled()
+            try:
+                response = runner(step, fixture, ctx)
+                passed, value, reason = step.check(response)
+            except RunCancelled:
+                raise
+            except Exception as e:
+                if ctx.cancel_event.is_set():
+                    raise RunCancelled()
+                response, passed, value, reason = str(e), False, None, str(e)
+            if passed:
+                break
+            logging.warning(f"步骤 {step.id} 第{attempt}次执行失败: {reason}")
+            if attempt <= step.retries:
+                STEP_RETRIES.inc(step.id)
+                ctx.sleep(step.retry_delay)
+
+        status = 'Pass' if passed else 'Fail'
+        duration = time.monotonic() - start_time
+        record(f"step:{step.id}", duration, error=not passed)
+        STEP_DURATION.observe(duration, step.id, status)
+        logging.info(f"步骤 {step.id} 结果: {status}，耗时: {duration * 1000:.1f}ms",
+                     extra={'command': step.command, 'latency_ms': round(duration * 1000, 1), 'result': status})
+        if passed and step.report == 'sn':
+            ctx.emit('sn', sn=value)
+        ctx.emit('step', step=step.id, label=step.label, command=step.command or step.type,
+                 result=response, status=status, value=value, reason=reason,
+                 attempts=attempt, duration=duration, elapsed=ctx.elapsed)
+        return status
+
+
+def compile_sequence(spec, step_types=None):
+    """把流程定义（dict）编译成SequencePlan；step_types为可用的步骤类型，用于提前检查"""
+    if not isinstance(spec, dict) or not isinstance(spec.get('steps'), list) or not spec['steps']:
+        raise SequenceError("流程定义必须包含非空的steps列表")
+
+    steps = {}
+    previous_id = None
+    for step_spec in spec['steps']:
+        step = Step(step_spec, previous_id)
+        if step.id in steps:
+            raise SequenceError(f"步骤编号重复: {step.id}")
+        if step_types is not None and step.type not in step_types and step.type not in BUILTIN_RUNNERS:
+            raise SequenceError(f"步骤 {step.id} 的类型未知: {step.type}")
+        steps[step.id] = step
+        previous_id = step.id
+
+    for step in steps.values():
+        for dep in step.after:
+            if dep not in steps:
+                raise SequenceError(f"步骤 {step.id} 依赖的步骤不存在: {dep}")
+
+    # 按依赖关系排序（同一层保持文件中的顺序），同时检查循环依赖
+    ordered = []
+    remaining = list(steps.values())
+    while remaining:
+        done = {step.id for step in ordered}
+        ready = [step for step in remaining if all(dep in done for dep in step.after)]
+        if not ready:
+            raise SequenceError(f"步骤存在循环依赖: {', '.join(step.id for step in remaining)}")
+        ordered.extend(ready)
+        remaining = [step for step in remaining if step not in ready]
+
+    try:
+        max_parallel = int(spec.get('max_parallel', DEFAULT_MAX_PARALLEL))
+    except (TypeError, ValueError):
+        raise SequenceError("max_parallel必须是整数")
+    return SequencePlan(spec.get('name', 'sequence'), ordered, max(1, max_parallel))
+
+
+def load_sequence(path, step_types=None):
+    """读取并编译流程文件，.yaml/.yml按YAML解析，其他按JSON解析"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise SequenceError("读取YAML流程文件需要安装PyYAML")
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+    except PARSE_ERRORS as e:
+        raise SequenceError(f"无法读取流程文件 {path}: {str(e)}")
+    return compile_sequence(spec, step_types)
+
+
+class SequenceFile:
+    """按需加载流程文件，文件修改后下次获取时自动重新编译"""
+
+    def __init__(self, path, step_types=None):
+        self.path = path
+        self.step_types = step_types
+        self._plan = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def plan(self):
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                raise SequenceError(f"无法读取流程文件 {self.path}: {str(e)}")
+            if self._plan is None or mtime != self._mtime:
+                self._plan = load_sequence(self.path, self.step_types)
+                self._mtime = mtime
+                logging.info(f"已加载测试流程 {self._plan.name}: {len(self._plan.steps)} 个步骤")
+            return self._plan
@@ -0,0 +1,31 @@
+"""H60测试站模拟器：假H60治具（pty串口）、假nanokdp和假adb，用于离线调试、回归和压力测试
+
+    from simulator import FakeH60, install_fake_tools
+
+    with FakeH60('/tmp/h60-1', fixture_sn='FX0001', latency=0.005, error_rate=0.01) as fixture:
+        bin_dir = install_fake_tools(tempdir, unit_sn='UNIT0001', model='MMW-H60-A1')
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+        ...  # 用fixture.port打开串口，nanokdp/adb会调用假程序
+
+命令行：python -m simulator --help
+"""
+from simulator.adb import install_fake_adb
+from simulator.h60 import FakeH60
+from simulator.nanokdp import install_fake_nanokdp
+
+
+def install_fake_tools(directory, unit_sn=None, model=None, adb_latency=0.0, nanokdp_latency=0.0,
+                       adb_offline=False, nanokdp_error_rate=0.0):
+    """在directory中生成假nanokdp和假adb，返回应加到PATH最前面的目录"""
+    adb_options = {'latency': adb_latency, 'offline': adb_offline}
+    if unit_sn is not None:
+        adb_options['unit_sn'] = unit_sn
+    nanokdp_options = {'latency': nanokdp_latency, 'error_rate': nanokdp_error_rate}
+    if model is not None:
+        nanokdp_options['model'] = model
+    install_fake_adb(directory, **adb_options)
+    install_fake_nanokdp(directory, **nanokdp_options)
+    return directory
+
+
+__all__ = ['FakeH60', 'install_fake_adb', 'install_fake_nanokdp', 'install_fake_tools']
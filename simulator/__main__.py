@@ -0,0 +1,55 @@
+"""启动模拟测试站：若干假H60治具加上假nanokdp/adb，直到Ctrl-C退出
+
+用法: python -m simulator [--link /tmp/h60-sim-1 --link /tmp/h60-sim-2] [--latency 0.005] [--error-rate 0.01]
+启动后按提示把假程序目录加到PATH，并把治具配置中的串口指向输出的路径。
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from simulator import FakeH60, install_fake_tools
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--link', action='append', help='假治具串口的符号链接路径，可重复指定')
+    parser.add_argument('--latency', type=float, default=0.005, help='治具应答延迟(秒)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='治具应答延迟的随机抖动(秒)')
+    parser.add_argument('--cylinder-time', type=float, default=0.0, help='气缸运动时间(秒)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='治具应答错误的概率')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='治具不应答的概率')
+    parser.add_argument('--unit-sn', default='FAKE_UNIT_SN_0001')
+    parser.add_argument('--model', default='MMW-H60-A1', help='mmwave status返回的设备型号')
+    parser.add_argument('--adb-latency', type=float, default=0.0, help='假adb启动延迟(秒)')
+    parser.add_argument('--bin-dir', help='生成假nanokdp/adb的目录，默认使用临时目录')
+    parser.add_argument('--seed', type=int, help='故障注入的随机种子')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    links = args.link or ['/tmp/h60-sim-1', '/tmp/h60-sim-2']
+    bin_dir = args.bin_dir or tempfile.mkdtemp(prefix='h60-sim-')
+    os.makedirs(bin_dir, exist_ok=True)
+    install_fake_tools(bin_dir, unit_sn=args.unit_sn, model=args.model, adb_latency=args.adb_latency)
+
+    fixtures = [FakeH60(link, fixture_sn=f"FXSIM{index:04d}", latency=args.latency, jitter=args.jitter,
+                        cylinder_time=args.cylinder_time, error_rate=args.error_rate,
+                        timeout_rate=args.timeout_rate, seed=args.seed).start()
+                for index, link in enumerate(links, 1)]
+    print(f"export PATH={bin_dir}{os.pathsep}$PATH")
+    for fixture in fixtures:
+        print(f"{fixture.fixture_sn}: {fixture.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for fixture in fixtures:
+            logging.info(f"{fixture.fixture_sn} 共收到 {fixture.commands} 条命令")
+            fixture.stop()
+
+
+if __name__ == '__main__':
+    main()
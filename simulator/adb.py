@@ -0,0 +1,61 @@
+"""假adb：用shell脚本模拟adb客户端和设备端的oai-sn、getprop命令
+
+生成的adb支持 -s <serial>、root、devices、shell（交互或带命令），
+adb shell启动的是本机sh，PATH中加入假设备命令所在目录。
+"""
+import os
+import shlex
+
+DEFAULT_UNIT_SN = 'FAKE_UNIT_SN_0001'
+DEFAULT_SERIAL = 'SIM0001'
+
+FAKE_ADB = """#!/bin/sh
+# 模拟adb客户端启动和连接adbd的开销
+sleep {latency}
+if [ "$1" = "-s" ]; then shift 2; fi
+if [ {offline} -ne 0 ]; then echo "error: no devices/emulators found" >&2; exit 1; fi
+case "$1" in
+  root) echo "adbd is already running as root" ;;
+  devices) printf 'List of devices attached\\n%s\\tdevice\\n' {serial} ;;
+  shell) shift; PATH={device_dir}:$PATH; export PATH
+         if [ $# -eq 0 ]; then exec sh; else exec sh -c "$*"; fi ;;
+  *) echo "fake adb: unsupported command $1" >&2; exit 1 ;;
+esac
+"""
+
+FAKE_OAI_SN = """#!/bin/sh
+if [ "$1" != "get" ]; then echo "usage: oai-sn get" >&2; exit 1; fi
+echo {unit_sn}
+"""
+
+FAKE_GETPROP = """#!/bin/sh
+case "$1" in
+{cases}
+  *) echo "value_of_$1" ;;
+esac
+"""
+
+
+def _write_script(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, 0o755)
+
+
+def install_fake_adb(directory, unit_sn=DEFAULT_UNIT_SN, serial=DEFAULT_SERIAL, props=None,
+                     latency=0.0, offline=False):
+    """在directory中生成假adb（设备端命令放在directory/device中），返回adb的路径
+
+    latency为每次启动adb客户端的额外延迟(秒)；offline为True时模拟设备未连接。
+    props为getprop的返回值，未列出的属性返回value_of_<属性名>。
+    """
+    device_dir = os.path.join(directory, 'device')
+    os.makedirs(device_dir, exist_ok=True)
+    cases = ''.join(f"  {shlex.quote(name)}) echo {shlex.quote(str(value))} ;;\n"
+                    for name, value in (props or {}).items())
+    _write_script(os.path.join(device_dir, 'oai-sn'), FAKE_OAI_SN.format(unit_sn=shlex.quote(unit_sn)))
+    _write_script(os.path.join(device_dir, 'getprop'), FAKE_GETPROP.format(cases=cases))
+    path = os.path.join(directory, 'adb')
+    _write_script(path, FAKE_ADB.format(latency=latency, offline=int(bool(offline)), serial=shlex.quote(serial),
+                                        device_dir=shlex.quote(device_dir)))
+    return path
@@ -0,0 +1,148 @@
+"""假H60治具：用pty模拟治具串口，按H60指令集应答，可配置延迟和故障注入"""
+import logging
+import os
+import pty
+import random
+import threading
+import time
+import tty
+
+DEFAULT_VERSION = 'H60_FW_V1.0.0'
+HELP_TEXT = ('help', 'Start_test', 'End_test pass|fail', 'Reset', 'Is_Button_Pressed', 'CYLINDER_RESET',
+             'CYLINDER_EXERCISE LEFT|RIGHT', 'FixtureSN', 'Version')
+
+
+class FakeH60:
+    """pty串口上的假H60治具
+
+    start()后port是可以直接用serial.Serial打开的路径（指定link_path时为指向pty的符号链接）。
+    每条命令以CR/LF结束，应答以CRLF结束。延迟和故障注入：
+        latency / jitter   每条命令的应答延迟(秒)及随机抖动
+        cylinder_time      气缸运动命令额外的执行时间(秒)
+        error_rate         以该概率应答"ERROR: ..."
+        timeout_rate       以该概率不应答，用于测试超时处理
+        fail_commands      总是应答错误的命令
+    """
+
+    def __init__(self, link_path=None, fixture_sn='FX000001', version=DEFAULT_VERSION,
+                 latency=0.0, jitter=0.0, cylinder_time=0.0, error_rate=0.0, timeout_rate=0.0,
+                 fail_commands=(), button_pressed=False, seed=None):
+        self.link_path = link_path
+        self.fixture_sn = fixture_sn
+        self.version = version
+        self.latency = latency
+        self.jitter = jitter
+        self.cylinder_time = cylinder_time
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.fail_commands = set(fail_commands)
+        self.button_pressed = button_pressed
+        self.random = random.Random(seed)
+        self.commands = 0  # 已收到的命令数
+        self.cylinder_position = 'RESET'
+        self.testing = False
+        self._master = None
+        self._slave = None
+        self._slave_name = None
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.link_path or self._slave_name
+
+    def start(self):
+        """创建pty并启动应答线程"""
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self._slave_name = os.ttyname(self._slave)
+        if self.link_path:
+            if os.path.islink(self.link_path):
+                os.unlink(self.link_path)
+            os.symlink(self._slave_name, self.link_path)
+        self._thread = threading.Thread(target=self._serve, name=f"fake-h60-{self.fixture_sn}", daemon=True)
+        self._thread.start()
+        logging.info(f"假H60治具已启动: {self.port} -> {self._slave_name}")
+        return self
+
+    def stop(self):
+        """关闭pty并删除符号链接"""
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+        if self.link_path and os.path.islink(self.link_path):
+            os.unlink(self.link_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, command):
+        """返回命令的应答（不含结束符的多行文本），返回None表示不应答"""
+        name, _, argument = command.partition(' ')
+        if command in self.fail_commands or (self.error_rate and self.random.random() < self.error_rate):
+            return f"ERROR: {command} failed"
+        if name == 'help':
+            return '\r\n'.join(HELP_TEXT)
+        if name == 'FixtureSN':
+            return f"FixtureSN: {self.fixture_sn}"
+        if name == 'Version':
+            return f"Version: {self.version}"
+        if name == 'Start_test':
+            self.testing = True
+            return 'Start_test OK'
+        if name == 'End_test' and argument.lower() in ('pass', 'fail'):
+            self.testing = False
+            return f"End_test {argument.lower()} OK"
+        if name == 'Reset':
+            self.testing = False
+            self.cylinder_position = 'RESET'
+            return 'Reset OK'
+        if name == 'Is_Button_Pressed':
+            return f"Button: {1 if self.button_pressed else 0}"
+        if name == 'CYLINDER_RESET':
+            self._move('RESET')
+            return 'CYLINDER_RESET OK'
+        if name == 'CYLINDER_EXERCISE' and argument in ('LEFT', 'RIGHT'):
+            self._move(argument)
+            return f"CYLINDER_EXERCISE {argument} OK"
+        return f"ERROR: unknown command {command}"
+
+    def _move(self, position):
+        if self.cylinder_time:
+            time.sleep(self.cylinder_time)
+        self.cylinder_position = position
+
+    def _serve(self):
+        buffer = b''
+        while True:
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return  # pty已关闭
+            if not data:
+                return
+            buffer += data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                command = line.decode('ascii', errors='ignore').strip()
+                if not command:
+                    continue
+                self.commands += 1
+                if self.timeout_rate and self.random.random() < self.timeout_rate:
+                    continue
+                delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                response = self.respond(command)
+                if response is None:
+                    continue
+                try:
+                    os.write(self._master, response.encode('ascii') + b'\r\n')
+                except OSError:
+                    return
@@ -0,0 +1,92 @@
+"""假nanokdp控制台：显示设备选择菜单，之后按mmwave命令应答
+
+install_fake_nanokdp()生成名为nanokdp的可执行文件，放到PATH最前面即可代替真实的nanokdp，
+NanokdpSession通过pexpect启动它，终端回显由pty完成，与真实控制台一致。
+"""
+import json
+import os
+import random
+import sys
+import time
+
+DEFAULT_DEVICES = ('/dev/cu.debug-console', '/dev/cu.usbserial-Control', '/dev/cu.usbmodem-mmwave')
+DEFAULT_CONFIG = {
+    'model': 'MMW-H60-A1',
+    'firmware': '1.0.0',
+    'devices': list(DEFAULT_DEVICES),
+    'prompt': 'mmwave> ',
+    'latency': 0.0,  # 每条命令的应答延迟(秒)
+    'connect_latency': 0.0,  # 启动到显示菜单的延迟(秒)
+    'error_rate': 0.0,  # 以该概率应答错误
+    'hang_rate': 0.0,  # 以该概率不再显示提示符，用于测试超时处理
+    'seed': None,
+}
+
+LAUNCHER = """#!{python}
+import sys
+sys.path.insert(0, {root!r})
+from simulator.nanokdp import main
+sys.exit(main(sys.argv[1:], {config!r}))
+"""
+
+
+def main(argv=None, config=None):
+    """运行假nanokdp控制台，config为JSON字符串或dict"""
+    if isinstance(config, str):
+        config = json.loads(config)
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    rng = random.Random(config['seed'])
+    out = sys.stdout
+
+    time.sleep(config['connect_latency'])
+    for index, device in enumerate(config['devices'], 1):
+        out.write(f"{index}: {device}\n")
+    out.write("Select a device by its number: ")
+    out.flush()
+    choice = sys.stdin.readline().strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(config['devices']):
+        out.write(f"Invalid selection: {choice}\n")
+        return 1
+    out.write(f"Connected to {config['devices'][int(choice) - 1]}\n")
+
+    while True:
+        out.write(config['prompt'])
+        out.flush()
+        line = sys.stdin.readline()
+        if not line:
+            return 0
+        command = line.strip()
+        if command in ('quit', 'exit'):
+            return 0
+        if not command:
+            continue
+        if config['latency']:
+            time.sleep(config['latency'])
+        if config['hang_rate'] and rng.random() < config['hang_rate']:
+            # 卡住：吞掉之后的输入，不再显示提示符
+            for _ in sys.stdin:
+                pass
+            return 0
+        if config['error_rate'] and rng.random() < config['error_rate']:
+            out.write(f"Error: {command}: device not responding\n")
+        elif command == 'mmwave status':
+            out.write(f"state: on\nDevice: {config['model']}\nFirmware: {config['firmware']}\n")
+        elif command == 'mmwave version':
+            out.write(f"{config['firmware']}\n")
+        elif command == 'help':
+            out.write("mmwave status\nmmwave version\nquit\n")
+        else:
+            out.write(f"Unknown command: {command}\n")
+
+
+def install_fake_nanokdp(directory, **config):
+    """在directory中生成假nanokdp可执行文件，返回其路径"""
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的nanokdp配置: {', '.join(sorted(unknown))}")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(directory, 'nanokdp')
+    with open(path, 'w') as f:
+        f.write(LAUNCHER.format(python=sys.executable, root=root, config=json.dumps(config)))
+    os.chmod(path, 0o755)
+    return path
@@ -0,0 +1,197 @@
+"""耐久（soak）测试：在一个治具上按设定速率循环发送一组命令，记录每条命令的耗时和结果
+
+    soak = SoakRun(['CYLINDER_EXERCISE LEFT', 'CYLINDER_EXERCISE RIGHT', 'CYLINDER_RESET'],
+                   cycles=1000, rate=0.5)
+    station.begin_soak('H60-1', soak)   # 与普通测试一样在治具的测试线程中执行，可用stop_run停止
+    soak.summary()                      # 随时读取进度：吞吐量、失败数、耗时分布和漂移
+    soak.export('soak.csv')             # 导出全部样本
+
+样本保存在array中（每条命令约14字节），长时间运行也不会占用太多内存。
+每条响应按命令的默认语法判定，没有语法的命令只要收到响应即通过。
+"""
+import array
+import csv
+import logging
+import time
+
+import serial
+
+from execution import RunCancelled
+from response_grammar import grammar_for
+from timing import percentile
+
+DEFAULT_COMMANDS = ('CYLINDER_EXERCISE LEFT', 'CYLINDER_EXERCISE RIGHT', 'CYLINDER_RESET')
+PROGRESS_INTERVAL = 1.0  # 发出'soak'进度事件的间隔(秒)
+DRIFT_WINDOW = 100  # 计算漂移时比较最早和最近的样本数
+RECENT_WINDOW = 10.0  # 计算当前吞吐量的时间窗口(秒)
+PERCENTILE_SAMPLES = 2000  # 耗时分位数按最近这么多条样本计算，进度统计的开销不随运行时间增长
+
+
+class SoakRun:
+    """一次耐久测试的配置和样本
+
+    cycles为循环次数，duration为最长运行时间(秒)，两者都不设置时一直运行到停止；
+    rate为每秒循环次数（整组命令算一次），不设置时尽快循环；max_failures为累计失败多少条命令后停止。
+    """
+
+    def __init__(self, commands=DEFAULT_COMMANDS, cycles=None, duration=None, rate=None, max_failures=None,
+                 timeout=None):
+        if not commands:
+            raise ValueError("耐久测试至少需要一条命令")
+        self.commands = list(commands)
+        self.cycles = cycles
+        self.duration = duration
+        self.rate = rate
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self.grammars = [grammar_for(command) for command in self.commands]
+        # 每条命令一个样本：开始时间（相对测试开始）、耗时、命令序号、是否通过
+        self.offsets = array.array('d')
+        self.latencies = array.array('f')
+        self.command_index = array.array('B')
+        self.passed = array.array('B')
+        self.result = None  # 结束后为 'Pass' / 'Fail' / 'Stopped'
+        self.error = None
+        self.cycles_done = 0
+        self.failures = 0
+        # 每条命令的累计次数、失败数和最大耗时
+        self.command_counts = [0] * len(self.commands)
+        self.command_failures = [0] * len(self.commands)
+        self.command_max = [0.0] * len(self.commands)
+        self.last_failure = None
+        self.started_at = None
+        self._start = None
+        self._end = None
+
+    def run(self, ctx, fixture):
+        """测试流程（在治具的测试线程中执行）：循环发送命令直到达到次数、时间、失败上限或被停止"""
+        # 先打开串口，打开和等待治具就绪的时间不计入第一条命令的耗时
+        if fixture.get_connection() is None:
+            raise serial.SerialException(f"无法获取串口连接: {fixture.port}")
+        ctx.on_cancel(fixture.cancel_read)
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        next_cycle = self._start
+        next_progress = self._start + PROGRESS_INTERVAL
+        logging.info(f"治具 {fixture.name} 开始耐久测试: {', '.join(self.commands)}，"
+                     f"次数: {self.cycles}，时长: {self.duration}，速率: {self.rate}")
+        try:
+            while not self._complete():
+                ctx.check_cancelled()
+                for index, command in enumerate(self.commands):
+                    self._send(fixture, index, command, ctx)
+                self.cycles_done += 1
+                now = time.monotonic()
+                if now >= next_progress:
+                    ctx.emit('soak', **self.summary())
+                    next_progress = now + PROGRESS_INTERVAL
+                if self.rate:
+                    next_cycle += 1.0 / self.rate
+                    if next_cycle > now:
+                        ctx.sleep(next_cycle - now)
+                    else:
+                        next_cycle = now  # 跟不上设定速率时不补发
+        finally:
+            self._end = time.monotonic()
+            summary = self.summary()
+            logging.info(f"治具 {fixture.name} 耐久测试结束: {summary['cycles']} 轮，"
+                         f"{summary['commands_sent']} 条命令，失败 {summary['failures']}，漂移 {summary['drift']}")
+        return 'Pass' if self.failures == 0 else 'Fail'
+
+    def _complete(self):
+        if self.cycles is not None and self.cycles_done >= self.cycles:
+            return True
+        if self.duration is not None and time.monotonic() - self._start >= self.duration:
+            return True
+        return self.max_failures is not None and self.failures >= self.max_failures
+
+    def _send(self, fixture, index, command, ctx):
+        start_time = time.monotonic()
+        grammar = self.grammars[index]
+        try:
+            response = fixture.send(command, self.timeout, grammar=grammar)
+            if grammar is not None:
+                verdict = grammar.evaluate(response)
+                passed, reason = verdict.passed, verdict.reason
+            else:
+                passed, reason = bool(response.strip()), "无响应"
+        except RunCancelled:
+            raise
+        except Exception as e:
+            if ctx.cancel_event.is_set():
+                raise RunCancelled()
+            passed, reason = False, str(e)
+        latency = time.monotonic() - start_time
+        self.offsets.append(start_time - self._start)
+        self.latencies.append(latency)
+        self.command_index.append(index)
+        self.passed.append(1 if passed else 0)
+        self.command_counts[index] += 1
+        self.command_max[index] = max(self.command_max[index], latency)
+        if not passed:
+            self.failures += 1
+            self.command_failures[index] += 1
+            self.last_failure = {'cycle': self.cycles_done + 1, 'command': command, 'reason': reason}
+            logging.warning(f"耐久测试第{self.cycles_done + 1}轮 {command} 失败: {reason}")
+
+    def summary(self):
+        """返回当前进度：循环次数、吞吐量、各命令的失败数和耗时分布、耗时漂移
+
+        分位数按每条命令最近的样本计算（共PERCENTILE_SAMPLES条），次数、失败数和最大耗时为累计值。
+        """
+        count = len(self.latencies)
+        elapsed = (self._end or time.monotonic()) - self._start if self._start is not None else 0.0
+        first = max(0, count - PERCENTILE_SAMPLES)
+        recent_samples = [[] for _ in self.commands]
+        for latency, index in zip(self.latencies[first:count], self.command_index[first:count]):
+            recent_samples[index].append(latency)
+        recent = 0
+        for offset in reversed(self.offsets[first:count]):
+            if offset < elapsed - RECENT_WINDOW:
+                break
+            recent += 1
+        commands = {}
+        for index, command in enumerate(self.commands):
+            samples = sorted(recent_samples[index])
+            commands[command] = {
+                'count': self.command_counts[index],
+                'failures': self.command_failures[index],
+                'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                'max_ms': round(self.command_max[index] * 1000, 3),
+            }
+        return {
+            'result': self.result,
+            'cycles': self.cycles_done,
+            'commands_sent': count,
+            'failures': self.failures,
+            'elapsed': round(elapsed, 3),
+            'throughput_cmds_per_s': round(count / elapsed, 2) if elapsed else 0.0,
+            'recent_cmds_per_s': round(recent / min(elapsed, RECENT_WINDOW), 2) if elapsed else 0.0,
+            'drift': self.drift(),
+            'last_failure': self.last_failure,
+            'per_command': commands,
+        }
+
+    def drift(self):
+        """最近DRIFT_WINDOW条与最早DRIFT_WINDOW条命令的平均耗时之比
+
+        样本不足两个窗口时两端各取一半样本比较，少于两条样本时为None。
+        """
+        count = len(self.latencies)
+        window = min(DRIFT_WINDOW, count // 2)
+        if window == 0:
+            return None
+        first = sum(self.latencies[:window]) / window
+        last = sum(self.latencies[count - window:count]) / window
+        return {'first_ms': round(first * 1000, 3), 'recent_ms': round(last * 1000, 3),
+                'ratio': round(last / first, 3) if first else None}
+
+    def export(self, path):
+        """把全部样本写入CSV：序号、开始时间(秒)、命令、耗时(毫秒)、是否通过"""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['seq', 'offset_s', 'command', 'latency_ms', 'passed'])
+            for seq, (offset, latency, index, passed) in enumerate(
+                    zip(self.offsets, self.latencies, self.command_index, self.passed)):
+                writer.writerow([seq, f"{offset:.6f}", self.commands[index], f"{latency * 1000:.3f}", passed])
@@ -0,0 +1,719 @@
+"""测试站核心逻辑（不依赖界面）：治具、设备会话、身份缓存、测试流程、后台轮询和结果上传
+
+Combine.py（界面）和station_cli.py（命令行/守护进程）使用同一个Station：
+    station = Station()
+    station.start()              # 上传、设备轮询和串口预热都在后台进行，不阻塞
+    station.begin_run('H60-1')   # 测试在治具的后台线程中执行
+    station.process_event(...)   # 处理fixture_manager.engine.events中的事件，更新运行记录并上传结果
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+import serial
+
+import metrics
+import timing
+import traffic_capture
+from adb_session import AdbShellSession, AdbError
+from connection_manager import ConnectionManager, fixture_link, session_link
+from fixture import Fixture, FixtureManager, DEFAULT_PIPELINE_WINDOW
+from identity_cache import IdentityCache
+from metadata_collector import collect_metadata
+from nanokdp_session import NanokdpSession, NanokdpError, DEFAULT_DEVICE_CHOICE
+from poll_schedule import AdaptiveInterval
+from response_grammar import FIXTURE_SN, MMWAVE_STATUS, ResponseError, grammar_for
+from results_store import ResultsStore, DEFAULT_DB_PATH
+from sequence import SequenceFile
+from tcp_uploader import TcpUploader
+
+# 治具配置：每个治具一个串口，各自独立运行测试
+# dut为该治具上产品的adb序列号（None表示唯一连接的设备）和nanokdp设备编号；
+# 没有dut的治具不读取Unit_SN和mmwave型号，结果中记为空（只配置一个治具时默认使用唯一的DUT连接）
+FIXTURES = [
+    {'id': 'H60-1', 'port': '/dev/cu.usbserial-Control', 'baudrate': 115200,
+     'dut': {'adb_serial': None, 'nanokdp_device': DEFAULT_DEVICE_CHOICE}},
+    {'id': 'H60-2', 'port': '/dev/cu.usbserial-112201', 'baudrate': 115200},  # 第二个串口端口
+]
+SEQUENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sequences', 'h60_cylinder.json')
+DEFAULT_TCP_HOST = "127.0.0.1"  # 默认IP地址
+DEFAULT_TCP_PORT = 8080  # 默认端口
+
+# 设备身份信息缓存的键前缀（每个DUT为 前缀:治具编号）和过期时间(秒)
+MMWAVE_KEY = 'mmwave'
+ADB_KEY = 'adb'
+IDENTITY_TTLS = {'model': 90.0, 'unit_sn': 300.0, 'fixture_sn': 3600.0}
+# get_unit_sn 失败时返回的占位值，不写入缓存
+UNIT_SN_PLACEHOLDERS = ('unknown_unit_sn', 'timeout_unit_sn', 'error_unit_sn')
+# 后台轮询间隔(秒)：设备信息不变时从POLL_INTERVAL逐步放慢到POLL_MAX_INTERVAL，变化后恢复
+POLL_INTERVAL = 5.0
+POLL_MAX_INTERVAL = 60.0
+POLL_HEARTBEAT = 300.0  # 设备信息不变时也按此间隔上传一次
+POLL_PAUSE_CHECK = 1.0  # 测试期间暂停轮询，按此间隔检查测试是否结束
+# 导出时各数据源的超时时间(秒)
+EXPORT_SOURCE_TIMEOUTS = {'mmwave_model': 15.0, 'unit_sn': 10.0, 'fixture_sn': 3.0}
+TERMINAL_EVENTS = ('done', 'stopped', 'error')
+STATION_ID = socket.gethostname()  # 写入结果库，区分多台测试站
+CAPTURE_DIR = 'captures'  # 串口和nanokdp原始收发记录，用于复现现场失败
+ADB_WARM_TIMEOUT = 5.0  # 后台建立adb会话时执行命令的超时时间(秒)
+
+RUNS = metrics.counter('h60_runs_total', '测试次数', ('fixture', 'result'))
+RUN_DURATION = metrics.histogram('h60_run_duration_seconds', '单次测试耗时', ('fixture', 'result'))
+
+
+class RunRecord:
+    """一个治具一次测试的记录：开始/结束时间、SN、各步骤结果和最终结果"""
+
+    def __init__(self, fixture_id):
+        self.fixture_id = fixture_id
+        self.started_at = time.time()
+        self.start_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))
+        self.ended_at = None
+        self.end_time = None
+        self.sn = None
+        self.steps = []
+        self.result = None  # 'Pass' / 'Fail' / 'Stopped'，结束前为None
+        self.error = None
+        self.elapsed = 0.0
+
+    @property
+    def finished(self):
+        return self.result is not None
+
+    def to_dict(self):
+        return {
+            'fixture_id': self.fixture_id,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'sn': self.sn,
+            'result': self.result,
+            'error': self.error,
+            'total_time': round(self.elapsed, 3),
+            'steps': self.steps,
+        }
+
+
+class DutLink:
+    """一个治具上产品（DUT）的常驻adb shell和nanokdp会话，以及该DUT在身份缓存中的键"""
+
+    def __init__(self, fixture_id, adb_serial=None, nanokdp_device=DEFAULT_DEVICE_CHOICE, on_connect=None):
+        self.fixture_id = fixture_id
+        # 常驻adb shell会话，保持root状态，Unit_SN查询不再每次启动adb进程；
+        # on_connect在每次新建adb shell后调用（参数为DutLink）
+        self.adb_session = AdbShellSession(
+            serial=adb_serial, on_connect=lambda session: on_connect(self) if on_connect else None)
+        # 常驻nanokdp会话，避免每次轮询都重新启动进程
+        self.nanokdp_session = NanokdpSession(device_choice=nanokdp_device)
+        self.adb_key = f"{ADB_KEY}:{fixture_id}"
+        self.mmwave_key = f"{MMWAVE_KEY}:{fixture_id}"
+
+    def close(self):
+        self.nanokdp_session.close()
+        self.adb_session.close()
+
+
+class Station:
+    """一个测试站：多个治具、nanokdp/adb会话、身份缓存、TCP上传和测试流程
+
+    所有方法都可以在任意线程调用；测试进度事件放在fixture_manager.engine.events中，
+    由调用方（界面定时器或start_event_pump启动的线程）取出后交给process_event处理。
+    on_device_info(fixture_id, info)在后台轮询读到某个治具上的mmwave设备信息时调用（在轮询线程中）。
+    """
+
+    def __init__(self, fixtures=FIXTURES, sequence_file=SEQUENCE_FILE,
+                 tcp_host=DEFAULT_TCP_HOST, tcp_port=DEFAULT_TCP_PORT, poll_interval=POLL_INTERVAL,
+                 results_db=DEFAULT_DB_PATH, metrics_port=metrics.DEFAULT_METRICS_PORT, capture_dir=CAPTURE_DIR):
+        self.tcp_host = tcp_host
+        self.tcp_port = tcp_port
+        self.poll_interval = poll_interval
+        self.poll_schedule = AdaptiveInterval(poll_interval, POLL_MAX_INTERVAL, heartbeat=POLL_HEARTBEAT)
+        self.poll_stats = {'reads': 0, 'uploads': 0, 'paused': 0}  # 在_runs_changed锁内更新，用poll_status()读取
+        self.tcp_uploader = None  # 后台批量上传器，断线自动重连
+        # 设备身份信息缓存，由后台轮询线程和测试流程填充，导出和测试时优先读取
+        self.identity_cache = IdentityCache(ttls=IDENTITY_TTLS)
+        # 各治具上DUT的adb和nanokdp会话：fixture_id -> DutLink，治具并行测试时身份信息互不干扰
+        fixtures = list(fixtures)
+        self.duts = {}
+        for config in fixtures:
+            dut = config.get('dut', {} if len(fixtures) == 1 else None)
+            if dut is not None:
+                self.duts[config['id']] = DutLink(
+                    config['id'], dut.get('adb_serial'), dut.get('nanokdp_device', DEFAULT_DEVICE_CHOICE),
+                    # adb重新连接说明DUT可能已更换，Unit_SN重新读取
+                    on_connect=lambda dut: self.identity_cache.invalidate(dut.adb_key))
+        # 治具管理：每个治具一个测试线程，同一治具同一时间只运行一个测试
+        self.fixture_manager = FixtureManager()
+        for config in fixtures:
+            self.fixture_manager.add(Fixture(config['id'], config['port'], config.get('baudrate', 115200),
+                                             on_connect=self.on_fixture_connect))
+        # 流程文件中的步骤类型 -> 执行函数(step, fixture, ctx)，返回响应文本
+        self.step_runners = {
+            'fixture': self.run_fixture_step,
+            'fixture_batch': self.run_fixture_batch_step,
+            'fixture_sn': self.run_fixture_sn_step,
+            'unit_sn': self.run_unit_sn_step,
+            'adb': self.run_adb_step,
+            'mmwave': self.run_mmwave_step,
+        }
+        # 后台预先打开串口和设备会话，定期检查并在断开后自动重连
+        self.connection_manager = ConnectionManager(
+            [fixture_link(fixture) for fixture in self.fixture_manager],
+            uploader=lambda: self.tcp_uploader)
+        for fixture_id, dut in self.duts.items():
+            self.connection_manager.add(session_link(
+                f"adb:{fixture_id}", dut.adb_session,
+                lambda dut=dut: dut.adb_session.run('true', ADB_WARM_TIMEOUT)))
+            self.connection_manager.add(session_link(
+                f"nanokdp:{fixture_id}", dut.nanokdp_session,
+                lambda dut=dut: self.warm_mmwave(dut)))
+        # 测试流程定义文件，修改后下次RUN自动重新加载
+        self.test_sequence = SequenceFile(sequence_file, self.step_runners)
+        self.runs = {}  # fixture_id -> 最近一次的RunRecord
+        self.soaks = {}  # fixture_id -> 正在运行的SoakRun，耐久测试的事件不计入运行记录
+        # 每次测试结束后写入本地结果库，results_db为None时不保存
+        self.results_store = ResultsStore(results_db) if results_db else None
+        self.on_device_info = None
+        self.metrics_port = metrics_port  # 为None时不开放指标端口
+        self.capture_dir = capture_dir  # 为None时不记录原始收发数据
+        self.metrics_server = None
+        self._register_metrics()
+        self.poller_stop = threading.Event()
+        self.polling = False  # 后台设备轮询是否在运行，start(poll=True)后为True
+        self._runs_changed = threading.Condition()
+
+    # ---- 启动和关闭 ----
+
+    def start(self, upload=True, poll=True, warm_up=True, serve_metrics=True):
+        """启动结果库写入、TCP上传、设备轮询、指标端口，并在后台打开和维护治具串口及设备会话；都不阻塞调用方"""
+        if self.capture_dir:
+            traffic_capture.start(self.capture_dir)
+        if serve_metrics and self.metrics_port is not None:
+            self.metrics_server = metrics.serve(self.metrics_port)
+        if self.results_store is not None:
+            self.results_store.start()
+        if upload:
+            self.connect_tcp(self.tcp_host, self.tcp_port)
+        if poll:
+            self.polling = True
+            threading.Thread(target=self.periodically_read_and_upload, name='device-poller', daemon=True).start()
+        if warm_up:
+            self.connection_manager.start()
+
+    def warm_up(self):
+        """在调用线程中立即打开所有治具串口和设备会话，返回 {连接名: 是否可用}"""
+        return self.connection_manager.warm_up()
+
+    def close(self, timing_file=None):
+        """停止测试，关闭串口、设备会话和TCP连接，timing_file不为空时导出耗时统计"""
+        self.connection_manager.stop()
+        self.fixture_manager.close_all()
+        if timing_file:
+            try:
+                timing.recorder.export(timing_file)
+                logging.info(f"耗时统计已导出到 {timing_file}")
+            except OSError as e:
+                logging.error(f"导出耗时统计失败: {str(e)}")
+
+        self.poller_stop.set()
+        for dut in self.duts.values():
+            dut.close()
+
+        # 断开TCP连接
+        self.disconnect_tcp()
+        # 写完结果库中尚未写入的记录
+        if self.results_store is not None:
+            self.results_store.close()
+        if self.capture_dir:
+            traffic_capture.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
+    def _register_metrics(self):
+        """注册采集时才读取的指标：上传队列、连接状态和各治具良率"""
+        def uploader_stats():
+            return self.tcp_uploader.stats() if self.tcp_uploader is not None else None
+
+        def upload_records():
+            stats = uploader_stats()
+            return {(outcome,): stats[outcome] for outcome in ('sent', 'dropped', 'spooled')} if stats else None
+
+        def fixture_yield():
+            values = {}
+            for fixture in self.fixture_manager:
+                passed = RUNS.value(fixture.fixture_id, 'Pass')
+                tested = passed + RUNS.value(fixture.fixture_id, 'Fail')
+                if tested:
+                    values[(fixture.fixture_id,)] = passed / tested
+            return values
+
+        metrics.registry.collector('h60_tcp_upload_queue_depth', 'TCP上传队列中等待发送的记录数',
+                                   lambda: (uploader_stats() or {}).get('queue_depth'))
+        metrics.registry.collector('h60_tcp_upload_records_total', 'TCP上传记录数（已发送/丢弃/暂存到磁盘）',
+                                   upload_records, ('outcome',), kind='counter')
+        metrics.registry.collector('h60_connection_up', '治具串口和设备会话是否可用',
+                                   lambda: {(name,): int(status['up'])
+                                            for name, status in self.connection_manager.status().items()},
+                                   ('connection',))
+        metrics.registry.collector('h60_yield_ratio', '本次启动以来各治具的良率 Pass/(Pass+Fail)',
+                                   fixture_yield, ('fixture',))
+
+    # ---- TCP上传 ----
+
+    def connect_tcp(self, ip_address=DEFAULT_TCP_HOST, port=DEFAULT_TCP_PORT):
+        """启动TCP/IP后台上传，连接在后台建立并在断开后自动重连"""
+        self.tcp_host = ip_address
+        self.tcp_port = port
+
+        self.disconnect_tcp()
+        self.tcp_uploader = TcpUploader(self.tcp_host, self.tcp_port)
+        self.tcp_uploader.start()
+        logging.info(f"TCP/IP上传已启动: {self.tcp_host}:{self.tcp_port}")
+        return True
+
+    def send_tcp_data(self, data):
+        """提交一条数据到上传队列（dict，按行分隔的JSON发送），不阻塞调用线程"""
+        if self.tcp_uploader is None:
+            logging.warning("TCP/IP上传未启动，无法发送数据")
+            return False
+        if not self.tcp_uploader.submit(data):
+            logging.warning("TCP/IP上传队列已满，数据被丢弃")
+            return False
+        return True
+
+    def disconnect_tcp(self):
+        """停止TCP/IP上传并断开连接，未发送的数据保存在暂存文件中"""
+        if self.tcp_uploader is not None:
+            self.tcp_uploader.stop()
+            logging.info(f"TCP/IP连接已断开，上传统计: {self.tcp_uploader.stats()}")
+        self.tcp_uploader = None
+
+    # ---- 设备身份信息 ----
+
+    @timing.timed('get_unit_sn')
+    def get_unit_sn(self, fixture_id, timeout=None):
+        """获取治具上DUT的Unit_SN，通过该DUT常驻的adb shell会话执行 oai-sn get；治具未配置DUT时返回None"""
+        dut = self.duts.get(fixture_id)
+        if dut is None:
+            return None
+        try:
+            returncode, output = dut.adb_session.run('oai-sn get', timeout)
+            if returncode == 0:
+                unit_sn = output.strip()
+                logging.info(f"获取到 {fixture_id} 的Unit_SN: {unit_sn}", extra={'unit_sn': unit_sn})
+                return unit_sn
+            else:
+                logging.error(f"adb shell oai-sn get 执行失败: {output.strip()}")
+                return "unknown_unit_sn"
+
+        except AdbError as e:
+            logging.error(str(e))
+            return "error_unit_sn"
+        except Exception as e:
+            logging.error(f"获取Unit_SN失败: {str(e)}")
+            return "unknown_unit_sn"
+
+    def get_cached_unit_sn(self, fixture_id, timeout=None):
+        """优先从缓存读取治具上DUT的Unit_SN，缓存失效时通过adb读取；治具未配置DUT时返回None"""
+        dut = self.duts.get(fixture_id)
+        if dut is None:
+            return None
+        return self.identity_cache.get_or_fetch(dut.adb_key, 'unit_sn', lambda: self.get_unit_sn(fixture_id, timeout),
+                                                accept=lambda sn: sn and sn not in UNIT_SN_PLACEHOLDERS)
+
+    def get_cached_mmwave_model(self, fixture_id):
+        """优先从缓存读取治具上DUT的mmwave设备型号，缓存失效时通过nanokdp读取；治具未配置DUT时返回None"""
+        dut = self.duts.get(fixture_id)
+        if dut is None:
+            return None
+        return self.identity_cache.get_or_fetch(dut.mmwave_key, 'model',
+                                                lambda: self.read_mmwave_device_info(fixture_id))
+
+    @timing.timed('read_mmwave_device_info')
+    def read_mmwave_device_info(self, fixture_id):
+        """读取治具上DUT的mmwave设备信息，通过该DUT常驻的nanokdp会话执行mmwave status"""
+        dut = self.duts.get(fixture_id)
+        if dut is None:
+            return None
+        try:
+            output = dut.nanokdp_session.query('mmwave status')
+        except NanokdpError as e:
+            logging.error(str(e))
+            return None
+        except Exception as e:
+            logging.error(f"执行nanokdp命令失败: {str(e)}")
+            return None
+        # 解析输出，查找Device信息
+        fields = MMWAVE_STATUS.parse(output)
+        return fields.get('device') if fields else None
+
+    def warm_mmwave(self, dut):
+        """预热DUT的nanokdp会话：执行mmwave status并把读到的型号写入身份缓存，返回会话是否可用"""
+        output = dut.nanokdp_session.query('mmwave status')
+        fields = MMWAVE_STATUS.parse(output)
+        if fields and fields.get('device'):
+            self.identity_cache.put(dut.mmwave_key, 'model', fields['device'])
+        return output is not None
+
+    def on_fixture_connect(self, fixture):
+        """治具串口重新连接后治具和产品都可能已更换，清除该串口和治具上DUT的Unit_SN缓存"""
+        self.identity_cache.invalidate(fixture.port)
+        dut = self.duts.get(fixture.fixture_id)
+        if dut is not None:
+            self.identity_cache.invalidate(dut.adb_key)
+
+    def cached_dut_identity(self, fixture_id):
+        """返回缓存中治具上DUT的(Unit_SN, mmwave型号)，不读取设备；治具未配置DUT或未读到时为None"""
+        dut = self.duts.get(fixture_id)
+        if dut is None:
+            return None, None
+        return self.identity_cache.get(dut.adb_key, 'unit_sn'), self.identity_cache.get(dut.mmwave_key, 'model')
+
+    def read_fixture_sn(self, fixture, timeout=None):
+        """发送FixtureSN命令读取治具序列号，并写入身份缓存"""
+        fixture_sn_response = fixture.send('FixtureSN', timeout, grammar=FIXTURE_SN)
+        # 提取序列号（响应格式为 "FixtureSN: ABC123"、"FixtureSN ABC123" 或只有序列号），无响应或ERROR时为空
+        verdict = FIXTURE_SN.evaluate(fixture_sn_response)
+        extracted_sn = verdict.value if verdict.passed else ''
+        if not verdict.passed:
+            logging.warning(f"治具 {fixture.name} 序列号响应无效: {verdict.reason}")
+        if extracted_sn:
+            self.identity_cache.put(fixture.port, 'fixture_sn', extracted_sn)
+        return extracted_sn
+
+    def get_cached_fixture_sn(self, fixture):
+        """优先从缓存读取治具序列号；没有缓存且治具空闲时通过串口读取"""
+        fixture_sn = self.identity_cache.get(fixture.port, 'fixture_sn')
+        if fixture_sn is None and not self.fixture_manager.is_running(fixture.fixture_id):
+            fixture_sn = self.read_fixture_sn(fixture)
+        return fixture_sn
+
+    def collect_export_metadata(self):
+        """并发读取导出所需的设备信息，返回(结果, 错误)
+
+        键为 fixture_sn:<治具编号>，配置了DUT的治具还有 unit_sn:<治具编号> 和 mmwave_model:<治具编号>。
+        """
+        sources = {}
+        for fixture_id in self.duts:
+            sources[f"mmwave_model:{fixture_id}"] = (
+                lambda fixture_id=fixture_id: self.get_cached_mmwave_model(fixture_id),
+                EXPORT_SOURCE_TIMEOUTS['mmwave_model'])
+            sources[f"unit_sn:{fixture_id}"] = (
+                lambda fixture_id=fixture_id: self.get_cached_unit_sn(fixture_id), EXPORT_SOURCE_TIMEOUTS['unit_sn'])
+        # 每个治具的序列号单独读取，一个治具无响应不影响其他治具
+        for fixture in self.fixture_manager:
+            sources[f"fixture_sn:{fixture.fixture_id}"] = (
+                lambda fixture=fixture: self.get_cached_fixture_sn(fixture), EXPORT_SOURCE_TIMEOUTS['fixture_sn'])
+        return collect_metadata(sources)
+
+    def periodically_read_and_upload(self):
+        """后台线程：按自适应间隔读取各DUT的mmwave设备信息，同时填充身份缓存
+
+        只在设备信息变化或心跳到期时上传；信息稳定时轮询逐步放慢，读到变化后恢复快速轮询。
+        有治具正在测试时暂停轮询，不与测试争用nanokdp和adb。
+        """
+        schedule = self.poll_schedule
+        last_info = {}  # fixture_id -> 上次读到的设备信息
+        delay = 1.0  # 启动1秒后开始
+        while not self.poller_stop.wait(delay):
+            if self.is_testing():
+                self._count_poll('paused')
+                delay = POLL_PAUSE_CHECK
+                continue
+            self._count_poll('reads')
+            heartbeat = schedule.heartbeat_due()
+            any_changed = reported = False
+            for dut in self.duts.values():
+                changed, uploaded = self.poll_dut(dut, last_info, heartbeat)
+                any_changed = any_changed or changed
+                reported = reported or uploaded
+            if reported:
+                schedule.reported()
+            delay = schedule.next(any_changed)
+
+    def poll_dut(self, dut, last_info, heartbeat):
+        """轮询一个DUT：读取mmwave设备信息，变化或心跳到期时上传，返回(是否变化, 是否上传)"""
+        fixture_id = dut.fixture_id
+        info = self.read_mmwave_device_info(fixture_id)
+        changed = bool(info) and info != last_info.get(fixture_id)
+        uploaded = False
+        if info:
+            last_info[fixture_id] = info
+            _, previous = self.identity_cache.put(dut.mmwave_key, 'model', info)
+            if changed and previous is not None and previous != info:
+                # mmwave型号变化说明产品已更换，Unit_SN需要重新读取
+                logging.info(f"{fixture_id} mmwave设备变化: {previous} -> {info}")
+                self.identity_cache.invalidate(dut.adb_key)
+
+            if changed or heartbeat:
+                # 准备上传数据，changed为False表示心跳
+                upload_data = {
+                    'device_type': 'mmwave_device',
+                    'fixture_id': fixture_id,
+                    'timestamp': time.time(),
+                    'info': info,
+                    'changed': changed,
+                }
+                # 发送数据到TCP服务器
+                self.send_tcp_data(upload_data)
+                self._count_poll('uploads')
+                uploaded = True
+
+                if self.on_device_info:
+                    self.on_device_info(fixture_id, info)
+
+        # Unit_SN缓存失效时在后台重新读取，导出时就不必等待adb
+        if self.identity_cache.get(dut.adb_key, 'unit_sn') is None:
+            self.get_cached_unit_sn(fixture_id)
+        return changed, uploaded
+
+    def _count_poll(self, name):
+        with self._runs_changed:
+            self.poll_stats[name] += 1
+
+    def poll_status(self):
+        """返回后台轮询统计的快照：读取、上传、暂停次数和当前轮询间隔"""
+        with self._runs_changed:
+            return dict(self.poll_stats, interval=self.poll_schedule.current)
+
+    def is_testing(self):
+        """是否有治具正在测试"""
+        return any(self.fixture_manager.is_running(fixture.fixture_id) for fixture in self.fixture_manager)
+
+    # ---- 测试流程 ----
+
+    def run_fixture_step(self, step, fixture, ctx):
+        """流程步骤：在治具上发送串口命令"""
+        return fixture.send(step.command, step.timeout, grammar=step.grammar)
+
+    def run_fixture_batch_step(self, step, fixture, ctx):
+        """流程步骤：在治具上流水线发送commands中的命令，任一命令的响应不符合其默认语法时失败"""
+        window = None if step.window == 0 else (step.window or DEFAULT_PIPELINE_WINDOW)
+        responses = fixture.send_pipelined(step.commands, window, step.match, step.timeout)
+        for command, response in zip(step.commands, responses):
+            grammar = grammar_for(command)
+            verdict = grammar.evaluate(response) if grammar is not None else None
+            if verdict is not None and not verdict.passed:
+                raise ResponseError(f"{command}: {verdict.reason}")
+        return ''.join(responses)
+
+    def run_fixture_sn_step(self, step, fixture, ctx):
+        """流程步骤：读取治具序列号，治具未重连时直接使用缓存"""
+        fixture_sn = self.identity_cache.get(fixture.port, 'fixture_sn')
+        if fixture_sn is None:
+            fixture_sn = self.read_fixture_sn(fixture, step.timeout)
+        return fixture_sn
+
+    def dut_for(self, fixture, error):
+        """返回治具上DUT的连接，治具未配置DUT时抛出error类型的异常"""
+        dut = self.duts.get(fixture.fixture_id)
+        if dut is None:
+            raise error(f"治具 {fixture.name} 未配置DUT连接")
+        return dut
+
+    def run_unit_sn_step(self, step, fixture, ctx):
+        """流程步骤：通过治具上DUT的adb读取Unit_SN，后台轮询已读到时直接使用缓存"""
+        self.dut_for(fixture, AdbError)
+        unit_sn = self.get_cached_unit_sn(fixture.fixture_id, step.timeout)
+        if not unit_sn or unit_sn in UNIT_SN_PLACEHOLDERS:
+            raise AdbError(f"未读取到Unit_SN: {unit_sn}")
+        return unit_sn
+
+    def run_adb_step(self, step, fixture, ctx):
+        """流程步骤：在adb shell中执行命令，返回码非0时失败"""
+        returncode, output = self.dut_for(fixture, AdbError).adb_session.run(step.command, step.timeout)
+        if returncode != 0:
+            raise AdbError(f"adb命令返回 {returncode}: {output.strip()}")
+        return output
+
+    def run_mmwave_step(self, step, fixture, ctx):
+        """流程步骤：通过治具上DUT的nanokdp会话执行mmwave命令"""
+        return self.dut_for(fixture, NanokdpError).nanokdp_session.query(step.command, step.timeout)
+
+    def run_test_sequence(self, ctx, fixture):
+        """测试流程（在治具的后台线程中执行），按流程文件执行各步骤，通过ctx上报进度"""
+        plan = self.test_sequence.plan()
+        logging.info(f"尝试连接串口 {fixture.port}")
+        # 使用统一的串口连接管理
+        if fixture.get_connection() is None:
+            raise serial.SerialException("无法获取串口连接")
+        logging.info("串口连接成功")
+        # 停止时打断阻塞中的串口读取
+        ctx.on_cancel(fixture.cancel_read)
+        result = plan.run(ctx, fixture, self.step_runners)
+        if not self.polling:
+            # 没有后台轮询时（如station_cli run）缓存中没有mmwave型号，结束前读取一次，写入结果库；
+            # 有轮询时只记录缓存中的值，不在测试线程中等待nanokdp
+            self.get_cached_mmwave_model(fixture.fixture_id)
+        return result
+
+    def check_fixture_ids(self, fixture_ids):
+        """检查治具编号都已配置，有未知编号时抛出ValueError"""
+        unknown = [fixture_id for fixture_id in fixture_ids if fixture_id not in self.fixture_manager.fixtures]
+        if unknown:
+            raise ValueError(f"未知的治具: {', '.join(map(str, unknown))}")
+
+    def begin_run(self, fixture_id):
+        """在指定治具上启动测试，治具正忙时返回False，治具编号未知时抛出ValueError"""
+        self.check_fixture_ids([fixture_id])
+        with self._runs_changed:
+            if self.fixture_manager.is_running(fixture_id):  # 防止重复启动
+                return False
+            logging.info(f"开始执行测试流程: {fixture_id}")
+            # Unit_SN在adb重连、治具串口重连或mmwave型号变化时失效，RUN时不重新读取
+            self.runs[fixture_id] = RunRecord(fixture_id)
+            return self.fixture_manager.start(fixture_id, self.run_test_sequence)
+
+    def begin_soak(self, fixture_id, soak):
+        """在指定治具上启动耐久测试（SoakRun），治具正忙时返回False；耐久测试不写入结果库也不上传"""
+        self.check_fixture_ids([fixture_id])
+        with self._runs_changed:
+            if self.fixture_manager.is_running(fixture_id):
+                return False
+            logging.info(f"开始耐久测试: {fixture_id}")
+            self.soaks[fixture_id] = soak
+            if not self.fixture_manager.start(fixture_id, soak.run):
+                self.soaks.pop(fixture_id, None)
+                return False
+            return True
+
+    def stop_run(self, fixture_id):
+        """停止指定治具上的测试，停止完成后会收到'stopped'事件"""
+        logging.info(f"执行停止操作: {fixture_id}")
+        return self.fixture_manager.stop(fixture_id)
+
+    def execute_command(self, command, fixture_id):
+        """在指定治具上执行一条命令并返回响应，失败时抛出异常"""
+        return self.fixture_manager.get(fixture_id).send(command)
+
+    def process_event(self, fixture_id, kind, data):
+        """处理一个测试事件并更新运行记录，测试结束时记录日志并上传结果，返回该次测试的RunRecord
+
+        耐久测试的事件只更新对应的SoakRun，返回该SoakRun。
+        """
+        with self._runs_changed:
+            soak = self.soaks.get(fixture_id)
+            if soak is not None:
+                if kind in TERMINAL_EVENTS:
+                    self.soaks.pop(fixture_id)
+                    soak.result = data['result'] if kind == 'done' else ('Stopped' if kind == 'stopped' else 'Fail')
+                    if kind == 'error':
+                        soak.error = str(data['error'])
+                    logging.info(f"{fixture_id} 耐久测试结束，结果: {soak.result}")
+                    self._runs_changed.notify_all()
+                return soak
+            record = self.runs.get(fixture_id)
+            if record is None:
+                record = self.runs[fixture_id] = RunRecord(fixture_id)
+            if kind == 'sn':
+                record.sn = data['sn']
+            elif kind == 'step':
+                # 记录测试结果
+                record.steps.append({
+                    'step': data['step'],
+                    'command': data['command'],
+                    'result': data['result'],
+                    'status': data['status'],
+                    'timestamp': data['elapsed']
+                })
+                record.elapsed = data['elapsed']
+            elif kind in TERMINAL_EVENTS:
+                # 记录测试结束时间
+                record.ended_at = time.time()
+                record.end_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.ended_at))
+                record.elapsed = data['elapsed']
+                if kind == 'done':
+                    record.result = data['result']
+                elif kind == 'stopped':
+                    record.result = 'Stopped'
+                else:
+                    # 测试出错，结果为Fail
+                    record.result = 'Fail'
+                    record.error = str(data['error'])
+                self._runs_changed.notify_all()
+
+        if kind in TERMINAL_EVENTS:
+            # 测试结束后产品可能已更换，后台轮询恢复快速读取
+            self.poll_schedule.reset()
+            RUNS.inc(fixture_id, record.result)
+            RUN_DURATION.observe(record.elapsed, fixture_id, record.result)
+            self.store_run(record)
+        if kind in ('done', 'error'):
+            fixture = self.fixture_manager.get(fixture_id)
+            logging.info(f"{fixture.name} 测试完成，结果: {record.result}",
+                         extra={'result': record.result, 'port': fixture.port,
+                                'fixture_sn': self.identity_cache.get(fixture.port, 'fixture_sn'),
+                                'unit_sn': self.cached_dut_identity(fixture_id)[0],
+                                'latency_ms': round(record.elapsed * 1000, 1)})
+            self.upload_test_result(record)
+        return record
+
+    def store_run(self, record):
+        """把一次测试提交到结果库写入队列（包括被停止的测试），不阻塞调用线程"""
+        if self.results_store is None:
+            return
+        fixture = self.fixture_manager.get(record.fixture_id)
+        unit_sn, mmwave_model = self.cached_dut_identity(record.fixture_id)
+        self.results_store.submit({
+            'station_id': STATION_ID,
+            'fixture_id': record.fixture_id,
+            'fixture_sn': self.identity_cache.get(fixture.port, 'fixture_sn') or record.sn,
+            'unit_sn': unit_sn,
+            'mmwave_model': mmwave_model,
+            'result': record.result,
+            'error': record.error,
+            'start_time': record.started_at,
+            'end_time': record.ended_at,
+            'total_time': round(record.elapsed, 3),
+            'steps': list(record.steps),
+        })
+
+    def upload_test_result(self, record):
+        """把治具本次测试结果提交到TCP上传队列"""
+        fixture = self.fixture_manager.get(record.fixture_id)
+        self.send_tcp_data(dict(
+            record.to_dict(),
+            device_type='test_result',
+            timestamp=time.time(),
+            fixture_sn=self.identity_cache.get(fixture.port, 'fixture_sn'),
+            unit_sn=self.cached_dut_identity(record.fixture_id)[0],
+        ))
+
+    def start_event_pump(self):
+        """没有界面时启动后台线程处理测试事件"""
+        def pump():
+            while True:
+                fixture_id, kind, data = self.fixture_manager.engine.events.get()
+                self.process_event(fixture_id, kind, data)
+
+        threading.Thread(target=pump, name='station-events', daemon=True).start()
+
+    def _wait_until(self, predicate, timeout):
+        """在运行记录变化时检查predicate，直到为True；超时返回False"""
+        with self._runs_changed:
+            return self._runs_changed.wait_for(predicate, timeout)
+
+    def wait_for_runs(self, records, timeout=None):
+        """等待这些RunRecord全部结束（需要有线程在处理事件），超时返回False"""
+        records = list(records)
+        return self._wait_until(lambda: all(record.finished for record in records), timeout)
+
+    def wait_for_soak(self, soak, timeout=None):
+        """等待耐久测试结束（需要有线程在处理事件），超时返回False"""
+        return self._wait_until(lambda: soak.result is not None, timeout)
+
+    def run(self, fixture_ids=None, timeout=None):
+        """在指定治具（默认全部）上同时测试并等待结束，返回 {治具编号: RunRecord}
+
+        需要先调用start_event_pump；治具正忙时跳过该治具。
+        """
+        fixture_ids = fixture_ids or [fixture.fixture_id for fixture in self.fixture_manager]
+        self.check_fixture_ids(fixture_ids)
+        started = [fixture_id for fixture_id in fixture_ids if self.begin_run(fixture_id)]
+        with self._runs_changed:
+            records = {fixture_id: self.runs[fixture_id] for fixture_id in started}
+        self.wait_for_runs(records.values(), timeout)
+        return records
@@ -0,0 +1,407 @@
+"""无界面运行测试站：单次测试、常驻守护进程，以及向守护进程发送请求
+
+    python station_cli.py run [--fixture H60-1] [--port H60-1=/tmp/h60-sim-1]
+    python station_cli.py daemon [--socket /tmp/h60-station.sock]
+    python station_cli.py daemon --metrics-port 9108   # Prometheus指标: http://127.0.0.1:9108/metrics
+    python station_cli.py call '{"cmd": "run", "fixtures": ["H60-1"]}'
+    python station_cli.py history [--unit-sn SN] [--fixture-sn SN] [--since 2026-10-01] [--until ...]
+    python station_cli.py yield [--by day] [--since 2026-10-01]
+    python station_cli.py export --since 2026-10-01 --until 2026-11-01 [--format csv|parquet|arrow] [--output export]
+    python station_cli.py recheck --since 2026-10-01 [--sequence sequences/h60_cylinder.json]
+    python station_cli.py replay captures/ [--channel /dev/cu.usbserial-Control] [--speed 10]
+    python station_cli.py logs [--since 2026-10-01] [--level ERROR] [--keyword 无法连接串口] [--sn SN] [--command Version]
+    python station_cli.py soak --fixture H60-1 --cycles 1000 [--duration 3600] [--rate 0.5] [--samples soak.csv]
+
+守护进程在本地Unix socket上接收请求，每行一个JSON对象，每个请求返回一行JSON：
+    {"cmd": "ping"}
+    {"cmd": "run", "fixtures": [...], "wait": true, "timeout": 60}   不指定fixtures时测试所有治具
+    {"cmd": "stop", "fixtures": [...]}
+    {"cmd": "status"}
+    {"cmd": "command", "fixture": "H60-1", "command": "Version"}
+    {"cmd": "soak", "fixture": "H60-1", "commands": [...], "cycles": 1000, "duration": 3600, "rate": 0.5}
+    {"cmd": "history", "unit_sn": "...", "fixture_sn": "...", "since": "...", "until": "...", "limit": 100}
+    {"cmd": "yield", "group_by": "fixture_id", "since": "...", "until": "..."}
+    {"cmd": "shutdown"}
+返回 {"ok": true, ...} 或 {"ok": false, "error": "..."}。
+
+不导入tkinter，pexpect在第一次访问nanokdp时才加载，TCP上传、设备轮询和串口预热都在后台进行。
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+DEFAULT_SOCKET = '/tmp/h60-station.sock'
+RUN_TIMEOUT = 120.0  # run请求默认的最长等待时间(秒)
+SOAK_PROGRESS_INTERVAL = 10.0  # soak命令输出进度的间隔(秒)
+
+
+def build_station(args):
+    """按命令行参数创建Station，--port可把治具指向其他串口（如模拟器）"""
+    from station import Station, FIXTURES, SEQUENCE_FILE
+
+    ports = dict(item.split('=', 1) for item in args.port)
+    fixtures = [dict(config, port=ports.get(config['id'], config['port'])) for config in FIXTURES]
+    host, _, port = args.tcp.rpartition(':')
+    return Station(fixtures=fixtures, sequence_file=args.sequence or SEQUENCE_FILE,
+                   tcp_host=host or '127.0.0.1', tcp_port=int(port), results_db=args.db,
+                   metrics_port=args.metrics_port or None, capture_dir=args.capture or None)
+
+
+HISTORY_FIELDS = ('unit_sn', 'fixture_sn', 'fixture_id', 'result', 'since', 'until', 'limit', 'include_steps')
+YIELD_FIELDS = ('group_by', 'fixture_id', 'fixture_sn', 'since', 'until')
+
+
+def query_results(store, request):
+    """执行history/yield查询，request为守护进程请求或命令行参数转换的dict"""
+    if request['cmd'] == 'history':
+        return {'runs': store.history(**{key: request[key] for key in HISTORY_FIELDS if key in request})}
+    return {'yield': store.yield_summary(**{key: request[key] for key in YIELD_FIELDS if key in request})}
+
+
+def cmd_run(args):
+    """执行一次测试，结果以JSON输出到标准输出，全部Pass时返回0"""
+    station = build_station(args)
+    station.start(upload=not args.no_upload, poll=False, serve_metrics=False)
+    station.start_event_pump()
+    try:
+        records = station.run(args.fixture or None, timeout=args.timeout)
+    finally:
+        station.close()
+    results = {fixture_id: record.to_dict() for fixture_id, record in records.items()}
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0 if results and all(record['result'] == 'Pass' for record in results.values()) else 1
+
+
+class StationRequestHandler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接：逐行读取JSON请求并逐行返回JSON结果"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                reply = dict(self.server.dispatch(request), ok=True)
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(reply, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            if reply.get('shutdown'):
+                return
+
+
+class StationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """守护进程：多个客户端可以同时连接，不同治具的测试并行执行"""
+    daemon_threads = True
+
+    def __init__(self, path, station):
+        self.station = station
+        super().__init__(path, StationRequestHandler)
+
+    def dispatch(self, request):
+        station = self.station
+        cmd = request.get('cmd')
+        fixture_ids = request.get('fixtures') or [fixture.fixture_id for fixture in station.fixture_manager]
+        # 先检查全部治具编号，有未知编号时整个请求返回错误，不会只启动其中一部分
+        station.check_fixture_ids(fixture_ids)
+        if cmd == 'ping':
+            return {}
+        if cmd == 'run':
+            started = [fixture_id for fixture_id in fixture_ids if station.begin_run(fixture_id)]
+            records = [station.runs[fixture_id] for fixture_id in started]
+            if not request.get('wait', True):
+                return {'started': started}
+            finished = station.wait_for_runs(records, request.get('timeout', RUN_TIMEOUT))
+            return {'started': started, 'finished': finished,
+                    'results': {record.fixture_id: record.to_dict() for record in records}}
+        if cmd == 'stop':
+            return {'stopped': [fixture_id for fixture_id in fixture_ids if station.stop_run(fixture_id)]}
+        if cmd == 'status':
+            uploader = station.tcp_uploader
+            return {
+                'fixtures': {
+                    fixture.fixture_id: {
+                        'port': fixture.port,
+                        'running': station.fixture_manager.is_running(fixture.fixture_id),
+                        'last': station.runs[fixture.fixture_id].to_dict()
+                        if fixture.fixture_id in station.runs else None,
+                        'soak': station.soaks[fixture.fixture_id].summary()
+                        if fixture.fixture_id in station.soaks else None,
+                    } for fixture in station.fixture_manager
+                },
+                'uploader': uploader.stats() if uploader else None,
+                'connections': station.connection_manager.status(),
+                'poller': station.poll_status(),
+            }
+        if cmd == 'command':
+            return {'response': station.execute_command(request['command'], request['fixture'])}
+        if cmd == 'soak':
+            from soak import SoakRun, DEFAULT_COMMANDS
+            soak = SoakRun(request.get('commands') or DEFAULT_COMMANDS, request.get('cycles'),
+                           request.get('duration'), request.get('rate'), request.get('max_failures'))
+            return {'started': station.begin_soak(request['fixture'], soak)}
+        if cmd in ('history', 'yield'):
+            if station.results_store is None:
+                raise ValueError("结果库未启用")
+            return query_results(station.results_store, request)
+        if cmd == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'shutdown': True}
+        raise ValueError(f"未知请求: {cmd}")
+
+
+def cmd_daemon(args):
+    """常驻运行，在Unix socket上接收请求"""
+    station = build_station(args)
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = StationServer(args.socket, station)
+    station.start(upload=not args.no_upload)
+    station.start_event_pump()
+    logging.info(f"测试站守护进程已启动: {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        station.close()
+        logging.info("测试站守护进程已退出")
+    return 0
+
+
+def cmd_query(args):
+    """直接读取本地结果库，输出历史记录或良率统计（不需要守护进程）"""
+    from results_store import ResultsStore
+
+    if not os.path.exists(args.db):
+        sys.stderr.write(f"结果库不存在: {args.db}\n")
+        return 1
+    request = {key: value for key, value in vars(args).items() if value is not None}
+    request['cmd'] = args.command
+    json.dump(query_results(ResultsStore(args.db), request), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+def cmd_export(args):
+    """把结果库中符合条件的测试流式导出为CSV或Parquet/Arrow文件"""
+    from results_export import export_results, ExportError
+
+    filters = {key: getattr(args, key) for key in ('unit_sn', 'fixture_sn', 'fixture_id', 'result', 'since', 'until')
+               if getattr(args, key) is not None}
+    try:
+        summary = export_results(args.db, args.output, args.format, args.chunk_size, **filters)
+    except ExportError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+def cmd_recheck(args):
+    """用流程文件中的响应语法重新判定结果库中保存的步骤响应，输出各步骤的通过数和判定变化"""
+    from results_export import recheck_results, ExportError
+    from sequence import load_sequence, SequenceError
+
+    if args.sequence is None:
+        from station import SEQUENCE_FILE
+        args.sequence = SEQUENCE_FILE
+    filters = {key: getattr(args, key) for key in ('unit_sn', 'fixture_sn', 'fixture_id', 'result', 'since', 'until')
+               if getattr(args, key) is not None}
+    try:
+        plan = load_sequence(args.sequence)
+        summary = recheck_results(args.db, plan, args.chunk_size, **filters)
+    except (ExportError, SequenceError) as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+def cmd_replay(args):
+    """把抓包中的命令响应按当前流程的判定条件重新判定，输出每条命令的统计和失败的交互"""
+    import traffic_capture
+    from sequence import load_sequence, SequenceError
+
+    grammars = {}
+    if args.sequence:
+        try:
+            plan = load_sequence(args.sequence)
+        except SequenceError as e:
+            sys.stderr.write(f"{e}\n")
+            return 1
+        grammars = {step.command: step.grammar for step in plan.steps if step.command and step.grammar}
+    files = traffic_capture.capture_files(args.path)
+    if not files or not os.path.exists(files[0]):
+        sys.stderr.write(f"没有抓包文件: {args.path}\n")
+        return 1
+    exchanges = traffic_capture.replay(args.path, grammars, args.speed, args.channel)
+    json.dump(traffic_capture.summarize(exchanges), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+def cmd_logs(args):
+    """增量更新日志索引后查询app.log及其轮转文件，按时间顺序输出匹配的行"""
+    from log_index import LogIndex
+    index = LogIndex(args.log_file)
+    try:
+        index.update()
+        matches = index.search(since=args.since, until=args.until, level=args.level, keyword=args.keyword,
+                               command=args.log_command, sn=args.sn, limit=args.limit)
+    finally:
+        index.close()
+    for match in matches:
+        prefix = f"{os.path.basename(match.path)}:{match.offset}: " if args.offsets else ''
+        sys.stdout.write(prefix + match.text.rstrip('\n') + '\n')
+    return 0 if matches else 1
+
+
+def cmd_soak(args):
+    """在一个治具上运行耐久测试，定期在标准错误输出进度，结束后以JSON输出统计；没有失败时返回0"""
+    from soak import SoakRun, DEFAULT_COMMANDS
+    soak = SoakRun(args.soak_command or DEFAULT_COMMANDS, args.cycles, args.duration, args.rate, args.max_failures,
+                   args.timeout)
+    station = build_station(args)
+    station.start(upload=False, poll=False)
+    station.start_event_pump()
+    try:
+        if not station.begin_soak(args.fixture, soak):
+            sys.stderr.write(f"治具 {args.fixture} 正忙\n")
+            return 1
+        try:
+            while not station.wait_for_soak(soak, args.progress):
+                sys.stderr.write(json.dumps(soak.summary(), ensure_ascii=False) + '\n')
+        except KeyboardInterrupt:
+            station.stop_run(args.fixture)
+            station.wait_for_soak(soak)
+    finally:
+        station.close()
+    if args.samples:
+        soak.export(args.samples)
+    json.dump(soak.summary(), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return 0 if soak.result == 'Pass' else 1
+
+
+def cmd_call(args):
+    """向守护进程发送一个JSON请求并输出返回结果"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        sock.sendall(args.request.encode('utf-8').rstrip(b'\n') + b'\n')
+        reply = sock.makefile('rb').readline()
+    sys.stdout.write(reply.decode('utf-8'))
+    return 0 if json.loads(reply).get('ok') else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='守护进程的Unix socket路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    station_options = argparse.ArgumentParser(add_help=False)
+    station_options.add_argument('--port', action='append', default=[], metavar='ID=PATH',
+                                 help='把治具指向其他串口，可重复指定')
+    station_options.add_argument('--sequence', help='测试流程文件，默认使用sequences/h60_cylinder.json')
+    station_options.add_argument('--tcp', default='127.0.0.1:8080', help='结果上传服务器 host:port')
+    station_options.add_argument('--no-upload', action='store_true', help='不上传测试结果')
+    station_options.add_argument('--log-file', default='app.log')
+    station_options.add_argument('--db', default='results.db', help='本地结果库')
+    station_options.add_argument('--capture', default='captures',
+                                 help='记录串口和nanokdp原始收发数据的目录，空字符串为不记录')
+    station_options.add_argument('--metrics-port', type=int, default=9108,
+                                 help='守护进程的Prometheus指标端口（http://127.0.0.1:端口/metrics），0为不开放')
+
+    query_options = argparse.ArgumentParser(add_help=False)
+    query_options.add_argument('--db', default='results.db', help='本地结果库')
+    query_options.add_argument('--fixture-sn', dest='fixture_sn')
+    query_options.add_argument('--fixture', dest='fixture_id', help='治具编号')
+    query_options.add_argument('--since', help='开始时间，例如 2026-10-01 或 "2026-10-01 08:00"')
+    query_options.add_argument('--until', help='结束时间（不含）')
+    query_options.add_argument('--unit-sn', dest='unit_sn')
+    query_options.add_argument('--result', choices=('Pass', 'Fail', 'Stopped'))
+
+    run_parser = subparsers.add_parser('run', parents=[station_options], help='执行一次测试并输出JSON结果')
+    run_parser.add_argument('--fixture', action='append', help='要测试的治具编号，默认全部，可重复指定')
+    run_parser.add_argument('--timeout', type=float, default=RUN_TIMEOUT)
+    run_parser.set_defaults(func=cmd_run)
+
+    daemon_parser = subparsers.add_parser('daemon', parents=[station_options], help='常驻运行，通过socket接收请求')
+    daemon_parser.set_defaults(func=cmd_daemon)
+
+    history_parser = subparsers.add_parser('history', parents=[query_options], help='查询测试历史记录')
+    history_parser.add_argument('--limit', type=int, default=100)
+    history_parser.add_argument('--steps', dest='include_steps', action='store_true', help='同时输出各步骤结果')
+    history_parser.set_defaults(func=cmd_query)
+
+    yield_parser = subparsers.add_parser('yield', parents=[query_options], help='统计良率')
+    yield_parser.add_argument('--by', dest='group_by', choices=('fixture_id', 'fixture_sn', 'station_id', 'day', 'hour'))
+    yield_parser.set_defaults(func=cmd_query)
+
+    export_parser = subparsers.add_parser('export', parents=[query_options], help='批量导出历史测试')
+    export_parser.add_argument('--format', choices=('csv', 'parquet', 'arrow'), default='csv')
+    export_parser.add_argument('--output', default='export', help='输出目录，生成runs和steps两个文件')
+    export_parser.add_argument('--chunk-size', type=int, default=5000, help='每次读取和写入的行数')
+    export_parser.set_defaults(func=cmd_export)
+
+    recheck_parser = subparsers.add_parser('recheck', parents=[query_options], help='按当前流程的判定条件重新判定历史响应')
+    recheck_parser.add_argument('--sequence', help='测试流程文件，默认使用sequences/h60_cylinder.json')
+    recheck_parser.add_argument('--chunk-size', type=int, default=5000, help='每次读取的行数')
+    recheck_parser.set_defaults(func=cmd_recheck)
+
+    replay_parser = subparsers.add_parser('replay', help='回放抓包文件并重新判定命令响应')
+    replay_parser.add_argument('path', help='抓包目录或文件')
+    replay_parser.add_argument('--sequence', help='使用流程文件中各命令步骤的判定条件，默认使用命令的默认语法')
+    replay_parser.add_argument('--channel', help='只回放这个串口（或nanokdp）的数据')
+    replay_parser.add_argument('--speed', type=float, help='按原始时间间隔回放的倍速，默认不等待')
+    replay_parser.set_defaults(func=cmd_replay)
+
+    logs_parser = subparsers.add_parser('logs', help='通过索引查询历史日志（包括轮转的旧日志）')
+    logs_parser.add_argument('--log-file', default='app.log')
+    logs_parser.add_argument('--since', help='开始时间，例如 2026-10-01 或 "2026-10-01 08:00"')
+    logs_parser.add_argument('--until', help='结束时间（不含）')
+    logs_parser.add_argument('--level', action='append', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'),
+                             help='日志级别，可重复指定')
+    logs_parser.add_argument('--keyword', help='消息中包含的文字，不区分大小写')
+    logs_parser.add_argument('--command', dest='log_command', help='串口命令')
+    logs_parser.add_argument('--sn', help='Unit_SN或FixtureSN')
+    logs_parser.add_argument('--limit', type=int, default=1000)
+    logs_parser.add_argument('--offsets', action='store_true', help='在每行前输出文件名和字节偏移')
+    logs_parser.set_defaults(func=cmd_logs)
+
+    soak_parser = subparsers.add_parser('soak', parents=[station_options], help='循环发送治具命令进行耐久测试')
+    soak_parser.add_argument('--fixture', required=True, help='治具编号')
+    soak_parser.add_argument('--command', dest='soak_command', action='append',
+                             help='每轮依次发送的命令，可重复指定，默认 CYLINDER_EXERCISE LEFT/RIGHT 和 CYLINDER_RESET')
+    soak_parser.add_argument('--cycles', type=int, help='循环次数')
+    soak_parser.add_argument('--duration', type=float, help='最长运行时间(秒)')
+    soak_parser.add_argument('--rate', type=float, help='每秒循环次数，默认尽快循环')
+    soak_parser.add_argument('--max-failures', type=int, help='累计失败多少条命令后停止')
+    soak_parser.add_argument('--timeout', type=float, help='每条命令的超时时间(秒)')
+    soak_parser.add_argument('--progress', type=float, default=SOAK_PROGRESS_INTERVAL, help='输出进度的间隔(秒)')
+    soak_parser.add_argument('--samples', help='把每条命令的耗时和结果写入这个CSV文件')
+    soak_parser.set_defaults(func=cmd_soak)
+
+    call_parser = subparsers.add_parser('call', help='向守护进程发送一个JSON请求')
+    call_parser.add_argument('request', help='JSON请求，例如 {"cmd": "status"}')
+    call_parser.set_defaults(func=cmd_call)
+
+    args = parser.parse_args(argv)
+    if args.command in ('run', 'daemon', 'soak'):
+        from log_setup import setup_logging
+        setup_logging(args.log_file, json_file=os.path.splitext(args.log_file)[0] + '.jsonl')
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
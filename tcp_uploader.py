@@ -0,0 +1,217 @@
+"""TCP批量上传：后台线程从有界队列取数据，按行分隔的JSON批量发送，断线自动重连并暂存到磁盘"""
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from timing import span
+
+DEFAULT_SPOOL_PATH = 'tcp_spool.jsonl'
+STOP_MARGIN = 1.0  # 停止时在连接超时之外多等待的时间(秒)
+
+
+class TcpUploader:
+    """后台TCP上传器
+
+    submit()只把记录放入有界队列，不会阻塞调用线程；队列满时丢弃并计数。
+    后台线程每次最多取batch_size条记录，编码为每行一个JSON对象后一次写入。
+    服务器不可用时记录追加到spool_path，重连成功后先补发暂存数据再发送新数据；
+    重连间隔按指数退避，最长max_reconnect_delay秒。
+    """
+
+    def __init__(self, host, port, max_queue=10000, batch_size=100, batch_interval=0.2,
+                 spool_path=DEFAULT_SPOOL_PATH, max_spool_bytes=50 * 1024 * 1024,
+                 connect_timeout=5.0, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.spool_path = spool_path
+        self.max_spool_bytes = max_spool_bytes
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._socket = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_connect = 0.0
+        self._current_delay = reconnect_delay
+        self._stats_lock = threading.Lock()
+        self._stats = {'sent': 0, 'dropped': 0, 'spooled': 0, 'batches': 0, 'connects': 0}
+
+    @property
+    def connected(self):
+        return self._socket is not None
+
+    def start(self):
+        """启动后台上传线程（连接在后台建立，不阻塞调用方）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name='tcp-uploader', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止上传线程，未发送的数据写入暂存文件
+
+        默认等待connect_timeout加STOP_MARGIN秒，足够正在进行的连接超时返回；
+        线程仍未退出时由调用线程把队列中剩余的数据写入暂存文件，进程退出也不丢数据。
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.connect_timeout + STOP_MARGIN if timeout is None else timeout)
+            if self._thread.is_alive():
+                logging.warning("TCP上传线程未能及时退出，队列中的数据直接写入暂存文件")
+                self._spool_remaining()
+        self._thread = None
+
+    def submit(self, record):
+        """提交一条记录（dict），队列已满时丢弃并返回False"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+    def stats(self):
+        """返回队列深度、发送/丢弃/暂存计数和连接状态"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['connected'] = self.connected
+        try:
+            stats['spool_bytes'] = os.path.getsize(self.spool_path)
+        except OSError:
+            stats['spool_bytes'] = 0
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _worker(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if not batch:
+                # 空闲时也尝试重连，以便及时补发暂存数据
+                if self._ensure_connected():
+                    self._flush_spool()
+                continue
+            payload = self._encode(batch)
+            if self._ensure_connected() and self._flush_spool() and self._send(payload):
+                self._count('sent', len(batch))
+                self._count('batches')
+            else:
+                self._spool(payload, len(batch))
+
+        # 退出前把队列中剩余的数据写入暂存文件
+        self._spool_remaining()
+        self._disconnect()
+
+    def _spool_remaining(self):
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._spool(self._encode(remaining), len(remaining))
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.batch_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _encode(records):
+        return ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n'
+                       for record in records).encode('utf-8')
+
+    def _ensure_connected(self):
+        if self._socket is not None:
+            return True
+        if time.monotonic() < self._next_connect:
+            return False
+        try:
+            # 在后台线程中统计实际建立连接的耗时，失败的连接计入errors
+            with span('connect_tcp'):
+                sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logging.error(f"TCP/IP连接失败: {str(e)}，{self._current_delay:.1f}秒后重试")
+            self._next_connect = time.monotonic() + self._current_delay
+            self._current_delay = min(self._current_delay * 2, self.max_reconnect_delay)
+            return False
+        self._socket = sock
+        self._current_delay = self.reconnect_delay
+        self._count('connects')
+        logging.info(f"TCP/IP连接成功: {self.host}:{self.port}")
+        return True
+
+    def _send(self, payload):
+        try:
+            self._socket.sendall(payload)
+            return True
+        except OSError as e:
+            logging.error(f"TCP/IP发送数据失败: {str(e)}")
+            self._disconnect()
+            return False
+
+    def _disconnect(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def _spool(self, payload, count):
+        """服务器不可用时把数据追加到暂存文件，超过大小上限则丢弃"""
+        try:
+            size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+            if size + len(payload) > self.max_spool_bytes:
+                logging.warning(f"TCP暂存文件已满，丢弃 {count} 条数据")
+                self._count('dropped', count)
+                return
+            with open(self.spool_path, 'ab') as f:
+                f.write(payload)
+            self._count('spooled', count)
+        except OSError as e:
+            logging.error(f"写入TCP暂存文件失败: {str(e)}")
+            self._count('dropped', count)
+
+    def _flush_spool(self, chunk_size=64 * 1024):
+        """补发暂存文件中的数据，全部发送成功返回True；中途失败时保留未发送部分"""
+        try:
+            with open(self.spool_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            logging.error(f"读取TCP暂存文件失败: {str(e)}")
+            return True
+        offset = 0
+        while offset < len(data):
+            # 按整行切块发送，失败时从未发送的行开始保留
+            end = data.rfind(b'\n', offset, offset + chunk_size) + 1 or len(data)
+            if not self._send(data[offset:end]):
+                with open(self.spool_path, 'wb') as f:
+                    f.write(data[offset:])
+                return False
+            self._count('sent', data.count(b'\n', offset, end))
+            offset = end
+        os.remove(self.spool_path)
+        logging.info(f"已补发TCP暂存数据 {len(data)} 字节")
+        return True
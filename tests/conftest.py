@@ -0,0 +1,37 @@
+"""测试公共设置：把仓库根目录加入模块搜索路径，并提供假H60治具和接好假adb/nanokdp的测试站"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import FakeH60, install_fake_tools  # noqa: E402
+from station import Station  # noqa: E402
+
+UNIT_SN = 'UNIT0001'
+MODEL = 'MMW-H60-A1'
+
+
+@pytest.fixture
+def sim():
+    with FakeH60(seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    """把假adb和假nanokdp放到PATH最前面，返回所在目录"""
+    bin_dir = install_fake_tools(str(tmp_path / 'bin'), unit_sn=UNIT_SN, model=MODEL)
+    monkeypatch.setenv('PATH', bin_dir + os.pathsep + os.environ['PATH'])
+    return bin_dir
+
+
+@pytest.fixture
+def station(sim, fake_tools, tmp_path):
+    station = Station(fixtures=[{'id': 'S1', 'port': sim.port}], results_db=str(tmp_path / 'results.db'),
+                      metrics_port=None, capture_dir=None)
+    station.start(upload=False, poll=False, warm_up=False, serve_metrics=False)
+    station.start_event_pump()
+    yield station
+    station.close()
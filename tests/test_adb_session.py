@@ -0,0 +1,91 @@
+"""adb长连接会话：批量执行、断开后重试一次、命令超时和连接失败后的指数退避"""
+import pytest
+
+from adb_session import AdbError, AdbShellSession
+from simulator import install_fake_adb
+
+
+@pytest.fixture
+def adb(tmp_path):
+    return install_fake_adb(str(tmp_path / 'online'), unit_sn='UNIT0001', props={'ro.serialno': 'SIM0001'})
+
+
+@pytest.fixture
+def offline_adb(tmp_path):
+    return install_fake_adb(str(tmp_path / 'offline'), offline=True)
+
+
+def test_batch_reuses_shell(adb):
+    connects = []
+    session = AdbShellSession(adb, on_connect=connects.append)
+    try:
+        assert session.run_batch(['oai-sn get', 'printf partial', 'exit_code() { return 3; }; exit_code']) == [
+            (0, 'UNIT0001\n'), (0, 'partial'), (3, '')]
+        assert session.getprops(['ro.serialno', 'ro.other']) == {'ro.serialno': 'SIM0001',
+                                                                 'ro.other': 'value_of_ro.other'}
+        assert connects == [session]
+    finally:
+        session.close()
+
+
+def test_reused_shell_that_exited_is_retried_once(adb):
+    connects = []
+    session = AdbShellSession(adb, on_connect=connects.append)
+    try:
+        session.run('true')
+        session._proc.kill()
+        session._proc.wait()
+        assert session.run('oai-sn get') == (0, 'UNIT0001\n')
+        assert len(connects) == 2
+    finally:
+        session.close()
+
+
+def test_timeout_closes_without_retry(adb):
+    session = AdbShellSession(adb)
+    try:
+        with pytest.raises(AdbError):
+            session.run('sleep 5', timeout=0.2)
+        assert not session.is_connected()
+        # 超时不算连接失败，下次调用立即重连
+        assert session.run('oai-sn get') == (0, 'UNIT0001\n')
+    finally:
+        session.close()
+
+
+def test_connect_failures_back_off(offline_adb, adb):
+    session = AdbShellSession(offline_adb, reconnect_delay=0.5, max_reconnect_delay=1.0)
+    with pytest.raises(AdbError, match='adb连接失败'):
+        session.run('oai-sn get')
+    assert session._current_delay == 1.0
+    with pytest.raises(AdbError, match='重连等待中'):
+        session.run('oai-sn get')
+
+    session._next_retry = 0.0
+    with pytest.raises(AdbError, match='adb连接失败'):
+        session.run('oai-sn get')
+    assert session._current_delay == 1.0  # 不超过max_reconnect_delay
+
+    # 设备连接后成功执行一次，退避时间恢复初始值
+    session.adb = adb
+    session._next_retry = 0.0
+    try:
+        assert session.run('oai-sn get') == (0, 'UNIT0001\n')
+        assert session._current_delay == 0.5
+    finally:
+        session.close()
+
+
+def test_shell_exiting_immediately_counts_as_connect_failure(tmp_path):
+    # 没有root步骤时，shell启动后立即退出（如设备未连接）也要退避
+    session = AdbShellSession('/bin/false', root=False, reconnect_delay=5.0)
+    with pytest.raises(AdbError):
+        session.run('true')
+    with pytest.raises(AdbError, match='重连等待中'):
+        session.run('true')
+
+
+def test_missing_adb(tmp_path):
+    session = AdbShellSession(str(tmp_path / 'missing-adb'))
+    with pytest.raises(AdbError, match='adb连接失败'):
+        session.run('true')
@@ -0,0 +1,59 @@
+"""身份缓存：按字段过期、写入返回变化、按设备或字段清除、get_or_fetch只缓存有效值"""
+import pytest
+
+import identity_cache
+from identity_cache import IdentityCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(identity_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_fields_expire_after_their_ttl(clock):
+    cache = IdentityCache(ttls={'unit_sn': 300.0}, default_ttl=60.0)
+    cache.put('adb:S1', 'unit_sn', 'UNIT0001')
+    cache.put('mmwave:S1', 'model', 'MMW-H60-A1')
+
+    clock[0] += 60.0
+    assert cache.get('mmwave:S1', 'model') == 'MMW-H60-A1'
+    clock[0] += 1.0
+    assert cache.get('mmwave:S1', 'model') is None
+    assert cache.get('adb:S1', 'unit_sn') == 'UNIT0001'
+    clock[0] += 240.0
+    assert cache.get('adb:S1', 'unit_sn') is None
+
+
+def test_put_reports_change():
+    cache = IdentityCache()
+    assert cache.put('mmwave:S1', 'model', 'A') == (True, None)
+    assert cache.put('mmwave:S1', 'model', 'A') == (False, 'A')
+    assert cache.put('mmwave:S1', 'model', 'B') == (True, 'A')
+
+
+def test_invalidate_device_or_field():
+    cache = IdentityCache()
+    cache.put('/dev/tty1', 'fixture_sn', 'FX1')
+    cache.put('/dev/tty1', 'other', 'x')
+    cache.put('/dev/tty2', 'fixture_sn', 'FX2')
+
+    cache.invalidate('/dev/tty1', 'other')
+    assert cache.get('/dev/tty1', 'fixture_sn') == 'FX1'
+    assert cache.get('/dev/tty1', 'other') is None
+    cache.invalidate('/dev/tty1')
+    assert cache.get('/dev/tty1', 'fixture_sn') is None
+    assert cache.get('/dev/tty2', 'fixture_sn') == 'FX2'
+
+
+def test_get_or_fetch_caches_only_accepted_values():
+    cache = IdentityCache()
+    replies = ['error_unit_sn', 'UNIT0001', 'UNIT0002']
+    fetch = lambda: replies.pop(0)  # noqa: E731
+    accept = lambda sn: sn and not sn.startswith('error')  # noqa: E731
+
+    assert cache.get_or_fetch('adb:S1', 'unit_sn', fetch, accept) == 'error_unit_sn'
+    assert cache.get_or_fetch('adb:S1', 'unit_sn', fetch, accept) == 'UNIT0001'
+    assert cache.get_or_fetch('adb:S1', 'unit_sn', fetch, accept) == 'UNIT0001'
+    assert replies == ['UNIT0002']
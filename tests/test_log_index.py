@@ -0,0 +1,81 @@
+"""日志索引：时间段、级别、关键字、命令和SN过滤，增量更新与轮转"""
+import os
+
+import pytest
+
+import log_index
+from log_index import LogIndex
+
+LOG = [
+    "2026-10-01 08:00:00,100 - INFO - 发送命令: GET_VERSION\n",
+    "2026-10-01 08:00:01,200 - INFO - 命令执行成功: GET_VERSION, Unit_SN: UNIT0001\n",
+    "2026-10-01 09:00:00,000 - ERROR - 无法连接串口 /dev/ttyUSB0\n",
+    "Traceback (most recent call last):\n",
+    "2026-10-02 10:00:00,000 - WARNING - 命令执行失败: RUN, FixtureSN: FX-42\n",
+    "2026-10-02 11:00:00,000 - INFO - 串口已重新连接\n",
+]
+
+
+@pytest.fixture(params=[True, False], ids=['fts', 'scan'])
+def index(request, tmp_path, monkeypatch):
+    path = tmp_path / 'app.log'
+    path.write_text(''.join(LOG), encoding='utf-8')
+    if not request.param:
+        monkeypatch.setattr(log_index, '_fts_available', lambda conn: False)
+    index = LogIndex(str(path))
+    if request.param and not index.full_text:
+        index.close()
+        pytest.skip('SQLite不支持FTS5 trigram')
+    assert index.update() == len(LOG)
+    yield index
+    index.close()
+
+
+def texts(matches):
+    return [match.text for match in matches]
+
+
+def test_filters(index):
+    assert texts(index.search(since='2026-10-02')) == LOG[4:]
+    assert texts(index.search(until='2026-10-01 09:00')) == LOG[:2]
+    # 多行日志的后续行沿用ERROR级别
+    assert texts(index.search(level='ERROR')) == LOG[2:4]
+    assert texts(index.search(level=['warning', 'ERROR'])) == LOG[2:5]
+    assert texts(index.search(command='GET_VERSION')) == LOG[:2]
+    assert texts(index.search(sn='UNIT0001')) == [LOG[1]]
+    assert texts(index.search(sn='FX-42')) == [LOG[4]]
+    assert texts(index.search(keyword='无法连接串口')) == [LOG[2]]
+    assert texts(index.search(keyword='traceback')) == [LOG[3]]
+    assert texts(index.search(keyword='串口', since='2026-10-02')) == [LOG[5]]
+    assert len(index.search(limit=2)) == 2
+
+    match = index.search(level='ERROR')[0]
+    assert match.level == 'ERROR'
+    with open(match.path, 'rb') as f:
+        f.seek(match.offset)
+        assert f.readline().decode('utf-8') == LOG[2]
+
+
+def test_incremental_update_and_rotation(index):
+    with open(index.log_file, 'a', encoding='utf-8') as f:
+        f.write("2026-10-03 08:00:00,000 - ERROR - 部分")
+    assert index.update() == 0  # 没写完的行下次再索引
+    with open(index.log_file, 'a', encoding='utf-8') as f:
+        f.write("写入\n")
+    assert index.update() == 1
+
+    # 轮转只是改名，不重新索引
+    os.rename(index.log_file, index.log_file + '.1')
+    with open(index.log_file, 'w', encoding='utf-8') as f:
+        f.write("2026-10-04 08:00:00,000 - ERROR - 轮转后\n")
+    assert index.update() == 1
+    matches = index.search(level='ERROR', since='2026-10-03')
+    assert [(os.path.basename(m.path), m.text) for m in matches] == [
+        ('app.log.1', "2026-10-03 08:00:00,000 - ERROR - 部分写入\n"),
+        ('app.log', "2026-10-04 08:00:00,000 - ERROR - 轮转后\n"),
+    ]
+
+    # 删除的轮转文件从索引中移除
+    os.remove(index.log_file + '.1')
+    index.update()
+    assert [stat['path'] for stat in index.stats()] == [index.log_file]
@@ -0,0 +1,72 @@
+"""日志增量读取：末尾若干行、只读新增内容、未写完的行、向前加载和日志轮转"""
+import os
+
+import log_tail
+from log_tail import LogTail
+
+
+def write(path, text, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+
+def texts(lines):
+    return [text for _, text in lines]
+
+
+def test_tail_new_lines_and_partial_line(tmp_path):
+    path = str(tmp_path / 'app.log')
+    write(path, ''.join(f"line {n}\n" for n in range(10)) + 'part', 'w')
+    tail = LogTail(path)
+
+    # 未写完的末行占一个名额但不返回，留给read_new
+    lines = tail.open_tail(3)
+    assert texts(lines) == ['line 8\n', 'line 9\n']
+    assert tail.has_older
+
+    write(path, 'ial\nline 11\n')
+    new, rotated = tail.read_new()
+    assert not rotated
+    assert texts(new) == ['partial\n', 'line 11\n']
+    # 偏移指向行首，调用方可据此在文件中定位
+    with open(path, 'rb') as f:
+        f.seek(new[0][0])
+        assert f.readline() == b'partial\n'
+    assert tail.read_new() == ([], False)
+
+
+def test_read_older_crosses_block_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_tail, 'READ_BLOCK_SIZE', 16)
+    path = str(tmp_path / 'app.log')
+    write(path, ''.join(f"line {n:02d}\n" for n in range(20)), 'w')
+    tail = LogTail(path)
+
+    assert texts(tail.open_tail(5)) == [f"line {n:02d}\n" for n in range(15, 20)]
+    assert texts(tail.read_older(10)) == [f"line {n:02d}\n" for n in range(5, 15)]
+    assert texts(tail.read_older(10)) == [f"line {n:02d}\n" for n in range(0, 5)]
+    assert not tail.has_older
+    assert tail.read_older(10) == []
+
+
+def test_rotation_restarts_from_new_file(tmp_path):
+    path = str(tmp_path / 'app.log')
+    write(path, 'old 1\nold 2\n', 'w')
+    tail = LogTail(path)
+    tail.open_tail(10)
+
+    os.rename(path, path + '.1')
+    write(path, 'new 1\n', 'w')
+    new, rotated = tail.read_new()
+    assert rotated
+    assert new == [(0, 'new 1\n')]
+
+    # 原地截断（文件变短）也视为轮转
+    write(path, 'x\n', 'w')
+    new, rotated = tail.read_new()
+    assert rotated and texts(new) == ['x\n']
+
+
+def test_missing_file(tmp_path):
+    tail = LogTail(str(tmp_path / 'missing.log'))
+    assert tail.open_tail(10) == []
+    assert tail.read_new() == ([], False)
@@ -0,0 +1,67 @@
+"""指标文本格式：计数器、直方图、采集回调和分位数摘要"""
+import timing
+from metrics import MetricsRegistry
+
+
+def test_summary_publishes_timing_quantiles():
+    recorder = timing.TimingRecorder()
+    for ms in range(1, 101):
+        recorder.record('send_command:Version', ms / 1000.0)
+    recorder.record('step:left', 1.0)
+    registry = MetricsRegistry()
+    registry.summary('cmd_seconds', '命令耗时', lambda: {(name,): stats
+                                                      for name, stats in recorder.quantiles('send_command:').items()},
+                     ('command',))
+
+    lines = registry.render().splitlines()
+    stats = recorder.summary()['send_command:Version']
+    assert '# TYPE cmd_seconds summary' in lines
+    # 指标端口与耗时统计文件的分位数来自同一份样本，不会不一致
+    assert f'cmd_seconds{{command="Version",quantile="0.95"}} {stats["p95_ms"] / 1000.0!r}' in lines
+    assert 'cmd_seconds_count{command="Version"} 100' in lines
+    assert not any('step:left' in line for line in lines)
+
+
+def test_counter_and_histogram_render():
+    registry = MetricsRegistry()
+    runs = registry.counter('runs_total', '测试次数', ('fixture', 'result'))
+    runs.inc('H60-1', 'Pass')
+    runs.inc('H60-1', 'Pass', amount=2)
+    runs.inc('H60-"2"', 'Fail')
+    duration = registry.histogram('run_seconds', '测试耗时', buckets=(1.0, 5.0))
+    for seconds in (0.5, 3.0, 7.0):
+        duration.observe(seconds)
+    assert registry.counter('runs_total', '同名指标只创建一次') is runs
+
+    lines = registry.render().splitlines()
+    assert 'runs_total{fixture="H60-1",result="Pass"} 3' in lines
+    assert 'runs_total{fixture="H60-\\"2\\"",result="Fail"} 1' in lines
+    assert lines[lines.index('# TYPE run_seconds histogram') + 1:] == [
+        'run_seconds_bucket{le="1.0"} 1',
+        'run_seconds_bucket{le="5.0"} 2',
+        'run_seconds_bucket{le="+Inf"} 3',
+        'run_seconds_sum 10.5',
+        'run_seconds_count 3',
+    ]
+
+
+def test_collector_skips_none_and_failing_callbacks():
+    registry = MetricsRegistry()
+    registry.collector('queue_depth', '队列深度', lambda: None)
+    registry.collector('link_up', '连接状态', lambda: {('adb:S1',): 1, ('S1',): 0}, ('connection',))
+    registry.collector('broken', '采集失败', lambda: 1 / 0)
+
+    lines = registry.render().splitlines()
+    samples = [line for line in lines if not line.startswith('#')]
+    assert samples == ['link_up{connection="S1"} 0', 'link_up{connection="adb:S1"} 1']
+    assert not any('broken' in line for line in lines)
+
+
+def test_tcp_connect_is_timed_in_the_worker(monkeypatch, tmp_path):
+    import tcp_uploader
+    recorder = timing.TimingRecorder()
+    monkeypatch.setattr(tcp_uploader, 'span', recorder.span)
+    uploader = tcp_uploader.TcpUploader('127.0.0.1', 9, spool_path=str(tmp_path / 'spool.jsonl'),
+                                        connect_timeout=0.5)
+    assert not uploader._ensure_connected()  # 端口9没有服务，连接失败
+    assert recorder.summary()['connect_tcp']['errors'] == 1
@@ -0,0 +1,80 @@
+"""nanokdp长连接会话：通过假nanokdp查询、断开后重试一次、超时和连接失败后的指数退避"""
+import pytest
+
+pytest.importorskip('pexpect')
+
+from nanokdp_session import NanokdpError, NanokdpSession
+from simulator import install_fake_nanokdp
+
+MODEL = 'MMW-H60-A1'
+
+
+def fake_nanokdp(tmp_path, name='nanokdp', **config):
+    directory = tmp_path / name
+    directory.mkdir()
+    return install_fake_nanokdp(str(directory), model=MODEL, **config)
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = NanokdpSession(fake_nanokdp(tmp_path), connect_timeout=5, command_timeout=5)
+    yield session
+    session.close()
+
+
+def test_query(session):
+    output = session.query('mmwave status')
+    assert f"Device: {MODEL}" in output
+    assert 'mmwave>' not in output and not output.startswith('mmwave status')
+    assert session.query('mmwave version').strip() == '1.0.0'
+
+
+def test_reused_session_that_exited_is_retried_once(session):
+    session.query('mmwave version')
+    session._child.close(force=True)
+    assert f"Device: {MODEL}" in session.query('mmwave status')
+    assert session.is_connected()
+
+
+def test_hung_console_times_out_and_reconnects(tmp_path):
+    session = NanokdpSession(fake_nanokdp(tmp_path, hang_rate=1.0), connect_timeout=5)
+    try:
+        with pytest.raises(NanokdpError, match='TIMEOUT'):
+            session.query('mmwave status', timeout=0.3)
+        assert not session.is_connected()
+        # 命令超时不算连接失败，下次调用立即重连
+        with pytest.raises(NanokdpError, match='TIMEOUT'):
+            session.query('mmwave status', timeout=0.3)
+    finally:
+        session.close()
+
+
+def test_connect_failures_back_off(tmp_path):
+    session = NanokdpSession(str(tmp_path / 'missing-nanokdp'), reconnect_delay=0.5, max_reconnect_delay=1.0)
+    with pytest.raises(NanokdpError, match='nanokdp连接失败'):
+        session.query('mmwave status')
+    assert session._current_delay == 1.0
+    with pytest.raises(NanokdpError, match='重连等待中'):
+        session.query('mmwave status')
+
+    session._next_retry = 0.0
+    with pytest.raises(NanokdpError, match='nanokdp连接失败'):
+        session.query('mmwave status')
+    assert session._current_delay == 1.0  # 不超过max_reconnect_delay
+
+    # 恢复后成功连接一次，退避时间恢复初始值
+    session.command = fake_nanokdp(tmp_path)
+    session._next_retry = 0.0
+    try:
+        assert f"Device: {MODEL}" in session.query('mmwave status')
+        assert session._current_delay == 0.5
+    finally:
+        session.close()
+
+
+def test_invalid_device_choice_is_connect_failure(tmp_path):
+    session = NanokdpSession(fake_nanokdp(tmp_path), device_choice='9', connect_timeout=2, reconnect_delay=5.0)
+    with pytest.raises(NanokdpError, match='nanokdp连接失败'):
+        session.query('mmwave status')
+    with pytest.raises(NanokdpError, match='重连等待中'):
+        session.query('mmwave status')
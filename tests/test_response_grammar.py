@@ -0,0 +1,80 @@
+"""响应语法：默认命令语法、字段提取和类型转换、限值判定、逐块判定"""
+import pytest
+
+from response_grammar import (FIXTURE_SN, MMWAVE_STATUS, GrammarError, compile_grammar, grammar_for)
+
+
+@pytest.mark.parametrize('response', ['FixtureSN: ABC123\r\n', 'FixtureSN ABC123\r\n', 'ABC123\r\n'])
+def test_fixture_sn_formats(response):
+    verdict = FIXTURE_SN.evaluate(response)
+    assert verdict.passed
+    assert verdict.value == 'ABC123'
+
+
+@pytest.mark.parametrize('response', ['FixtureSN: H60 FX 0001\r\n', 'H60 FX 0001 \r\n'])
+def test_fixture_sn_with_spaces(response):
+    verdict = FIXTURE_SN.evaluate(response)
+    assert verdict.passed
+    assert verdict.value == 'H60 FX 0001'
+
+
+@pytest.mark.parametrize('response', ['', 'ERROR: unknown command\r\n', 'FixtureSN\r\n'])
+def test_fixture_sn_rejects_invalid(response):
+    assert not FIXTURE_SN.evaluate(response).passed
+
+
+def test_mmwave_status_device():
+    output = 'mmwave status\r\nState: ready\r\nDevice: MMW-H60-A1 rev2 \r\n'
+    assert MMWAVE_STATUS.parse(output) == {'device': 'MMW-H60-A1 rev2'}
+    assert MMWAVE_STATUS.parse('State: ready\r\n') is None
+
+
+def test_cylinder_fail_words():
+    grammar = grammar_for('CYLINDER_EXERCISE LEFT')
+    assert grammar.evaluate('CYLINDER_EXERCISE LEFT OK\r\n').passed
+    assert not grammar.evaluate('CYLINDER_EXERCISE LEFT TIMEOUT\r\n').passed
+    assert not grammar.evaluate('').passed
+    assert grammar_for('no such command') is None
+
+
+def test_typed_fields_and_limits():
+    grammar = compile_grammar({
+        'extract': r'V=(?P<volts>[\d.]+) ID=(?P<id>[0-9a-f]+) ON=(?P<on>\w+)',
+        'fields': {'volts': 'float', 'id': 'hex', 'on': 'bool'},
+        'value': 'volts', 'min': 3.0, 'max': 3.6,
+        'limits': {'id': {'equals': [255]}},
+    }, 'power')
+    verdict = grammar.evaluate('V=3.3 ID=ff ON=yes')
+    assert verdict.passed
+    assert verdict.value == 3.3
+    assert verdict.fields == {'volts': 3.3, 'id': 255, 'on': True}
+
+    assert '大于上限' in grammar.evaluate('V=3.9 ID=ff ON=yes').reason
+    assert '不在允许值' in grammar.evaluate('V=3.3 ID=fe ON=yes').reason
+    assert '字段类型不符' in grammar.evaluate('V=3.3 ID=ff ON=maybe').reason
+
+
+@pytest.mark.parametrize('spec', [
+    {'expect': '('},
+    {'unknown': 1},
+    {'extract': r'(\d+)', 'value': 'x'},
+    {'extract': r'(?P<x>\d+)', 'fields': {'x': 'complex'}},
+    {'extract': r'(?P<x>\d+)', 'limits': {'y': {'min': 1}}},
+    {'min': 'low'},
+])
+def test_invalid_grammar(spec):
+    with pytest.raises(GrammarError):
+        compile_grammar(spec, 'bad')
+
+
+def test_stream_decides_on_first_matching_line():
+    stream = grammar_for('FixtureSN').stream()
+    assert stream.feed(b'FixtureSN: AB') is None
+    verdict = stream.feed(b'C123\r\n')
+    assert verdict is not None and verdict.passed and verdict.value == 'ABC123'
+
+    stream = grammar_for('CYLINDER_RESET').stream()
+    assert stream.feed('CYLINDER_RESET ') is None
+    assert stream.result().passed
+    stream = grammar_for('CYLINDER_RESET').stream()
+    assert not stream.feed('CYLINDER_RESET FAILED\r\n').passed
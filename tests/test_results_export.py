@@ -0,0 +1,78 @@
+"""历史测试导出：规范化的runs/steps文件、按条件过滤，以及用新的响应语法重新判定"""
+import csv
+import os
+
+import pytest
+
+from results_export import ExportError, export_results, recheck_results
+from results_store import ResultsStore, to_timestamp
+from sequence import compile_sequence
+
+BASE = to_timestamp('2026-03-02 08:00:00')
+
+
+def step(name, command, status, response):
+    return {'step': name, 'command': command, 'status': status, 'result': response, 'timestamp': 0.1}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.db'))
+    store.submit({'fixture_id': 'H60-1', 'unit_sn': 'U1', 'result': 'Pass', 'start_time': BASE, 'end_time': BASE + 4,
+                  'steps': [step('temp', 'TEMP', 'Pass', 'T=42'), step('left', 'CYLINDER_EXERCISE LEFT', 'Pass',
+                                                                     'CYLINDER_EXERCISE LEFT OK')]})
+    store.submit({'fixture_id': 'H60-2', 'unit_sn': 'U2', 'result': 'Fail', 'start_time': BASE + 60,
+                  'steps': [step('temp', 'TEMP', 'Pass', 'T=48'),
+                            step('left', 'CYLINDER_EXERCISE LEFT', 'Fail', 'CYLINDER_EXERCISE LEFT TIMEOUT')]})
+    store.close()
+    return store.path
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def test_csv_export_writes_runs_and_steps(db_path, tmp_path):
+    output = str(tmp_path / 'export')
+    result = export_results(db_path, output, chunk_size=1)
+
+    assert (result['runs'], result['steps']) == (2, 4)
+    runs = read_csv(os.path.join(output, 'runs.csv'))
+    assert [(run['unit_sn'], run['fail_list']) for run in runs] == [('U1', ''), ('U2', 'left')]
+    assert runs[0]['start_time'] == '2026-03-02 08:00:00' and runs[1]['end_time'] == ''
+    steps = read_csv(os.path.join(output, 'steps.csv'))
+    assert [(row['run_id'], row['step']) for row in steps] == [('1', 'temp'), ('1', 'left'), ('2', 'temp'), ('2', 'left')]
+    assert not any(name.endswith('.tmp') for name in os.listdir(output))
+
+
+def test_export_filters_and_errors(db_path, tmp_path):
+    result = export_results(db_path, str(tmp_path / 'u2'), unit_sn='U2')
+    assert (result['runs'], result['steps']) == (1, 2)
+    with pytest.raises(ExportError):
+        export_results(db_path, str(tmp_path / 'x'), fmt='xlsx')
+    with pytest.raises(ExportError):
+        export_results(str(tmp_path / 'missing.db'), str(tmp_path / 'x'))
+
+
+def test_parquet_export(db_path, tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    result = export_results(db_path, str(tmp_path / 'pq'), fmt='parquet')
+    table = parquet.read_table(result['files'][0])
+    assert table.column('unit_sn').to_pylist() == ['U1', 'U2']
+
+
+def test_recheck_with_tightened_limit(db_path):
+    plan = compile_sequence({'steps': [
+        {'id': 'temp', 'type': 'fixture', 'command': 'TEMP', 'extract': r'T=(\d+)', 'max': 45},
+        {'id': 'left', 'type': 'fixture', 'command': 'CYLINDER_EXERCISE LEFT'},
+    ]})
+    result = recheck_results(db_path, plan, chunk_size=1)
+
+    assert result['checked'] == 4
+    assert result['steps'] == {'temp': {'pass': 1, 'fail': 1}, 'left': {'pass': 1, 'fail': 1}}
+    # 只有收紧限值后不再通过的温度步骤判定结果发生变化
+    change, = result['changes']
+    assert (change['run_id'], change['step'], change['stored'], change['status'], change['value']) == \
+        (2, 'temp', 'Pass', 'Fail', '48')
+    assert recheck_results(db_path, plan, unit_sn='U1')['changes'] == []
@@ -0,0 +1,94 @@
+"""结果库：后台批量写入（WAL）、历史查询过滤和良率统计"""
+import sqlite3
+import time
+
+import pytest
+
+from results_store import ResultsStore, to_timestamp
+
+BASE = to_timestamp('2026-03-02 08:00:00')
+
+
+def make_run(fixture_id, result, start, unit_sn=None, fixture_sn='FX1', steps=()):
+    return {'station_id': 'ST1', 'fixture_id': fixture_id, 'fixture_sn': fixture_sn, 'unit_sn': unit_sn,
+            'mmwave_model': 'MMW-H60-A1', 'result': result, 'error': None,
+            'start_time': start, 'end_time': start + 5, 'total_time': 5.0, 'steps': list(steps)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.db'), batch_interval=0.05)
+    store.start()
+    yield store
+    store.close()
+
+
+def wait_written(store, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while store.written < count:
+        assert time.monotonic() < deadline, f"只写入了 {store.written} 条记录"
+        time.sleep(0.01)
+
+
+def test_background_writes_in_wal_mode(store):
+    steps = [{'step': 'left', 'command': 'CYLINDER_EXERCISE LEFT', 'status': 'Pass',
+              'result': 'CYLINDER_EXERCISE LEFT OK', 'timestamp': 0.25}]
+    store.submit(make_run('H60-1', 'Pass', BASE, unit_sn='U1', steps=steps))
+    wait_written(store, 1)
+
+    conn = sqlite3.connect(store.path)
+    try:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    finally:
+        conn.close()
+    run = store.history(include_steps=True)[0]
+    assert (run['fixture_id'], run['unit_sn'], run['result']) == ('H60-1', 'U1', 'Pass')
+    assert run['steps'] == [{'seq': 0, 'step': 'left', 'command': 'CYLINDER_EXERCISE LEFT', 'status': 'Pass',
+                             'response': 'CYLINDER_EXERCISE LEFT OK', 'elapsed': 0.25}]
+    assert store.get_run(run['id'])['steps'] == run['steps']
+    assert store.get_run(run['id'] + 1) is None
+
+
+def test_close_writes_queued_runs(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.db'), batch_interval=10.0)
+    for minute in range(120):
+        store.submit(make_run('H60-1', 'Pass', BASE + minute * 60))
+    store.close()
+    assert store.written == 120
+    assert len(ResultsStore(store.path).history(limit=None)) == 120
+
+
+def test_history_filters(store):
+    store.submit(make_run('H60-1', 'Pass', BASE, unit_sn='U1'))
+    store.submit(make_run('H60-1', 'Fail', BASE + 3600, unit_sn='U1'))
+    store.submit(make_run('H60-2', 'Pass', BASE + 7200, unit_sn='U2', fixture_sn='FX2'))
+    wait_written(store, 3)
+
+    assert [run['start_time'] for run in store.history()] == [BASE + 7200, BASE + 3600, BASE]
+    assert [run['result'] for run in store.history(unit_sn='U1')] == ['Fail', 'Pass']
+    assert [run['unit_sn'] for run in store.history(fixture_sn='FX2')] == ['U2']
+    assert [run['unit_sn'] for run in store.history(fixture_id='H60-1', result='Pass')] == ['U1']
+    assert [run['fixture_id'] for run in store.history(since='2026-03-02 09:00', until=BASE + 7200)] == ['H60-1']
+    assert len(store.history(limit=1)) == 1
+    with pytest.raises(ValueError):
+        store.history(since='yesterday')
+
+
+def test_yield_summary(store):
+    for offset, fixture_id, result, unit_sn in [(0, 'H60-1', 'Pass', 'U1'), (60, 'H60-1', 'Fail', 'U2'),
+                                                (120, 'H60-1', 'Pass', 'U2'), (180, 'H60-2', 'Stopped', 'U3'),
+                                                (86400, 'H60-2', 'Pass', 'U4')]:
+        store.submit(make_run(fixture_id, result, BASE + offset, unit_sn=unit_sn))
+    wait_written(store, 5)
+
+    total, = store.yield_summary()
+    assert (total['total'], total['passed'], total['failed'], total['stopped'], total['units']) == (5, 3, 1, 1, 4)
+    assert total['yield'] == 0.75
+
+    by_fixture = {row['grp']: row for row in store.yield_summary(group_by='fixture_id')}
+    assert by_fixture['H60-1']['yield'] == round(2 / 3, 4)
+    assert by_fixture['H60-2']['yield'] == 1.0
+    assert [row['grp'] for row in store.yield_summary(group_by='day')] == ['2026-03-02', '2026-03-03']
+    assert store.yield_summary(since=BASE + 86400)[0]['total'] == 1
+    with pytest.raises(ValueError):
+        store.yield_summary(group_by='week')
@@ -0,0 +1,110 @@
+"""流程文件编译：字段检查、依赖排序、循环依赖，以及执行计划的并行、跳过和重试"""
+import json
+import os
+import queue
+import threading
+
+import pytest
+
+from execution import RunContext
+from sequence import SequenceError, SequenceFile, compile_sequence, load_sequence
+
+
+def steps(*specs):
+    return {'name': 'test', 'steps': list(specs)}
+
+
+def order(plan):
+    return [step.id for step in plan.steps]
+
+
+def test_default_dependency_is_previous_step():
+    plan = compile_sequence(steps({'id': 'a', 'type': 'x'}, {'id': 'b', 'type': 'x'}, {'id': 'c', 'type': 'x'}))
+    assert order(plan) == ['a', 'b', 'c']
+    assert [step.after for step in plan.steps] == [[], ['a'], ['b']]
+
+
+def test_dependency_ordering():
+    plan = compile_sequence(steps(
+        {'id': 'report', 'type': 'x', 'after': ['left', 'unit_sn']},
+        {'id': 'left', 'type': 'x', 'after': 'sn'},
+        {'id': 'sn', 'type': 'x', 'after': []},
+        {'id': 'unit_sn', 'type': 'x', 'after': []},
+    ))
+    assert order(plan) == ['sn', 'unit_sn', 'left', 'report']
+
+
+@pytest.mark.parametrize('spec, message', [
+    (steps({'id': 'a', 'type': 'x', 'after': 'b'}, {'id': 'b', 'type': 'x', 'after': 'a'}), '循环依赖'),
+    (steps({'id': 'a', 'type': 'x', 'after': 'missing'}), '不存在'),
+    (steps({'id': 'a', 'type': 'x'}, {'id': 'a', 'type': 'x'}), '重复'),
+    (steps({'id': 'a', 'type': 'x', 'colour': 'red'}), '未知字段'),
+    (steps({'id': 'a'}), '缺少字段'),
+    (steps({'id': 'a', 'type': 'x', 'on_fail': 'retry'}), 'on_fail'),
+    (steps({'id': 'a', 'type': 'x', 'retries': -1}), 'retries'),
+    (steps({'id': 'a', 'type': 'x', 'expect': '('}), '判定条件无效'),
+    (steps({'id': 'a', 'type': 'unknown'}), '类型未知'),
+    ({'steps': []}, '非空'),
+])
+def test_invalid_sequence(spec, message):
+    with pytest.raises(SequenceError, match=message):
+        compile_sequence(spec, step_types={'x'})
+
+
+def test_step_grammar_from_fields_or_command():
+    plan = compile_sequence(steps(
+        {'id': 'sn', 'type': 'fixture', 'command': 'FixtureSN'},
+        {'id': 'temp', 'type': 'fixture', 'command': 'TEMP', 'extract': r'T=(\d+)', 'max': 50},
+        {'id': 'raw', 'type': 'fixture', 'command': 'RAW'},
+    ))
+    sn, temp, raw = plan.steps
+    assert sn.check('FixtureSN: ABC123\r\n') == (True, 'ABC123', None)
+    assert temp.check('T=42')[:2] == (True, '42')
+    assert not temp.check('T=60')[0]
+    assert raw.check(' anything ') == (True, 'anything', None)
+
+
+def run_plan(plan, runners):
+    ctx = RunContext('F1', queue.Queue(), threading.Event())
+    result = plan.run(ctx, None, runners)
+    events = []
+    while not ctx.events.empty():
+        events.append(ctx.events.get_nowait())
+    return result, {data['step']: data for _, kind, data in events if kind == 'step'}
+
+
+def test_plan_skips_dependents_and_retries():
+    calls = []
+
+    def runner(step, fixture, ctx):
+        calls.append(step.id)
+        if step.command == 'flaky' and calls.count(step.id) == 1:
+            raise IOError('no reply')
+        return 'ERROR' if step.command == 'bad' else 'OK'
+
+    plan = compile_sequence(steps(
+        {'id': 'flaky', 'type': 'x', 'command': 'flaky', 'retries': 1, 'retry_delay': 0, 'after': []},
+        {'id': 'optional', 'type': 'x', 'command': 'bad', 'fail_on': 'ERROR', 'required': False, 'after': []},
+        {'id': 'after_optional', 'type': 'x', 'command': 'ok', 'after': ['optional']},
+    ), step_types={'x'})
+    result, events = run_plan(plan, {'x': runner})
+
+    # optional失败不影响结果，但依赖它的必需步骤被跳过，测试不通过
+    assert result == 'Fail'
+    assert events['flaky']['status'] == 'Pass' and events['flaky']['attempts'] == 2
+    assert events['optional']['status'] == 'Fail'
+    assert 'after_optional' not in events  # 依赖未通过的步骤跳过，不发事件
+    assert calls.count('after_optional') == 0
+
+
+def test_sequence_file_reloads_after_change(tmp_path):
+    path = tmp_path / 'seq.json'
+    path.write_text(json.dumps(steps({'id': 'a', 'type': 'delay', 'seconds': 0})), encoding='utf-8')
+    sequence = SequenceFile(str(path))
+    first = sequence.plan()
+    assert sequence.plan() is first
+
+    path.write_text(json.dumps(steps({'id': 'b', 'type': 'delay', 'seconds': 0})), encoding='utf-8')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert order(sequence.plan()) == ['b']
+    assert order(load_sequence(str(path))) == ['b']
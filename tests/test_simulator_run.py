@@ -0,0 +1,99 @@
+"""用假H60治具和假adb/nanokdp执行完整测试流程，包括测试中途停止后再次测试"""
+import threading
+import time
+
+from conftest import MODEL, UNIT_SN
+from fixture import Fixture
+from simulator.h60 import DEFAULT_VERSION
+
+RUN_TIMEOUT = 30.0
+
+
+def wait_for_step(record, step_id, timeout=RUN_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not any(step['step'] == step_id for step in record.steps):
+        assert time.monotonic() < deadline, f"步骤 {step_id} 未执行"
+        time.sleep(0.01)
+
+
+def test_full_run_passes(station):
+    record = station.run(timeout=RUN_TIMEOUT)['S1']
+
+    assert record.result == 'Pass'
+    assert record.sn == 'FX000001'
+    assert [step['step'] for step in record.steps if step['status'] != 'Pass'] == []
+    assert {step['step'] for step in record.steps} == {
+        'fixture_sn', 'unit_sn', 'cylinder_left', 'settle', 'cylinder_right'}
+    assert station.cached_dut_identity('S1') == (UNIT_SN, MODEL)
+
+
+def test_stop_mid_run_then_run_again(station):
+    assert station.begin_run('S1')
+    record = station.runs['S1']
+    # cylinder_left完成后流程在settle步骤中等待，此时没有阻塞中的串口读取
+    wait_for_step(record, 'cylinder_left')
+    station.stop_run('S1')
+    assert station.wait_for_runs([record], RUN_TIMEOUT)
+    assert record.result == 'Stopped'
+
+    # 停止不能在串口上留下打断标记，否则下一条命令会立即返回空响应
+    assert DEFAULT_VERSION in station.execute_command('Version', 'S1')
+
+    second = station.run(timeout=RUN_TIMEOUT)['S1']
+    assert second is not record
+    assert second.result == 'Pass'
+
+
+def test_cancel_interrupts_blocking_read(sim):
+    fixture = Fixture('S1', sim.port)
+    try:
+        assert fixture.get_connection() is not None
+        sim.timeout_rate = 1.0  # 治具不应答，读取一直阻塞到超时
+        threading.Timer(0.2, fixture.cancel_read).start()
+        start_time = time.monotonic()
+        assert fixture.send('CYLINDER_RESET', 5.0) == ''
+        assert time.monotonic() - start_time < 2.0
+
+        sim.timeout_rate = 0.0
+        fixture.cancel_read()  # 空闲时停止不影响之后的命令
+        assert DEFAULT_VERSION in fixture.send('Version')
+    finally:
+        fixture.close()
+
+
+def test_run_does_not_query_mmwave_while_poller_runs(station):
+    station.polling = True  # 轮询线程负责读取mmwave型号，测试线程只记录缓存中的值
+    record = station.run(timeout=RUN_TIMEOUT)['S1']
+
+    assert record.result == 'Pass'
+    assert station.cached_dut_identity('S1') == (UNIT_SN, None)
+
+
+def test_unit_sn_is_reused_until_adb_reconnects(station, monkeypatch):
+    reads = []
+    get_unit_sn = station.get_unit_sn
+    monkeypatch.setattr(station, 'get_unit_sn', lambda *args: reads.append(args) or get_unit_sn(*args))
+
+    assert station.run(timeout=RUN_TIMEOUT)['S1'].result == 'Pass'
+    assert station.run(timeout=RUN_TIMEOUT)['S1'].result == 'Pass'
+    assert len(reads) == 1  # 第二次RUN使用缓存中的Unit_SN
+
+    # adb shell断开后由连接检查重新连接，DUT可能已更换，下次RUN重新读取
+    station.duts['S1'].adb_session.close()
+    assert station.warm_up()['adb:S1']
+    assert station.run(timeout=RUN_TIMEOUT)['S1'].result == 'Pass'
+    assert len(reads) == 2
+
+
+def test_graded_reply_returns_without_waiting_for_terminator(sim):
+    sim.fail_commands.add('CYLINDER_RESET')
+    fixture = Fixture('S1', sim.port)
+    try:
+        assert fixture.get_connection() is not None
+        # 结束符不会到达，响应语法判定出结果后立即返回，不等到超时
+        start_time = time.monotonic()
+        assert fixture.send('CYLINDER_RESET', 3.0, terminators=(b'#',)).startswith('ERROR')
+        assert DEFAULT_VERSION in fixture.send('Version', 3.0, terminators=(b'#',))
+        assert time.monotonic() - start_time < 1.0
+    finally:
+        fixture.close()
@@ -0,0 +1,76 @@
+"""耐久测试：漂移计算、样本导出，以及在模拟治具上循环发送命令"""
+import csv
+import time
+
+import pytest
+
+import soak
+from soak import SoakRun
+
+
+def with_latencies(latencies):
+    run = SoakRun(['A', 'B'])
+    for seq, latency in enumerate(latencies):
+        run.offsets.append(seq * 0.5)
+        run.latencies.append(latency)
+        run.command_index.append(seq % 2)
+        run.passed.append(1)
+    return run
+
+
+def test_drift_windows(monkeypatch):
+    assert with_latencies([]).drift() is None
+    assert with_latencies([0.01]).drift() is None
+    # 样本不足两个窗口时两端各取一半
+    assert with_latencies([0.01, 0.01, 0.03]).drift() == {'first_ms': 10.0, 'recent_ms': 30.0, 'ratio': 3.0}
+    monkeypatch.setattr(soak, 'DRIFT_WINDOW', 2)
+    drift = with_latencies([0.01, 0.01, 0.5, 0.5, 0.02, 0.02]).drift()
+    assert drift == {'first_ms': 10.0, 'recent_ms': 20.0, 'ratio': 2.0}
+
+
+def test_export(tmp_path):
+    path = tmp_path / 'soak.csv'
+    with_latencies([0.01, 0.0125]).export(str(path))
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows == [['seq', 'offset_s', 'command', 'latency_ms', 'passed'],
+                    ['0', '0.000000', 'A', '10.000', '1'],
+                    ['1', '0.500000', 'B', '12.500', '1']]
+
+
+def test_requires_commands():
+    with pytest.raises(ValueError):
+        SoakRun([])
+
+
+def test_soak_on_simulator(station, sim):
+    run = SoakRun(cycles=3)
+    assert station.begin_soak('S1', run)
+    assert station.wait_for_soak(run, timeout=10)
+    assert run.result == 'Pass'
+    summary = run.summary()
+    assert summary['cycles'] == 3 and summary['commands_sent'] == 9 and summary['failures'] == 0
+    assert all(stats['count'] == 3 for stats in summary['per_command'].values())
+
+    # 累计失败达到上限后停止，结果为Fail
+    sim.fail_commands.add('CYLINDER_RESET')
+    run = SoakRun(max_failures=2)
+    assert station.begin_soak('S1', run)
+    assert station.wait_for_soak(run, timeout=10)
+    assert run.result == 'Fail'
+    assert run.failures == 2 and run.cycles_done == 2
+    assert run.last_failure['command'] == 'CYLINDER_RESET'
+
+
+def test_stop_soak(station):
+    run = SoakRun(rate=20)
+    assert station.begin_soak('S1', run)
+    assert not station.begin_soak('S1', SoakRun())  # 治具正忙
+    deadline = time.monotonic() + 10
+    while not run.latencies and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert run.result is None
+    station.stop_run('S1')
+    assert station.wait_for_soak(run, timeout=10)
+    assert run.result == 'Stopped'
+    assert len(run.latencies) > 0
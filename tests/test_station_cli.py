@@ -0,0 +1,53 @@
+"""守护进程请求处理：未知治具编号返回错误且不留下运行记录"""
+import json
+import socket
+import threading
+
+import pytest
+
+from station_cli import StationServer
+
+
+@pytest.fixture
+def server(station, tmp_path):
+    server = StationServer(str(tmp_path / 'station.sock'), station)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, **payload):
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(server.server_address)
+        sock.sendall((json.dumps(payload) + '\n').encode('utf-8'))
+        return json.loads(sock.makefile(encoding='utf-8').readline())
+
+
+def test_unknown_fixture_is_rejected_without_phantom_record(server, station):
+    reply = request(server, cmd='run', fixtures=['S1', 'NOPE'], wait=False)
+    assert reply['ok'] is False
+    assert 'NOPE' in reply['error']
+    assert station.runs == {}
+
+    status = request(server, cmd='status')
+    assert list(status['fixtures']) == ['S1']
+    assert status['fixtures']['S1']['last'] is None
+
+
+def test_begin_run_rejects_unknown_fixture(station):
+    with pytest.raises(ValueError):
+        station.begin_run('NOPE')
+    assert 'NOPE' not in station.runs
+
+
+def test_run_request_waits_for_result(server):
+    reply = request(server, cmd='run', fixtures=['S1'], timeout=30)
+    assert reply['ok'] and reply['finished']
+    assert reply['results']['S1']['result'] == 'Pass'
+
+
+def test_status_reports_poller_snapshot(server, station):
+    station._count_poll('reads')
+    poller = request(server, cmd='status')['poller']
+    assert poller == {'reads': 1, 'uploads': 0, 'paused': 0, 'interval': station.poll_schedule.current}
@@ -0,0 +1,134 @@
+"""TCP批量上传：批量发送、服务器不可用时暂存、重连后补发、停止时不丢数据"""
+import json
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+import tcp_uploader
+from tcp_uploader import TcpUploader
+
+WAIT_TIMEOUT = 10.0
+
+
+class LineCollector(socketserver.ThreadingTCPServer):
+    """收集客户端发来的每一行JSON"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0):
+        self.records = []
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', port), LineHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def wait_for(self, count):
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self.records) >= count:
+                    return list(self.records)
+            time.sleep(0.02)
+        raise AssertionError(f"只收到 {len(self.records)} 条记录，期望 {count} 条")
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            with self.server.lock:
+                self.server.records.append(json.loads(line))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / 'spool.jsonl')
+
+
+def test_sends_in_batches(spool_path):
+    server = LineCollector()
+    uploader = TcpUploader('127.0.0.1', server.port, batch_size=10, batch_interval=0.05, spool_path=spool_path)
+    try:
+        for seq in range(25):
+            assert uploader.submit({'seq': seq})
+        uploader.start()
+        records = server.wait_for(25)
+    finally:
+        uploader.stop()
+        server.close()
+
+    assert [record['seq'] for record in records] == list(range(25))
+    stats = uploader.stats()
+    assert stats['sent'] == 25
+    assert 3 <= stats['batches'] <= 25
+    assert stats['spooled'] == 0 and stats['dropped'] == 0
+
+
+def test_spools_while_offline_and_replays_after_reconnect(spool_path):
+    port = free_port()
+    uploader = TcpUploader('127.0.0.1', port, batch_interval=0.05, spool_path=spool_path,
+                           connect_timeout=0.5, reconnect_delay=0.05, max_reconnect_delay=0.1)
+    uploader.start()
+    server = None
+    try:
+        for seq in range(5):
+            uploader.submit({'seq': seq})
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while uploader.stats()['spooled'] < 5:
+            assert time.monotonic() < deadline, "服务器不可用时数据未写入暂存文件"
+            time.sleep(0.02)
+
+        server = LineCollector(port)
+        uploader.submit({'seq': 5})
+        records = server.wait_for(6)
+    finally:
+        uploader.stop()
+        if server is not None:
+            server.close()
+
+    # 暂存数据先于新数据补发
+    assert [record['seq'] for record in records] == list(range(6))
+    assert uploader.stats()['spool_bytes'] == 0
+
+
+def test_full_queue_drops(spool_path):
+    uploader = TcpUploader('127.0.0.1', free_port(), max_queue=2, spool_path=spool_path)
+    assert uploader.submit({'seq': 0}) and uploader.submit({'seq': 1})
+    assert not uploader.submit({'seq': 2})
+    assert uploader.stats()['dropped'] == 1
+
+
+def test_stop_spools_queue_when_worker_is_stuck_connecting(spool_path, monkeypatch):
+    release = threading.Event()
+
+    def stuck_connect(address, timeout=None):
+        release.wait(WAIT_TIMEOUT)
+        raise OSError("连接超时")
+
+    monkeypatch.setattr(tcp_uploader.socket, 'create_connection', stuck_connect)
+    uploader = TcpUploader('127.0.0.1', free_port(), spool_path=spool_path, connect_timeout=0.1)
+    uploader.start()
+    time.sleep(0.3)  # 后台线程卡在连接中
+    for seq in range(3):
+        uploader.submit({'seq': seq})
+    try:
+        uploader.stop(timeout=0.2)
+        with open(spool_path, encoding='utf-8') as f:
+            assert [json.loads(line)['seq'] for line in f] == [0, 1, 2]
+    finally:
+        release.set()
@@ -0,0 +1,86 @@
+"""抓包：轮换和清理旧文件、跨文件的通道定义、回放时的命令/响应配对和判定"""
+import pytest
+
+import traffic_capture
+from traffic_capture import CaptureWriter, capture_files, read_records, replay, summarize
+
+
+@pytest.fixture
+def capture(tmp_path):
+    directory = str(tmp_path / 'captures')
+    writer = traffic_capture.start(directory)
+    yield directory, writer
+    traffic_capture.stop()
+
+
+def test_rotation_keeps_latest_files(tmp_path):
+    directory = str(tmp_path)
+    writer = CaptureWriter(directory, segment_bytes=traffic_capture.MIN_SEGMENT_BYTES, max_files=3)
+    for n in range(1000):
+        writer.record(traffic_capture.TX, 'port-a', f"CMD{n:03d}\r\n".encode())
+    writer.close()
+
+    files = capture_files(directory)
+    assert len(files) == 3
+    records = [record for path in files for record in read_records(path)]
+    # 每个文件都重新写入通道定义，最早的文件被删除，剩下的记录连续到最后一条
+    assert all(channel == 'port-a' for _, _, channel, _ in records)
+    payloads = [bytes(data) for _, _, _, data in records]
+    assert payloads == [f"CMD{n:03d}\r\n".encode() for n in range(1000 - len(payloads), 1000)]
+    assert len(payloads) < 1000
+    assert writer.records == 1000
+
+
+def test_rejects_tiny_segments(tmp_path):
+    with pytest.raises(ValueError):
+        CaptureWriter(str(tmp_path), segment_bytes=256)
+
+
+def test_replay_pairs_commands_and_responses(capture):
+    directory, writer = capture
+    traffic_capture.tx('port-a', b'Version\r\n')
+    traffic_capture.rx('port-a', b'Version: 1.')
+    traffic_capture.rx('port-a', b'2.3\r\n')
+    traffic_capture.tx('port-b', b'CYLINDER_RESET\r\n')
+    traffic_capture.rx('port-b', b'CYLINDER_RESET timeout\r\n')
+    # 流水线：一次发送两条命令，响应按行分配
+    traffic_capture.tx('port-a', b'Reset\r\nIs_Button_Pressed\r\n')
+    traffic_capture.rx('port-a', b'Reset OK\r\nButton: 1\r\n')
+    traffic_capture.tx('port-a', b'Start_test\r\n')
+    traffic_capture.tx('port-a', b'End_test pass\r\n', append=True)
+    traffic_capture.rx('port-a', b'Start_test OK\r\nEnd_test pass OK\r\n')
+    traffic_capture.stop()
+
+    exchanges = list(replay(directory))
+    by_command = {exchange.command: exchange for exchange in exchanges}
+    assert sorted(by_command) == sorted(['Version', 'CYLINDER_RESET', 'Reset', 'Is_Button_Pressed',
+                                         'Start_test', 'End_test pass'])
+    assert by_command['Version'].response == 'Version: 1.2.3\r\n'
+    assert by_command['Version'].verdict.value == '1.2.3'
+    assert by_command['Version'].latency >= 0
+    assert by_command['Reset'].response == 'Reset OK\r\n'
+    assert by_command['Is_Button_Pressed'].verdict.value is True
+    assert by_command['Start_test'].response == 'Start_test OK\r\n'
+    assert by_command['End_test pass'].response == 'End_test pass OK\r\n'
+    assert not by_command['CYLINDER_RESET'].verdict.passed
+
+    assert [exchange.command for exchange in replay(directory, channel='port-b')] == ['CYLINDER_RESET']
+
+    summary = summarize(exchanges)
+    assert summary['commands']['Version']['pass'] == 1
+    assert summary['commands']['CYLINDER_RESET']['fail'] == 1
+    assert [failure['command'] for failure in summary['failures']] == ['CYLINDER_RESET']
+
+
+def test_not_started_is_noop(tmp_path):
+    traffic_capture.stop()
+    traffic_capture.tx('port-a', b'Version\r\n')
+    traffic_capture.rx('port-a', b'Version: 1\r\n')
+    assert capture_files(str(tmp_path)) == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.h60cap'
+    path.write_bytes(b'NOTACAPTUREFILE')
+    with pytest.raises(ValueError):
+        list(read_records(str(path)))
@@ -0,0 +1,144 @@
+"""耗时统计：按名称记录各操作的耗时，计算p50/p95/p99，可导出为JSON或CSV
+
+    from timing import span, timed
+
+    with span('send_command:FixtureSN'):
+        ...
+
+    @timed('get_unit_sn')
+    def get_unit_sn(): ...
+
+所有记录写入模块级的recorder，线程安全；每个名称只保留最近max_samples个样本用于计算百分位。
+"""
+import collections
+import contextlib
+import csv
+import functools
+import json
+import math
+import threading
+import time
+
+DEFAULT_MAX_SAMPLES = 10000
+SUMMARY_FIELDS = ['name', 'count', 'errors', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+
+def percentile(ordered, q):
+    """返回已排序样本ordered的第q百分位（最近秩法），没有样本时返回0"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))]
+
+
+class LatencyHistogram:
+    """一个操作的耗时样本，count/total/max统计全部调用，百分位按最近的样本计算"""
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.samples = collections.deque(maxlen=max_samples)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, error=False):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def percentile(self, q, ordered=None):
+        """返回第q百分位的耗时(秒)，没有样本时返回0"""
+        return percentile(ordered if ordered is not None else sorted(self.samples), q)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50, ordered) * 1000, 3),
+            'p95_ms': round(self.percentile(95, ordered) * 1000, 3),
+            'p99_ms': round(self.percentile(99, ordered) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class TimingRecorder:
+    """按名称汇总耗时，span()/timed()在代码块或函数结束时记录一次"""
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error=False):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram(self.max_samples)
+            histogram.add(seconds, error)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """记录代码块的耗时，代码块抛出异常时同时计入errors"""
+        start_time = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start_time, error)
+
+    def timed(self, name=None):
+        """函数装饰器，name默认为函数名"""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def quantiles(self, prefix='', qs=(0.5, 0.95, 0.99)):
+        """返回名称以prefix开头的各操作 {去掉前缀的名称: (次数, 总耗时, {分位数: 耗时})}，耗时单位为秒"""
+        with self._lock:
+            histograms = {name[len(prefix):]: (histogram.count, histogram.total, sorted(histogram.samples))
+                          for name, histogram in self._histograms.items() if name.startswith(prefix)}
+        return {name: (count, total, {q: percentile(ordered, q * 100) for q in qs})
+                for name, (count, total, ordered) in histograms.items()}
+
+    def summary(self):
+        """返回 {名称: 统计}，按名称排序"""
+        with self._lock:
+            return {name: self._histograms[name].summary() for name in sorted(self._histograms)}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export(self, path):
+        """把统计写入文件：.csv按行写入，其他扩展名写JSON"""
+        summary = self.summary()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+                writer.writeheader()
+                for name, stats in summary.items():
+                    writer.writerow(dict(stats, name=name))
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'spans': summary},
+                          f, ensure_ascii=False, indent=2)
+        return summary
+
+
+recorder = TimingRecorder()
+span = recorder.span
+timed = recorder.timed
+record = recorder.record
@@ -0,0 +1,271 @@
+"""原始通信抓包和回放：记录每个串口和nanokdp通道带时间戳的原始收发字节，回放时重新解析和判定
+
+抓包文件是预分配并内存映射的二进制文件，写满后轮换，只保留最近max_files个：
+    文件头    MAGIC（8字节）
+    记录      <dBHI 头部（时间戳、类型、通道号、长度）+ 数据
+    类型      TX发送 / RX接收 / CHANNEL通道定义（数据为通道名，每个文件中第一次使用通道前写入）
+              TX_APPEND流水线追加发送（之前发送的命令可能仍在等待响应）
+预分配的剩余部分为0，读取时遇到全0的记录头即结束，程序异常退出也能读出已写入的记录。
+
+    import traffic_capture
+    traffic_capture.start('captures')           # 之后所有串口和nanokdp收发都会记录
+    traffic_capture.tx('/dev/cu.usbserial-1', b'Version\\r\\n')   # 未启动时直接返回
+    for exchange in traffic_capture.replay('captures'):   # 不等待，按文件顺序尽快回放
+        print(exchange.command, exchange.verdict)
+"""
+import collections
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+
+from response_grammar import grammar_for
+
+MAGIC = b'H60CAP1\0'
+RECORD_HEADER = struct.Struct('<dBHI')
+TX, RX, CHANNEL, TX_APPEND = 0, 1, 2, 3
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_FILES = 20
+CHANNEL_RESERVE = 256  # 每条记录为轮换后重新写入的通道定义留出的空间
+MIN_SEGMENT_BYTES = 4096
+FILE_PATTERN = 'capture-*.h60cap'
+
+# 一条命令及其响应；verdict为回放时按响应语法的判定结果（命令没有语法时为None）
+Exchange = collections.namedtuple('Exchange', 'channel command response sent_at latency verdict')
+
+
+class CaptureWriter:
+    """写入轮换的内存映射抓包文件，线程安全；每条记录只是一次struct打包和内存拷贝"""
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, max_files=DEFAULT_MAX_FILES):
+        if segment_bytes < MIN_SEGMENT_BYTES:
+            raise ValueError(f"抓包文件大小不能小于{MIN_SEGMENT_BYTES}字节: {segment_bytes}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_files = max_files
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._offset = 0
+        self._channels = {}  # 通道名 -> 通道号，跨文件不变
+        self._defined = set()  # 当前文件中已写入定义的通道号
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, kind, channel, data):
+        now = time.time()
+        with self._lock:
+            if self._map is None:
+                self._open()
+            channel_id = self._channels.get(channel)
+            if channel_id is None:
+                channel_id = self._channels[channel] = len(self._channels)
+            if channel_id not in self._defined:
+                self._write(now, CHANNEL, channel_id, str(channel).encode('utf-8'))
+                self._defined.add(channel_id)
+            self._write(now, kind, channel_id, data)
+            self.records += 1
+
+    def _write(self, timestamp, kind, channel_id, data):
+        limit = self.segment_bytes - len(MAGIC) - 2 * RECORD_HEADER.size - CHANNEL_RESERVE
+        if len(data) > limit:
+            data = data[:limit]
+        size = RECORD_HEADER.size + len(data)
+        if self._offset + size > self.segment_bytes:
+            self._rotate()
+            if kind != CHANNEL and channel_id not in self._defined:
+                name = next(name for name, number in self._channels.items() if number == channel_id)
+                self._write(timestamp, CHANNEL, channel_id, str(name).encode('utf-8'))
+                self._defined.add(channel_id)
+        RECORD_HEADER.pack_into(self._map, self._offset, timestamp, kind, channel_id, len(data))
+        start = self._offset + RECORD_HEADER.size
+        self._map[start:start + len(data)] = data
+        self._offset = start + len(data)
+
+    def _open(self):
+        self._sequence += 1
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}.h60cap"
+        self._file = open(os.path.join(self.directory, name), 'w+b')
+        self._file.truncate(self.segment_bytes)
+        self._map = mmap.mmap(self._file.fileno(), self.segment_bytes)
+        self._map[:len(MAGIC)] = MAGIC
+        self._offset = len(MAGIC)
+        self._defined = set()
+        self._prune()
+
+    def _close_file(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.truncate(self._offset)  # 去掉未使用的预分配空间
+            self._file.close()
+        self._map = None
+        self._file = None
+
+    def _rotate(self):
+        self._close_file()
+        self._open()
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)))
+        for path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+writer = None  # start()后为CaptureWriter
+
+
+def start(directory, segment_bytes=DEFAULT_SEGMENT_BYTES, max_files=DEFAULT_MAX_FILES):
+    """开始抓包，之后tx()/rx()记录到directory中的抓包文件"""
+    global writer
+    stop()
+    writer = CaptureWriter(directory, segment_bytes, max_files)
+    return writer
+
+
+def stop():
+    """停止抓包并关闭当前文件"""
+    global writer
+    current, writer = writer, None
+    if current is not None:
+        current.close()
+
+
+def tx(channel, data, append=False):
+    """记录发送到channel的原始字节，append为True表示流水线追加发送；未开始抓包时直接返回"""
+    current = writer
+    if current is not None and data:
+        current.record(TX_APPEND if append else TX, channel, data)
+
+
+def rx(channel, data):
+    """记录从channel收到的原始字节，未开始抓包时直接返回"""
+    current = writer
+    if current is not None and data:
+        current.record(RX, channel, data)
+
+
+def read_records(path):
+    """按顺序读取一个抓包文件，生成(时间戳, 类型, 通道名, 数据)"""
+    channels = {}
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"不是抓包文件: {path}")
+            offset = len(MAGIC)
+            while offset + RECORD_HEADER.size <= len(data):
+                timestamp, kind, channel_id, length = RECORD_HEADER.unpack_from(data, offset)
+                if timestamp == 0 and length == 0:
+                    return  # 预分配的空白部分
+                offset += RECORD_HEADER.size
+                payload = data[offset:offset + length]
+                offset += length
+                if kind == CHANNEL:
+                    channels[channel_id] = payload.decode('utf-8', errors='replace')
+                else:
+                    yield timestamp, kind, channels.get(channel_id, str(channel_id)), payload
+
+
+def capture_files(path):
+    """path为目录时返回其中按文件名（即创建时间）排序的抓包文件，否则返回[path]"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, FILE_PATTERN)))
+    return [path]
+
+
+def replay(path, grammars=None, speed=None, channel=None):
+    """把抓包中的命令和响应重新交给响应语法判定，生成Exchange
+
+    grammars为 {命令: ResponseGrammar}，没有列出的命令使用默认语法。每个通道中一次发送后到下一次发送前
+    收到的数据属于该次发送的命令；一次发送了多条命令（流水线）时，响应按行依次分配给各命令。
+    speed为None时不等待，尽快回放；为数值时按原始时间间隔除以speed等待（1为实时）。
+    """
+    pending = {}  # 通道 -> [[命令, 发送时间, 响应字节, 第一个响应字节的时间]]
+    replay_start = first_timestamp = None
+
+    def finish(name, item):
+        command, sent_at, response, received_at = item
+        text = bytes(response).decode('ascii', errors='ignore')
+        grammar = (grammars or {}).get(command) or grammar_for(command)
+        return Exchange(name, command, text, sent_at,
+                        received_at - sent_at if received_at is not None else None,
+                        grammar.evaluate(text) if grammar is not None else None)
+
+    for capture in capture_files(path):
+        for timestamp, kind, name, data in read_records(capture):
+            if channel is not None and name != channel:
+                continue
+            if speed:
+                if replay_start is None:
+                    replay_start, first_timestamp = time.monotonic(), timestamp
+                delay = (timestamp - first_timestamp) / speed - (time.monotonic() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+            items = pending.setdefault(name, [])
+            if kind in (TX, TX_APPEND):
+                # 新的一次发送说明之前的命令都已结束；流水线追加发送时只结束已收到完整响应的命令
+                if kind == TX:
+                    done, items[:] = list(items), []
+                else:
+                    done = [item for item in items if item[2].endswith(b'\n')]
+                    items[:] = [item for item in items if not item[2].endswith(b'\n')]
+                for item in done:
+                    yield finish(name, item)
+                commands = [line.strip() for line in data.decode('ascii', errors='ignore').splitlines()]
+                items.extend([command, timestamp, bytearray(), None] for command in commands if command)
+                continue
+            # 只有一条命令时收到的数据都属于它（可能是多行响应）；
+            # 多条命令（流水线）时按行依次分配给尚未收到完整响应的命令，最后一条命令接收剩余的全部数据
+            buffer = bytes(data)
+            for item in items:
+                if not buffer:
+                    break
+                last = item is items[-1]
+                if not last and item[2].endswith(b'\n'):
+                    continue
+                end = len(buffer) if last else (buffer.find(b'\n') + 1 or len(buffer))
+                item[2] += buffer[:end]
+                if item[3] is None:
+                    item[3] = timestamp
+                buffer = buffer[end:]
+    for name, items in pending.items():
+        for item in items:
+            yield finish(name, item)
+
+
+def summarize(exchanges, max_failures=1000):
+    """统计回放结果：每条命令的通过/失败/未判定次数和响应耗时，以及失败的交互"""
+    commands = {}
+    failures = []
+    for exchange in exchanges:
+        stats = commands.setdefault(exchange.command, {'pass': 0, 'fail': 0, 'unchecked': 0, 'max_latency_ms': 0.0})
+        if exchange.verdict is None:
+            stats['unchecked'] += 1
+        elif exchange.verdict.passed:
+            stats['pass'] += 1
+        else:
+            stats['fail'] += 1
+            if len(failures) < max_failures:
+                failures.append({'channel': exchange.channel, 'command': exchange.command,
+                                 'sent_at': exchange.sent_at, 'response': exchange.response,
+                                 'reason': exchange.verdict.reason})
+        if exchange.latency is not None:
+            stats['max_latency_ms'] = max(stats['max_latency_ms'], round(exchange.latency * 1000, 3))
+    return {'commands': commands, 'failures': failures}